@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN-driven index advisor and plan-regression check
+
+Runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) over every statement in
+queries/*.sql and over the SQL each view emits (captured while requesting
+every GET URL once). Each file and each captured statement runs in a
+transaction that is rolled back, so DML is measured without changing data.
+
+Reports:
+  - filtered or repeated sequential scans that read at least --min-rows
+    rows, with the filtered columns they would need an index on
+  - foreign keys whose columns are not the leading columns of any index
+  - redundant indexes (same or prefix columns as another index on the table)
+  - indexes no analysed plan used (with their all-time idx_scan count)
+and writes a migration with the suggested CREATE/DROP INDEX statements.
+
+--save-baseline stores each plan's total cost and execution time;
+--baseline compares against it and exits non-zero on a regression.
+
+Usage:
+    python benchmarks/index_advisor.py --migration index_migration.sql
+    python benchmarks/index_advisor.py --save-baseline benchmarks/plan_baseline.json
+    python benchmarks/index_advisor.py --baseline benchmarks/plan_baseline.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+from psycopg2.extensions import quote_ident
+from sqlalchemy import event
+
+# run_benchmarks puts the project root on sys.path and sets up Django
+from run_benchmarks import FILE_SETUP, QUERIES_DIR, SKIPPED_FILES, URL_QUERY_STRINGS, sample_ids
+
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import URLPattern, reverse
+
+import database
+from models import Base
+from caregiving_app.urls import urlpatterns
+from run_queries import format_table, split_statements, strip_comments
+
+DEFAULT_MIN_ROWS = 1000
+# An index only pays off when the filter throws away most of the rows read
+SELECTIVE_FRACTION = 0.9
+DEFAULT_COST_THRESHOLD = 0.10
+DEFAULT_TIME_THRESHOLD = 0.50
+# Runtime differences below this many milliseconds are noise
+MIN_REGRESSION_MS = 1.0
+# Each statement is explained this many times and the fastest run is kept
+EXPLAIN_RUNS = 3
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'VALUES')
+INDEX_NODE_TYPES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+# Column references on the left of a comparison in a plan's Filter text,
+# e.g. "((status)::text = 'Completed'::text)" or "(member_user_id = 5)"
+FILTER_COLUMN = re.compile(r'\(*(?:\w+\.)?"?(\w+)"?\)*(?:::\w+(?: \w+)?)?\s*(?:=|<>|<=|>=|<|>|~~|= ANY)\s')
+
+INDEX_CATALOG = '''
+    SELECT ic.relname AS index_name, tc.relname AS table_name,
+           ARRAY(
+               SELECT a.attname::text FROM unnest(i.indkey) WITH ORDINALITY k(attnum, ord)
+               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+               ORDER BY k.ord
+           ) AS columns,
+           ARRAY(SELECT unnest(i.indclass)::int) AS opclasses,
+           i.indexprs IS NOT NULL OR i.indpred IS NOT NULL AS expression_or_partial,
+           i.indisunique, con.conname AS constraint_name,
+           COALESCE(s.idx_scan, 0) AS idx_scan, pg_relation_size(i.indexrelid) AS size_bytes
+    FROM pg_index i
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_class tc ON tc.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = tc.relnamespace
+    LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.contype IN ('p', 'u', 'x')
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.indexrelid
+    WHERE n.nspname = 'public' AND tc.relname = ANY(%(tables)s)
+    ORDER BY tc.relname, ic.relname
+'''
+
+FOREIGN_KEY_CATALOG = '''
+    SELECT c.relname AS table_name, con.conname,
+           ARRAY(
+               SELECT a.attname::text FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+               JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+               ORDER BY k.ord
+           ) AS columns
+    FROM pg_constraint con
+    JOIN pg_class c ON c.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE con.contype = 'f' AND n.nspname = 'public' AND c.relname = ANY(%(tables)s)
+    ORDER BY c.relname, con.conname
+'''
+
+TABLE_COLUMNS = '''
+    SELECT table_name, column_name FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = ANY(%(tables)s)
+'''
+
+
+def fetch_dicts(cursor, query, params=None):
+    cursor.execute(query, params)
+    names = [desc[0] for desc in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def statement_key(source, number, statement):
+    digest = hashlib.sha1(' '.join(statement.split()).encode()).hexdigest()[:12]
+    return f"{source}#{number}", digest
+
+
+def is_explainable(statement):
+    return strip_comments(statement).split(None, 1)[0].upper() in EXPLAINABLE
+
+
+def capture_view_statements():
+    """Request every GET URL once and collect the distinct SQL statements the views run"""
+    captured = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement not in captured:
+            captured[statement] = (current_url[0], parameters)
+
+    current_url = [None]
+    client = Client()
+    conn = database.engine.raw_connection()
+    event.listen(database.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        cursor = conn.cursor()
+        for pattern in urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name.endswith('_delete'):
+                continue
+            kwargs = {param: sample_ids(cursor, param, 1)[0] for param in pattern.pattern.converters}
+            current_url[0] = pattern.name
+            response = client.get(reverse(pattern.name, kwargs=kwargs) + URL_QUERY_STRINGS.get(pattern.name, ''))
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+    finally:
+        event.remove(database.engine, 'before_cursor_execute', before_cursor_execute)
+        conn.close()
+
+    statements, counters = [], {}
+    for statement, (url_name, parameters) in captured.items():
+        if url_name is None or not is_explainable(statement):
+            continue
+        counters[url_name] = counters.get(url_name, 0) + 1
+        statements.append((f"url:{url_name}", counters[url_name], statement, parameters))
+    return statements
+
+
+def file_statements():
+    """[(file name, [statements])] for every file in queries/"""
+    files = []
+    for name in sorted(os.listdir(QUERIES_DIR)):
+        if name.endswith('.sql') and name not in SKIPPED_FILES:
+            with open(os.path.join(QUERIES_DIR, name)) as f:
+                files.append((name, split_statements(f.read())))
+    return files
+
+
+def explain(cursor, statement, parameters=None, runs=EXPLAIN_RUNS):
+    """
+    EXPLAIN ANALYZE a statement several times and keep the fastest execution
+    time. Only the last run's changes are kept, so DML runs once in effect.
+    """
+    best = None
+    for run in range(runs):
+        if run < runs - 1:
+            cursor.execute('SAVEPOINT explain_run')
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement, parameters)
+        plan = cursor.fetchone()[0]
+        plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+        if run < runs - 1:
+            cursor.execute('ROLLBACK TO SAVEPOINT explain_run')
+        if best is None or plan['Execution Time'] < best['Execution Time']:
+            best = plan
+    return best
+
+
+def vacuum_analyze(conn, tables):
+    """
+    Fresh statistics and no dead tuples, so plan costs are comparable between
+    runs (EXPLAIN ANALYZE of rolled-back DML leaves dead rows behind)
+    """
+    conn.driver_connection.autocommit = True
+    try:
+        cursor = conn.cursor()
+        for table in tables:
+            cursor.execute(f"VACUUM ANALYZE {quote_ident(table, conn.driver_connection)}")
+    finally:
+        conn.driver_connection.autocommit = False
+
+
+def run_explains(conn):
+    """EXPLAIN ANALYZE every file statement and captured view statement; returns plan records"""
+    records = []
+    cursor = conn.cursor()
+
+    def record(source, number, statement, plan=None, error=None):
+        key, digest = statement_key(source, number, statement)
+        records.append({
+            'key': key, 'sha': digest, 'statement': ' '.join(strip_comments(statement).split()),
+            'plan': plan, 'error': error,
+        })
+
+    # Statements in a file may depend on earlier ones (e.g. CREATE VIEW, then
+    # SELECT from it), so each file runs in order inside one transaction.
+    for name, statements in file_statements():
+        for statement in FILE_SETUP.get(name, []):
+            cursor.execute(statement)
+        number = 0
+        for statement in statements:
+            cursor.execute('SAVEPOINT advisor')
+            try:
+                if is_explainable(statement):
+                    number += 1
+                    record(f"file:{name}", number, statement, plan=explain(cursor, statement))
+                else:
+                    cursor.execute(statement)
+                cursor.execute('RELEASE SAVEPOINT advisor')
+            except Exception as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT advisor')
+                if is_explainable(statement):
+                    record(f"file:{name}", number, statement, error=str(e).strip().splitlines()[0])
+        conn.rollback()
+
+    for source, number, statement, parameters in capture_view_statements():
+        try:
+            record(source, number, statement, plan=explain(cursor, statement, parameters))
+        except Exception as e:
+            record(source, number, statement, error=str(e).strip().splitlines()[0])
+        finally:
+            conn.rollback()
+    return records
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def find_seq_scans(records, table_columns, min_rows):
+    """Filtered or repeated sequential scans reading at least min_rows rows"""
+    scans = []
+    for rec in records:
+        if not rec['plan']:
+            continue
+        for node in walk(rec['plan']['Plan']):
+            if node['Node Type'] != 'Seq Scan':
+                continue
+            loops = node.get('Actual Loops', 1)
+            rows_read = (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+            # An unfiltered single pass is what a hash join or aggregate over
+            # the whole table needs; only filtered or repeated scans could use an index
+            if rows_read < min_rows or ('Filter' not in node and loops == 1):
+                continue
+            relation = node['Relation Name']
+            removed = node.get('Rows Removed by Filter', 0) * loops
+            columns = []
+            for column in FILTER_COLUMN.findall(node.get('Filter', '')):
+                if column in table_columns.get(relation, set()) and column not in columns:
+                    columns.append(column)
+            scans.append({
+                'key': rec['key'], 'relation': relation, 'rows_read': rows_read, 'loops': loops,
+                'time_ms': node.get('Actual Total Time', 0) * loops, 'filter': node.get('Filter', ''),
+                'columns': columns, 'selective': removed >= SELECTIVE_FRACTION * rows_read,
+            })
+    return scans
+
+
+def used_index_names(records):
+    names = set()
+    for rec in records:
+        if rec['plan']:
+            for node in walk(rec['plan']['Plan']):
+                if node['Node Type'] in INDEX_NODE_TYPES:
+                    names.add(node['Index Name'])
+    return names
+
+
+def find_redundant_indexes(indexes):
+    """(index, covering index, reason) for indexes another index on the same table makes unnecessary"""
+    redundant = []
+    plain = [ix for ix in indexes if not ix['expression_or_partial']]
+    for ix in plain:
+        if ix['constraint_name']:
+            continue
+        for other in plain:
+            if other is ix or other['table_name'] != ix['table_name']:
+                continue
+            n = len(ix['columns'])
+            same_prefix = (
+                other['columns'][:n] == ix['columns']
+                and other['opclasses'][:n] == ix['opclasses']
+            )
+            if not same_prefix:
+                continue
+            if len(other['columns']) == n:
+                # Identical definitions: keep the constraint's index, or the first by name
+                if other['constraint_name'] or other['index_name'] < ix['index_name']:
+                    redundant.append((ix, other, 'same columns'))
+                    break
+            else:
+                if ix['indisunique']:
+                    continue
+                redundant.append((ix, other, 'leading columns of'))
+                break
+    return redundant
+
+
+def find_unindexed_foreign_keys(foreign_keys, indexes):
+    unindexed = []
+    for fk in foreign_keys:
+        n = len(fk['columns'])
+        covered = any(
+            ix['table_name'] == fk['table_name'] and not ix['expression_or_partial']
+            and sorted(ix['columns'][:n]) == sorted(fk['columns'])
+            for ix in indexes
+        )
+        if not covered:
+            unindexed.append(fk)
+    return unindexed
+
+
+def index_name(table, columns):
+    return f"idx_{table}_{'_'.join(columns)}"
+
+
+def build_migration(conn, unindexed_fks, seq_scans, redundant, unused, existing):
+    """SQL text with the suggested index changes"""
+    quote = lambda name: quote_ident(name, conn.driver_connection)
+    lines = [
+        f"-- Index suggestions from benchmarks/index_advisor.py, {datetime.now():%Y-%m-%d %H:%M}",
+        "-- CONCURRENTLY cannot run inside a transaction: apply with psql, not in a BEGIN block.",
+        "",
+    ]
+    suggested = set()
+
+    def create(table, columns, comment):
+        key = (table, tuple(columns))
+        covered = any(
+            ix['table_name'] == table and ix['columns'][:len(columns)] == list(columns)
+            for ix in existing
+        )
+        if key in suggested or covered:
+            return
+        suggested.add(key)
+        lines.append(f"-- {comment}")
+        lines.append(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(index_name(table, columns))} "
+            f"ON {quote(table)} ({', '.join(quote(c) for c in columns)});"
+        )
+
+    for fk in unindexed_fks:
+        create(fk['table_name'], fk['columns'], f"foreign key {fk['conname']} has no supporting index")
+    for scan in seq_scans:
+        if scan['columns'] and scan['selective']:
+            create(scan['relation'], scan['columns'],
+                   f"sequential scan in {scan['key']} read {scan['rows_read']:,} rows")
+    for ix, other, reason in redundant:
+        lines.append(f"-- {ix['index_name']}: {reason} {other['index_name']}")
+        lines.append(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(ix['index_name'])};")
+    if unused:
+        lines += ["", "-- Not used by any analysed plan; review before dropping"]
+        for ix in unused:
+            lines.append(f"-- DROP INDEX CONCURRENTLY IF EXISTS {quote(ix['index_name'])};")
+    if len(lines) == 3:
+        lines.append("-- No changes suggested")
+    return "\n".join(lines) + "\n"
+
+
+def plan_metrics(records):
+    return {
+        rec['key']: {
+            'sha': rec['sha'],
+            'total_cost': rec['plan']['Plan']['Total Cost'],
+            'execution_ms': rec['plan']['Execution Time'],
+            'statement': rec['statement'][:200],
+        }
+        for rec in records if rec['plan']
+    }
+
+
+def compare_with_baseline(metrics, baseline, cost_threshold, time_threshold):
+    """Print changed plans and return the keys that regressed"""
+    rows, regressions = [], []
+    for key, now in metrics.items():
+        before = baseline.get(key)
+        if before is None or before['sha'] != now['sha']:
+            continue
+        cost_change = (now['total_cost'] - before['total_cost']) / before['total_cost'] if before['total_cost'] else 0
+        time_change = (
+            (now['execution_ms'] - before['execution_ms']) / before['execution_ms'] if before['execution_ms'] else 0
+        )
+        cost_regressed = cost_change > cost_threshold
+        time_regressed = (
+            time_change > time_threshold and now['execution_ms'] - before['execution_ms'] > MIN_REGRESSION_MS
+        )
+        if cost_regressed or time_regressed:
+            regressions.append(key)
+            rows.append([
+                key, f"{before['total_cost']:.1f}", f"{now['total_cost']:.1f}", f"{cost_change:+.0%}",
+                f"{before['execution_ms']:.2f}", f"{now['execution_ms']:.2f}", f"{time_change:+.0%}",
+            ])
+    if rows:
+        print(format_table(['Statement', 'Base cost', 'Cost', 'Δ', 'Base ms', 'ms', 'Δ'], rows))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN-driven index advisor and plan-regression check')
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+                        help=f'report sequential scans reading at least this many rows (default {DEFAULT_MIN_ROWS})')
+    parser.add_argument('--migration', default='index_migration.sql',
+                        help='where to write suggested index changes (default index_migration.sql)')
+    parser.add_argument('--save-baseline', metavar='FILE', help='store plan costs and timings')
+    parser.add_argument('--baseline', metavar='FILE', help='fail if plans regress against this file')
+    parser.add_argument('--cost-threshold', type=float, default=DEFAULT_COST_THRESHOLD,
+                        help=f'allowed plan cost increase (default {DEFAULT_COST_THRESHOLD:.0%})')
+    parser.add_argument('--time-threshold', type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help=f'allowed execution time increase (default {DEFAULT_TIME_THRESHOLD:.0%})')
+    args = parser.parse_args()
+
+    database.engine.echo = False
+    setup_test_environment()
+    conn = database.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        # Only the application's tables, not Django's auth/session tables
+        params = {'tables': list(Base.metadata.tables)}
+        indexes = fetch_dicts(cursor, INDEX_CATALOG, params)
+        foreign_keys = fetch_dicts(cursor, FOREIGN_KEY_CATALOG, params)
+        table_columns = {}
+        for row in fetch_dicts(cursor, TABLE_COLUMNS, params):
+            table_columns.setdefault(row['table_name'], set()).add(row['column_name'])
+        conn.rollback()
+        vacuum_analyze(conn, params['tables'])
+
+        print('Running EXPLAIN (ANALYZE, BUFFERS) over queries/ and view SQL...')
+        records = run_explains(conn)
+        analysed = sum(1 for r in records if r['plan'])
+        print(f"  {analysed} statements analysed, {len(records) - analysed} failed")
+        for rec in records:
+            if rec['error']:
+                print(f"  ✗ {rec['key']}: {rec['error']}")
+
+        seq_scans = find_seq_scans(records, table_columns, args.min_rows)
+        unindexed_fks = find_unindexed_foreign_keys(foreign_keys, indexes)
+        redundant = find_redundant_indexes(indexes)
+        redundant_names = {ix['index_name'] for ix, _, _ in redundant}
+        used = used_index_names(records)
+        unused = [
+            ix for ix in indexes
+            if ix['index_name'] not in used and not ix['constraint_name'] and ix['index_name'] not in redundant_names
+        ]
+
+        print(f"\nSequential scans reading ≥ {args.min_rows:,} rows:")
+        print(format_table(
+            ['Statement', 'Table', 'Rows read', 'Loops', 'Time ms', 'Filter columns', 'Selective'],
+            [[s['key'], s['relation'], s['rows_read'], s['loops'], f"{s['time_ms']:.2f}",
+              ', '.join(s['columns']), 'yes' if s['selective'] else 'no'] for s in seq_scans],
+        ))
+        print("\nForeign keys without a supporting index:")
+        print(format_table(
+            ['Table', 'Constraint', 'Columns'],
+            [[fk['table_name'], fk['conname'], ', '.join(fk['columns'])] for fk in unindexed_fks],
+        ))
+        print("\nRedundant indexes:")
+        print(format_table(
+            ['Index', 'Table', 'Reason', 'Covered by'],
+            [[ix['index_name'], ix['table_name'], reason, other['index_name']] for ix, other, reason in redundant],
+        ))
+        print("\nIndexes unused by the analysed statements:")
+        print(format_table(
+            ['Index', 'Table', 'idx_scan (all time)', 'Size KB'],
+            [[ix['index_name'], ix['table_name'], ix['idx_scan'], ix['size_bytes'] // 1024] for ix in unused],
+        ))
+
+        with open(args.migration, 'w') as f:
+            f.write(build_migration(conn, unindexed_fks, seq_scans, redundant, unused, indexes))
+        print(f"\nSuggested migration written to {args.migration}")
+    finally:
+        conn.close()
+
+    metrics = plan_metrics(records)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(metrics, f, indent=2)
+        print(f"Plan baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nPlan comparison with {args.baseline}:")
+        regressions = compare_with_baseline(metrics, baseline, args.cost_threshold, args.time_threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} plan regression(s)")
+            sys.exit(1)
+        print('✓ No plan regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the web views and the SQL files in queries/
+
+Seeds a local database with synthetic data at a chosen scale, then times
+every GET URL in caregiving_app/urls.py (through Django's test client, so
+middleware, templates and the cache are included) and every file in
+queries/. Results (p50/p95/p99 latency, SQL statements per request, peak
+RSS) are saved as JSON; pass --compare to flag regressions against an
+earlier run.
+
+Usage:
+    python benchmarks/run_benchmarks.py --seed --scale 100k
+    python benchmarks/run_benchmarks.py --iterations 50 --compare benchmarks/results/baseline.json
+
+--seed DROPS AND RECREATES ALL TABLES. Point DATABASE_URL / DB_* at a
+scratch database first.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'caregiving_project.settings')
+
+import django
+
+django.setup()
+
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import URLPattern, reverse
+
+import database
+from caregiving_app.urls import urlpatterns
+from run_queries import format_table, split_statements
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+DEFAULT_ITERATIONS = 20
+DEFAULT_THRESHOLD = 0.20
+# Differences below this many milliseconds are noise, whatever the ratio
+MIN_REGRESSION_MS = 1.0
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+QUERIES_DIR = os.path.join(ROOT, 'queries')
+
+# Synthetic data, sized by the number of users. Of every five users two are
+# caregivers and two are members; each member has an address and posts a
+# job, each job gets three applications and there is one appointment per user.
+# A caregiver's appointments land on different days (the caregiver count is
+# never a multiple of 365), so they satisfy the no-overlap constraint.
+# '%%' is a literal modulo: the statements go through psycopg2 parameters.
+SEED_STATEMENTS = [
+    '''
+    INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
+    SELECT 'user' || g || '@bench.example',
+           (ARRAY['Aigerim', 'Arman', 'Dana', 'John', 'Maria', 'Timur', 'Sara', 'Nurlan'])[1 + g %% 8],
+           'Surname' || (g %% 5000),
+           (ARRAY['Almaty', 'Astana', 'Shymkent', 'Karaganda'])[1 + g %% 4],
+           '+7700' || lpad((g %% 10000000)::text, 7, '0'),
+           'Synthetic benchmark profile ' || g,
+           'bench_password'
+    FROM generate_series(1, %(users)s) g
+    ''',
+    '''
+    INSERT INTO caregiver (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
+    SELECT user_id, 'photos/' || user_id || '.jpg',
+           (ARRAY['Male', 'Female', 'Other', 'Prefer not to say'])[1 + user_id %% 4],
+           (ARRAY['Elderly Care', 'Child Care', 'Medical Care'])[1 + user_id %% 3],
+           1500 + (user_id * 37) %% 2500
+    FROM "user" WHERE user_id %% 5 IN (1, 2)
+    ''',
+    '''
+    INSERT INTO member (member_user_id, house_rules, dependent_description)
+    SELECT user_id, 'No smoking', 'Dependent of member ' || user_id
+    FROM "user" WHERE user_id %% 5 IN (3, 4)
+    ''',
+    '''
+    INSERT INTO address (member_user_id, house_number, street, town)
+    SELECT member_user_id, (member_user_id %% 200)::text, 'Abay Avenue', 'Almaty'
+    FROM member
+    ''',
+    '''
+    INSERT INTO job (member_user_id, required_caregiving_type, other_requirements, date_posted)
+    SELECT member_user_id, (ARRAY['Elderly Care', 'Child Care', 'Medical Care'])[1 + member_user_id %% 3],
+           'Synthetic requirements', DATE '2024-01-01' + (member_user_id %% 700)
+    FROM member
+    ''',
+    '''
+    CREATE TEMP TABLE bench_caregiver AS
+    SELECT row_number() OVER (ORDER BY caregiver_user_id) - 1 AS k, caregiver_user_id FROM caregiver
+    ''',
+    '''
+    CREATE TEMP TABLE bench_member AS
+    SELECT row_number() OVER (ORDER BY member_user_id) - 1 AS k, member_user_id FROM member
+    ''',
+    '''
+    INSERT INTO job_application (caregiver_user_id, job_id, date_applied)
+    SELECT c.caregiver_user_id, j.job_id, j.date_posted + 1 + i
+    FROM job j
+    CROSS JOIN generate_series(0, 2) i
+    JOIN bench_caregiver c
+      ON c.k = (j.job_id * 7 + i * 13) %% (SELECT count(*) FROM bench_caregiver)
+    ''',
+    '''
+    INSERT INTO appointment (caregiver_user_id, member_user_id, appointment_date, appointment_time, work_hours, status)
+    SELECT c.caregiver_user_id, m.member_user_id, DATE '2024-01-01' + (g %% 730),
+           TIME '08:00' + (g %% 10) * INTERVAL '1 hour', 1 + g %% 8,
+           (ARRAY['Scheduled', 'Confirmed', 'Completed', 'Cancelled'])[1 + g %% 4]
+    FROM generate_series(1, %(users)s) g
+    JOIN bench_caregiver c ON c.k = g %% (SELECT count(*) FROM bench_caregiver)
+    JOIN bench_member m ON m.k = (g * 7) %% (SELECT count(*) FROM bench_member)
+    ''',
+]
+
+# Untimed statements run before a file, inside its rolled-back transaction,
+# so files that create objects the seeded database already has still run.
+FILE_SETUP = {
+    'create_view.sql': ['DROP MATERIALIZED VIEW IF EXISTS job_applications_view'],
+}
+
+# Files that cannot run against a populated database, with the reason
+SKIPPED_FILES = {
+    'insert_data.sql': 'inserts sample rows with fixed ids that assume an empty database',
+}
+
+# Sample ids for URL parameters, drawn fresh for every iteration so detail
+# pages are measured mostly as cache misses
+URL_PARAM_SOURCES = {
+    'user_id': 'SELECT user_id FROM "user" ORDER BY random() LIMIT %s',
+    'caregiver_id': 'SELECT caregiver_user_id FROM caregiver ORDER BY random() LIMIT %s',
+    'member_id': 'SELECT member_user_id FROM member ORDER BY random() LIMIT %s',
+    'job_id': 'SELECT job_id FROM job ORDER BY random() LIMIT %s',
+    'appointment_id': 'SELECT appointment_id FROM appointment ORDER BY random() LIMIT %s',
+}
+
+# Fixed kwargs for URL parameters that are not ids, and the id source for
+# generic ones (the API's <pk> is a job id because resource_name is jobs)
+URL_FIXED_KWARGS = {
+    'api_collection': {'resource_name': 'jobs'},
+    'api_item': {'resource_name': 'jobs'},
+}
+URL_PARAM_ALIASES = {
+    ('api_item', 'pk'): 'job_id',
+}
+
+# Query strings for endpoints that need one to do representative work
+URL_QUERY_STRINGS = {
+    'lookup_available_users': '?q=ar',
+    'lookup_members': '?q=ma',
+    'lookup_caregivers': '?q=jo',
+    'search': '?q=care&scope=jobs',
+    'search_api': '?q=experienced&scope=caregivers',
+    'export_appointments': '?start=2024-03-01&end=2024-03-31',
+    'export_jobs': '?start=2024-03-01&end=2024-03-31',
+    'export_job_applications': '?start=2024-03-01&end=2024-03-31',
+}
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(timings_ms):
+    return {
+        'p50_ms': round(percentile(timings_ms, 50), 3),
+        'p95_ms': round(percentile(timings_ms, 95), 3),
+        'p99_ms': round(percentile(timings_ms, 99), 3),
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 3),
+        'samples': len(timings_ms),
+    }
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(users):
+    """Recreate the schema and fill it with synthetic data for the given number of users"""
+    print(f"Seeding {users:,} users (schema.sql drops all tables)...")
+    started = time.perf_counter()
+    conn = database.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for path in (os.path.join(ROOT, 'schema.sql'), os.path.join(QUERIES_DIR, 'create_view.sql')):
+            with open(path) as f:
+                for statement in split_statements(f.read()):
+                    cursor.execute(statement)
+        for statement in SEED_STATEMENTS:
+            cursor.execute(statement, {'users': users})
+        # Seeded appointments span two past years: give each month its partition
+        cursor.execute('SELECT create_appointment_partitions()')
+        # Counters and the earnings rollup are kept by triggers; rebuild the
+        # rollup once anyway so a seed never depends on trigger ordering.
+        cursor.execute('SELECT rebuild_caregiver_earnings()')
+        conn.commit()
+        # VACUUM refuses to run inside a transaction block
+        conn.driver_connection.autocommit = True
+        try:
+            cursor.execute('VACUUM ANALYZE')
+        finally:
+            conn.driver_connection.autocommit = False
+    finally:
+        conn.close()
+    print(f"  ✓ Seeded in {time.perf_counter() - started:.1f}s")
+
+
+def count_users():
+    conn = database.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT count(*) FROM "user"')
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def sample_ids(cursor, param, count):
+    cursor.execute(URL_PARAM_SOURCES[param], (count,))
+    ids = [row[0] for row in cursor.fetchall()]
+    return ids or [1]
+
+
+def benchmark_urls(iterations, only=None):
+    """Time GET requests to every URL pattern; returns {url name: stats}"""
+    client = Client()
+    conn = database.engine.raw_connection()
+    results = {}
+    try:
+        cursor = conn.cursor()
+        for pattern in urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name.endswith('_delete'):
+                continue
+            if only and not re.search(only, pattern.name):
+                continue
+            fixed = URL_FIXED_KWARGS.get(pattern.name, {})
+            sources = {
+                param: URL_PARAM_ALIASES.get((pattern.name, param), param)
+                for param in pattern.pattern.converters if param not in fixed
+            }
+            unknown = sorted(param for param, source in sources.items() if source not in URL_PARAM_SOURCES)
+            if unknown:
+                results[pattern.name] = {'skipped': f"no sample values for {', '.join(unknown)}"}
+                print(f"  {pattern.name:<28} skipped: {results[pattern.name]['skipped']}")
+                continue
+            params = list(sources)
+            ids = {param: sample_ids(cursor, source, iterations) for param, source in sources.items()}
+            query_string = URL_QUERY_STRINGS.get(pattern.name, '')
+
+            timings, query_counts, statuses, rss_peak = [], [], set(), 0.0
+            for i in range(iterations):
+                kwargs = {**fixed, **{param: ids[param][i % len(ids[param])] for param in params}}
+                url = reverse(pattern.name, kwargs=kwargs) + query_string
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses.add(response.status_code)
+                match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+                if match:
+                    query_counts.append(int(match.group(1)))
+                rss_peak = max(rss_peak, rss_mb())
+
+            stats = summarize(timings)
+            stats['queries_per_request'] = max(query_counts) if query_counts else None
+            stats['rss_mb'] = round(rss_peak, 1)
+            stats['status'] = sorted(statuses)
+            results[pattern.name] = stats
+            print(f"  {pattern.name:<28} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                  f"queries {stats['queries_per_request']}  status {stats['status']}")
+    finally:
+        conn.close()
+    return results
+
+
+def benchmark_sql_files(iterations, only=None):
+    """
+    Time every file in queries/, each iteration in a transaction that is
+    rolled back so DML and DDL files leave the data untouched.
+    """
+    conn = database.engine.raw_connection()
+    results = {}
+    try:
+        cursor = conn.cursor()
+        for name in sorted(os.listdir(QUERIES_DIR)):
+            if not name.endswith('.sql') or (only and not re.search(only, name)):
+                continue
+            if name in SKIPPED_FILES:
+                results[name] = {'skipped': SKIPPED_FILES[name]}
+                print(f"  {name:<28} skipped: {SKIPPED_FILES[name]}")
+                continue
+            with open(os.path.join(QUERIES_DIR, name)) as f:
+                statements = split_statements(f.read())
+
+            timings, error = [], None
+            for _ in range(iterations):
+                try:
+                    for statement in FILE_SETUP.get(name, []):
+                        cursor.execute(statement)
+                    started = time.perf_counter()
+                    for statement in statements:
+                        cursor.execute(statement)
+                        if cursor.description:
+                            cursor.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                except Exception as e:
+                    error = str(e).strip().splitlines()[0]
+                    break
+                finally:
+                    conn.rollback()
+
+            if error:
+                results[name] = {'error': error}
+                print(f"  {name:<28} ✗ {error}")
+                continue
+            results[name] = summarize(timings)
+            results[name]['statements'] = len(statements)
+            print(f"  {name:<28} p50 {results[name]['p50_ms']:>9.2f}ms  p95 {results[name]['p95_ms']:>9.2f}ms")
+    finally:
+        conn.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print p95 changes against a baseline run; returns the regressed entries"""
+    rows, regressions = [], []
+    for section in ('urls', 'sql_files'):
+        for name, stats in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not base or 'p95_ms' not in stats or 'p95_ms' not in base:
+                continue
+            before, after = base['p95_ms'], stats['p95_ms']
+            change = (after - before) / before if before else 0.0
+            regressed = change > threshold and after - before > MIN_REGRESSION_MS
+            if regressed:
+                regressions.append(name)
+            rows.append([
+                section, name, f"{before:.2f}", f"{after:.2f}", f"{change:+.0%}",
+                'REGRESSION' if regressed else '',
+            ])
+    print(format_table(['Section', 'Name', 'Base p95 ms', 'p95 ms', 'Change', ''], rows))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the web views and SQL files')
+    parser.add_argument('--seed', action='store_true',
+                        help='recreate the schema and load synthetic data first (destroys existing data)')
+    parser.add_argument('--scale', default='10k',
+                        help=f"users to seed: {', '.join(SCALES)} or a number (default 10k)")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS,
+                        help=f'requests per URL and runs per SQL file (default {DEFAULT_ITERATIONS})')
+    parser.add_argument('--only', help='regex; only benchmark URL names / SQL files matching it')
+    parser.add_argument('--skip-urls', action='store_true', help='do not benchmark URLs')
+    parser.add_argument('--skip-sql', action='store_true', help='do not benchmark queries/*.sql')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'p95 slowdown that counts as a regression (default {DEFAULT_THRESHOLD:.0%})')
+    args = parser.parse_args()
+
+    try:
+        users = SCALES[args.scale.lower()] if args.scale.lower() in SCALES else int(args.scale)
+    except ValueError:
+        parser.error(f'invalid scale: {args.scale}')
+
+    # Statement echo and per-request log lines would dominate the timings
+    database.engine.echo = False
+    logging.getLogger('caregiving_app.db').setLevel(logging.WARNING)
+    setup_test_environment()
+
+    if args.seed:
+        seed(users)
+
+    results = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'users': count_users(),
+            'iterations': args.iterations,
+            'cache_backend': os.getenv('CACHE_BACKEND', 'locmem'),
+        },
+    }
+    print(f"\nBenchmarking against {results['meta']['users']:,} users, {args.iterations} iterations")
+
+    if not args.skip_urls:
+        print('\nURLs:')
+        results['urls'] = benchmark_urls(args.iterations, args.only)
+    if not args.skip_sql:
+        print('\nSQL files:')
+        results['sql_files'] = benchmark_sql_files(args.iterations, args.only)
+    results['meta']['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    print(f"\nPeak RSS: {results['meta']['peak_rss_mb']} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print('\n✓ No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Bulk import of users, roles, jobs and appointments using PostgreSQL COPY
+
+Each input file (CSV with a header row, or JSONL with one object per line) is
+streamed with COPY into a temporary staging table of text columns. Once every
+file is staged, the whole batch is validated with set-based queries: types,
+lengths, NOT NULL, the CHECK constraints from schema.sql, duplicates and
+foreign keys. Foreign keys are given as natural keys: users are referenced by
+email, and jobs by a job_ref chosen by the partner and unique within the
+batch. Only a fully valid batch is loaded, with one INSERT ... SELECT per
+table, in a single transaction.
+
+Usage:
+    python bulk_import.py --users users.csv --caregivers caregivers.jsonl ...
+    python bulk_import.py --dir partner_export/   (picks up <name>.csv / <name>.jsonl)
+    python bulk_import.py --dir partner_export/ --dry-run
+
+Input columns:
+    users:         email, given_name, surname, city, phone_number, profile_description, password
+    caregivers:    email, photo, gender, caregiving_type, hourly_rate
+    members:       email, house_rules, dependent_description
+    addresses:     member_email, house_number, street, town
+    jobs:          job_ref, member_email, required_caregiving_type, other_requirements, date_posted
+    applications:  caregiver_email, job_ref, date_applied
+    appointments:  caregiver_email, member_email, appointment_date, appointment_time, work_hours, status
+
+Type validation uses pg_input_is_valid(), available from PostgreSQL 16.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+from dotenv import load_dotenv
+from sqlalchemy.dialects import postgresql
+
+from models import (
+    User, Caregiver, Member, Address, Job, JobApplication, Appointment,
+    GENDERS, APPOINTMENT_STATUSES,
+)
+
+load_dotenv()
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _sql_list(values):
+    return ', '.join("'" + v.replace("'", "''") + "'" for v in values)
+
+
+# Natural-key lookups for foreign key checks: the existing rows, then the rows
+# staged in this batch, so a file may reference users created by another file.
+# Each is a correlated EXISTS body with a {} for the referencing value.
+KNOWN_USERS = (
+    'SELECT 1 FROM "user" u WHERE u.email = {}',
+    'SELECT 1 FROM stage_users k WHERE k.email = {}',
+)
+KNOWN_CAREGIVERS = (
+    'SELECT 1 FROM caregiver c JOIN "user" u ON u.user_id = c.caregiver_user_id WHERE u.email = {}',
+    'SELECT 1 FROM stage_caregivers k WHERE k.email = {}',
+)
+KNOWN_MEMBERS = (
+    'SELECT 1 FROM member m JOIN "user" u ON u.user_id = m.member_user_id WHERE u.email = {}',
+    'SELECT 1 FROM stage_members k WHERE k.email = {}',
+)
+KNOWN_JOBS = ('SELECT 1 FROM stage_jobs k WHERE k.job_ref = {}',)
+
+
+def _unknown(column, known):
+    """
+    Failing condition of a foreign key check: a value found in none of the
+    known key sets. NOT EXISTS plans as a hash or index anti-join at any batch
+    size, where NOT IN over a subquery larger than work_mem is re-scanned for
+    every staged row. A missing value is left to the 'is required' check.
+    """
+    value = f's.{column}'
+    return f'{value} IS NOT NULL AND ' + ' AND '.join(f'NOT EXISTS ({query.format(value)})' for query in known)
+
+
+def _booked_range(alias):
+    """Time range of a staged appointment, as computed for appointment.time_range"""
+    start = f'{alias}.appointment_date::date + {alias}.appointment_time::time'
+    return f"tsrange({start}, {start} + {alias}.work_hours::numeric * INTERVAL '1 hour')"
+
+
+def _bookable(alias):
+    """True when a staged appointment is well-typed and takes up the caregiver's time"""
+    return (
+        f"pg_input_is_valid({alias}.appointment_date, 'date') "
+        f"AND pg_input_is_valid({alias}.appointment_time, 'time') "
+        f"AND pg_input_is_valid({alias}.work_hours, 'numeric') AND {alias}.work_hours::numeric > 0 "
+        f"AND COALESCE({alias}.status, 'Scheduled') <> 'Cancelled'"
+    )
+
+
+# Mirror the appointment_no_overlap exclusion constraints, so a double booking
+# is reported per row instead of failing the whole load. The date bound keeps
+# each probe to the partitions an overlapping appointment can be in (work_hours
+# stays under 42 days).
+OVERLAPS_EXISTING = f'''CASE WHEN {_bookable('s')} THEN EXISTS (
+        SELECT 1 FROM appointment a JOIN "user" u ON u.user_id = a.caregiver_user_id
+        WHERE u.email = s.caregiver_email AND a.status <> 'Cancelled'
+          AND a.time_range && {_booked_range('s')}
+          AND a.appointment_date BETWEEN s.appointment_date::date - 42
+                                     AND upper({_booked_range('s')})::date) END'''
+OVERLAPS_STAGED = f'''CASE WHEN {_bookable('s')} THEN EXISTS (
+        SELECT 1 FROM stage_appointments o
+        WHERE o.caregiver_email = s.caregiver_email AND o.line_no <> s.line_no
+          AND CASE WHEN {_bookable('o')} THEN {_booked_range('o')} && {_booked_range('s')} END) END'''
+
+# Import specs in load order. 'columns' maps input columns to the model
+# column whose type, length and nullability they must satisfy; 'checks' are
+# extra (message, column, failing condition) rules; 'load' is the INSERT that
+# resolves natural keys and moves the staged rows into the real table.
+IMPORT_SPECS = [
+    {
+        'name': 'users',
+        'columns': {
+            'email': User.email,
+            'given_name': User.given_name,
+            'surname': User.surname,
+            'city': User.city,
+            'phone_number': User.phone_number,
+            'profile_description': User.profile_description,
+            'password': User.password,
+        },
+        'unique': ['email'],
+        # Caregiver and member rows refer to users by email, so a clash with
+        # an existing user is an error rather than a skipped row: they would
+        # otherwise attach to that user.
+        'checks': [
+            ('a user with this email already exists', 'email',
+             'EXISTS (SELECT 1 FROM "user" u WHERE u.email = s.email)'),
+        ],
+        'load': '''
+            INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
+            SELECT email, given_name, surname, city, phone_number, profile_description, password
+            FROM stage_users
+        ''',
+    },
+    {
+        'name': 'caregivers',
+        'columns': {
+            'email': User.email,
+            'photo': Caregiver.photo,
+            'gender': Caregiver.gender,
+            'caregiving_type': Caregiver.caregiving_type,
+            'hourly_rate': Caregiver.hourly_rate,
+        },
+        'unique': ['email'],
+        'checks': [
+            (f'gender must be one of {", ".join(GENDERS)}', 'gender',
+             f'gender IS NOT NULL AND gender NOT IN ({_sql_list(GENDERS)})'),
+            ('hourly_rate must not be negative', 'hourly_rate',
+             "CASE WHEN pg_input_is_valid(hourly_rate, 'numeric') THEN hourly_rate::numeric < 0 END"),
+            ('no user with this email', 'email', _unknown('email', KNOWN_USERS)),
+            ('user is already a caregiver', 'email', '''EXISTS (
+                SELECT 1 FROM caregiver c JOIN "user" u ON u.user_id = c.caregiver_user_id
+                WHERE u.email = s.email)'''),
+        ],
+        'load': '''
+            INSERT INTO caregiver (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
+            SELECT u.user_id, s.photo, s.gender, s.caregiving_type, s.hourly_rate::numeric
+            FROM stage_caregivers s
+            JOIN "user" u ON u.email = s.email
+        ''',
+    },
+    {
+        'name': 'members',
+        'columns': {
+            'email': User.email,
+            'house_rules': Member.house_rules,
+            'dependent_description': Member.dependent_description,
+        },
+        'unique': ['email'],
+        'checks': [
+            ('no user with this email', 'email', _unknown('email', KNOWN_USERS)),
+            ('user is already a member', 'email', '''EXISTS (
+                SELECT 1 FROM member m JOIN "user" u ON u.user_id = m.member_user_id
+                WHERE u.email = s.email)'''),
+        ],
+        'load': '''
+            INSERT INTO member (member_user_id, house_rules, dependent_description)
+            SELECT u.user_id, s.house_rules, s.dependent_description
+            FROM stage_members s
+            JOIN "user" u ON u.email = s.email
+        ''',
+    },
+    {
+        'name': 'addresses',
+        'columns': {
+            'member_email': User.email,
+            'house_number': Address.house_number,
+            'street': Address.street,
+            'town': Address.town,
+        },
+        'unique': [],
+        'checks': [
+            ('no member with this email', 'member_email', _unknown('member_email', KNOWN_MEMBERS)),
+        ],
+        'load': '''
+            INSERT INTO address (member_user_id, house_number, street, town)
+            SELECT u.user_id, s.house_number, s.street, s.town
+            FROM stage_addresses s
+            JOIN "user" u ON u.email = s.member_email
+        ''',
+    },
+    {
+        'name': 'jobs',
+        'columns': {
+            'job_ref': None,
+            'member_email': User.email,
+            'required_caregiving_type': Job.required_caregiving_type,
+            'other_requirements': Job.other_requirements,
+            'date_posted': Job.date_posted,
+        },
+        'unique': ['job_ref'],
+        'checks': [
+            ('job_ref is required', 'job_ref', "job_ref IS NULL OR job_ref = ''"),
+            ('no member with this email', 'member_email', _unknown('member_email', KNOWN_MEMBERS)),
+        ],
+        # Ids are drawn from the job sequence up front so applications can be
+        # joined to their job by job_ref.
+        'load': '''
+            UPDATE stage_jobs SET job_id = nextval(pg_get_serial_sequence('job', 'job_id'));
+            INSERT INTO job (job_id, member_user_id, required_caregiving_type, other_requirements, date_posted)
+            SELECT s.job_id, u.user_id, s.required_caregiving_type, s.other_requirements, s.date_posted::date
+            FROM stage_jobs s
+            JOIN "user" u ON u.email = s.member_email
+        ''',
+    },
+    {
+        'name': 'applications',
+        'columns': {
+            'caregiver_email': User.email,
+            'job_ref': None,
+            'date_applied': JobApplication.date_applied,
+        },
+        'unique': ['caregiver_email', 'job_ref'],
+        'checks': [
+            ('job_ref is required', 'job_ref', "job_ref IS NULL OR job_ref = ''"),
+            ('no caregiver with this email', 'caregiver_email', _unknown('caregiver_email', KNOWN_CAREGIVERS)),
+            ('no job with this job_ref in the batch', 'job_ref', _unknown('job_ref', KNOWN_JOBS)),
+        ],
+        'load': '''
+            INSERT INTO job_application (caregiver_user_id, job_id, date_applied)
+            SELECT u.user_id, j.job_id, s.date_applied::date
+            FROM stage_applications s
+            JOIN "user" u ON u.email = s.caregiver_email
+            JOIN stage_jobs j ON j.job_ref = s.job_ref
+        ''',
+    },
+    {
+        'name': 'appointments',
+        'columns': {
+            'caregiver_email': User.email,
+            'member_email': User.email,
+            'appointment_date': Appointment.appointment_date,
+            'appointment_time': Appointment.appointment_time,
+            'work_hours': Appointment.work_hours,
+            'status': Appointment.status,
+        },
+        'unique': [],
+        'checks': [
+            (f'status must be one of {", ".join(APPOINTMENT_STATUSES)}', 'status',
+             f'status IS NOT NULL AND status NOT IN ({_sql_list(APPOINTMENT_STATUSES)})'),
+            ('work_hours must be positive', 'work_hours',
+             "CASE WHEN pg_input_is_valid(work_hours, 'numeric') THEN work_hours::numeric <= 0 END"),
+            ('no caregiver with this email', 'caregiver_email', _unknown('caregiver_email', KNOWN_CAREGIVERS)),
+            ('no member with this email', 'member_email', _unknown('member_email', KNOWN_MEMBERS)),
+            ('caregiver already has an appointment at this time', 'appointment_date', OVERLAPS_EXISTING),
+            ('overlaps another appointment for this caregiver in the batch', 'appointment_date',
+             OVERLAPS_STAGED),
+        ],
+        'load': '''
+            INSERT INTO appointment (caregiver_user_id, member_user_id, appointment_date,
+                                     appointment_time, work_hours, status)
+            SELECT cu.user_id, mu.user_id, s.appointment_date::date, s.appointment_time::time,
+                   s.work_hours::numeric, COALESCE(s.status, 'Scheduled')
+            FROM stage_appointments s
+            JOIN "user" cu ON cu.email = s.caregiver_email
+            JOIN "user" mu ON mu.email = s.member_email
+        ''',
+    },
+]
+
+SPECS_BY_NAME = {spec['name']: spec for spec in IMPORT_SPECS}
+
+
+def get_conninfo():
+    """Connection string from DATABASE_URL or the DB_* variables used elsewhere"""
+    if 'DATABASE_URL' in os.environ:
+        return os.environ['DATABASE_URL']
+    return make_conninfo(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        dbname=os.getenv('DB_NAME', 'caregiving_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres'),
+    )
+
+
+def _stage_table(spec):
+    return sql.Identifier(f"stage_{spec['name']}")
+
+
+def create_staging_tables(cursor):
+    """Text-typed staging tables for every spec; empty ones keep the checks simple"""
+    for spec in IMPORT_SPECS:
+        columns = [sql.SQL('line_no BIGSERIAL')] + [
+            sql.SQL('{} TEXT').format(sql.Identifier(name)) for name in spec['columns']
+        ]
+        if spec['name'] == 'jobs':
+            columns.append(sql.SQL('job_id INT'))
+        cursor.execute(sql.SQL('CREATE TEMP TABLE {} ({}) ON COMMIT DROP').format(
+            _stage_table(spec), sql.SQL(', ').join(columns)
+        ))
+
+
+def copy_csv(cursor, spec, path):
+    """Stream a CSV file into its staging table; returns rows copied"""
+    with open(path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader([f.readline()]), [])
+        unknown = [c for c in header if c not in spec['columns']]
+        if unknown:
+            raise ValueError(f"{path}: unknown column(s) {', '.join(unknown)}")
+        statement = sql.SQL('COPY {} ({}) FROM STDIN WITH (FORMAT csv)').format(
+            _stage_table(spec), sql.SQL(', ').join(sql.Identifier(c) for c in header)
+        )
+        with cursor.copy(statement) as copy:
+            while chunk := f.read(COPY_CHUNK_SIZE):
+                copy.write(chunk)
+    return cursor.rowcount
+
+
+def copy_jsonl(cursor, spec, path):
+    """Stream a JSONL file into its staging table; returns rows copied"""
+    columns = list(spec['columns'])
+    statement = sql.SQL('COPY {} ({}) FROM STDIN').format(
+        _stage_table(spec), sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+    )
+    rows = 0
+    with open(path, encoding='utf-8') as f, cursor.copy(statement) as copy:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            unknown = [c for c in record if c not in spec['columns']]
+            if unknown:
+                raise ValueError(f"{path} line {line_no}: unknown field(s) {', '.join(unknown)}")
+            copy.write_row([None if record.get(c) is None else str(record[c]) for c in columns])
+            rows += 1
+    return rows
+
+
+def stage_file(cursor, spec, path):
+    """COPY one input file into staging and report its throughput"""
+    started = time.perf_counter()
+    if path.endswith('.csv'):
+        rows = copy_csv(cursor, spec, path)
+    elif path.endswith(('.jsonl', '.ndjson')):
+        rows = copy_jsonl(cursor, spec, path)
+    else:
+        raise ValueError(f'{path}: expected a .csv or .jsonl file')
+    cursor.execute(sql.SQL('ANALYZE {}').format(_stage_table(spec)))
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"  {spec['name']:<13} {rows:>10,} rows  {size_mb:>8.1f} MB  {elapsed:>7.2f}s  "
+          f"{rows / elapsed if elapsed else 0:>10,.0f} rows/s  {size_mb / elapsed if elapsed else 0:>6.1f} MB/s")
+    return rows
+
+
+def column_checks(spec):
+    """Type, length and NOT NULL checks derived from the model columns"""
+    checks = []
+    for name, column in spec['columns'].items():
+        if column is None:
+            continue
+        if not column.nullable and column.server_default is None:
+            checks.append((f'{name} is required', name, f"{name} IS NULL OR {name} = ''"))
+        type_name = column.type.compile(dialect=postgresql.dialect())
+        checks.append((
+            f'{name} is not a valid {type_name}', name,
+            f"{name} IS NOT NULL AND NOT pg_input_is_valid({name}, '{type_name}')",
+        ))
+    if spec['unique']:
+        key = ', '.join(spec['unique'])
+        same_key = ' AND '.join(f'o.{name} = s.{name}' for name in spec['unique'])
+        checks.append((
+            f'duplicate {key} in file', spec['unique'][0],
+            f"EXISTS (SELECT 1 FROM stage_{spec['name']} o WHERE {same_key} AND o.line_no <> s.line_no)",
+        ))
+    return checks
+
+
+def validate(cursor, spec, max_errors):
+    """Run every check against the staged rows; returns the number of bad rows"""
+    failures = 0
+    for message, column, condition in column_checks(spec) + spec['checks']:
+        # In WHERE, [NOT] EXISTS conditions become hash or index (anti-)joins
+        cursor.execute(f'''
+            SELECT line_no, {column} FROM stage_{spec['name']} s
+            WHERE {condition}
+            ORDER BY line_no
+        ''')
+        rows = cursor.fetchall()
+        for line_no, value in rows[:max_errors]:
+            print(f"    {spec['name']} row {line_no}: {message} (got {value!r})")
+        if len(rows) > max_errors:
+            print(f"    {spec['name']}: ... and {len(rows) - max_errors} more rows: {message}")
+        failures += len(rows)
+    return failures
+
+
+def load(cursor, spec, staged_rows):
+    """Move one spec's validated rows into its table; every staged row must land"""
+    started = time.perf_counter()
+    inserted = 0
+    for statement in filter(str.strip, spec['load'].split(';')):
+        cursor.execute(statement)
+        inserted = cursor.rowcount
+    elapsed = time.perf_counter() - started
+    if inserted != staged_rows:
+        # A row that passed validation but was not inserted means a check is missing
+        raise ValueError(f"{spec['name']}: loaded {inserted:,} of {staged_rows:,} validated rows")
+    print(f"  {spec['name']:<13} {inserted:>10,} rows  {elapsed:>7.2f}s  "
+          f"{inserted / elapsed if elapsed else 0:>10,.0f} rows/s")
+
+
+def collect_files(args):
+    files = {}
+    for spec in IMPORT_SPECS:
+        path = getattr(args, spec['name'])
+        if path is None and args.dir:
+            for ext in ('.csv', '.jsonl', '.ndjson'):
+                candidate = os.path.join(args.dir, spec['name'] + ext)
+                if os.path.exists(candidate):
+                    path = candidate
+                    break
+        if path:
+            files[spec['name']] = path
+    return files
+
+
+def run_import(files, dry_run=False, max_errors=20):
+    """Stage, validate and load the given {spec name: path} files; returns True on success"""
+    started = time.perf_counter()
+    with psycopg.connect(get_conninfo()) as conn:
+        with conn.cursor() as cursor:
+            create_staging_tables(cursor)
+
+            print('\nStaging (COPY):')
+            staged = {name: stage_file(cursor, SPECS_BY_NAME[name], path) for name, path in files.items()}
+
+            print('\nValidating...')
+            failures = sum(validate(cursor, SPECS_BY_NAME[name], max_errors) for name in files)
+            if failures:
+                conn.rollback()
+                print(f'\n✗ {failures:,} invalid rows, nothing was imported.')
+                return False
+            print('  ✓ All rows valid')
+
+            if dry_run:
+                conn.rollback()
+                print('\nDry run: nothing was imported.')
+                return True
+
+            print('\nLoading:')
+            for spec in IMPORT_SPECS:
+                if spec['name'] in files:
+                    load(cursor, spec, staged[spec['name']])
+        conn.commit()
+
+    print(f'\n✓ Import finished in {time.perf_counter() - started:.2f}s')
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import CSV/JSONL files with PostgreSQL COPY')
+    parser.add_argument('--dir', help='directory containing <name>.csv or <name>.jsonl files')
+    for spec in IMPORT_SPECS:
+        parser.add_argument(f"--{spec['name']}", metavar='FILE', help=f"{spec['name']} file")
+    parser.add_argument('--dry-run', action='store_true', help='stage and validate only')
+    parser.add_argument('--max-errors', type=int, default=20, help='errors shown per check (default 20)')
+    args = parser.parse_args()
+
+    files = collect_files(args)
+    if not files:
+        parser.error('no input files given')
+
+    try:
+        ok = run_import(files, dry_run=args.dry_run, max_errors=args.max_errors)
+    except (OSError, ValueError, psycopg.Error) as e:
+        print(f'✗ Import failed: {e}')
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Async JSON API (/api/v1/) for users, caregivers, members, jobs and appointments
+
+The views are async and use AsyncSessionLocal (SQLAlchemy asyncio on psycopg
+3), so under ASGI a worker keeps serving other requests while one waits on
+the database instead of tying up a thread per request. Each resource supports:
+
+    GET    /api/v1/<resource>/        keyset-paginated list (?sort=, ?size=, ?cursor=)
+    POST   /api/v1/<resource>/        create from a JSON object
+    GET    /api/v1/<resource>/<id>/   detail
+    PATCH  /api/v1/<resource>/<id>/   update the given fields (PUT is accepted too)
+    DELETE /api/v1/<resource>/<id>/   delete
+
+Writes go through Django's CSRF check like the site's forms, so another site
+cannot make a browser send them. A client fetches a token from
+GET /api/v1/csrf/ (which also sets the csrftoken cookie) and sends it back in
+an X-CSRFToken header with the cookie; over HTTPS Django also expects a
+Referer or Origin header from this host.
+"""
+import json
+from datetime import date, time
+from decimal import Decimal, InvalidOperation
+
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import joinedload, undefer
+
+from database import AsyncSessionLocal, replicas, use_primary
+from models import User, Caregiver, Member, Job, Appointment
+from .bulk import CASCADE_DELETES, delete_cascading
+from .middleware import wants_primary
+from .pagination import apaginate
+from .scheduling import is_overlap_violation
+from .views import APPOINTMENT_SORTS, CAREGIVER_SORTS, JOB_SORTS, MEMBER_SORTS, USER_SORTS
+
+USER_SUMMARY_FIELDS = ('given_name', 'surname', 'email', 'city')
+
+
+class Resource:
+    """How one model is listed, serialized and written through the API"""
+
+    def __init__(self, model, pk, fields, writable, sorts, options=(), embed_user=False, extra=()):
+        self.model = model
+        self.pk = pk
+        self.fields = fields
+        self.writable = writable
+        self.sorts = sorts
+        self.options = options
+        self.embed_user = embed_user
+        self.extra = extra
+
+    @property
+    def required(self):
+        """Writable columns that must be given on create"""
+        columns = self.model.__table__.columns
+        return [
+            name for name in self.writable
+            if not columns[name].nullable and columns[name].server_default is None
+        ]
+
+    def serialize(self, obj):
+        data = {name: getattr(obj, name) for name in self.fields + self.extra}
+        if self.embed_user:
+            data['user'] = {name: getattr(obj.user, name) for name in USER_SUMMARY_FIELDS}
+        return data
+
+
+RESOURCES = {
+    'users': Resource(
+        User, User.user_id,
+        fields=('user_id', 'email', 'given_name', 'surname', 'city', 'phone_number',
+                'profile_description', 'created_at', 'updated_at'),
+        writable=('email', 'given_name', 'surname', 'city', 'phone_number',
+                  'profile_description', 'password'),
+        sorts=USER_SORTS,
+    ),
+    'caregivers': Resource(
+        Caregiver, Caregiver.caregiver_user_id,
+        fields=('caregiver_user_id', 'photo', 'gender', 'caregiving_type', 'hourly_rate'),
+        writable=('caregiver_user_id', 'photo', 'gender', 'caregiving_type', 'hourly_rate'),
+        sorts=CAREGIVER_SORTS,
+        options=(joinedload(Caregiver.user),),
+        embed_user=True,
+    ),
+    'members': Resource(
+        Member, Member.member_user_id,
+        fields=('member_user_id', 'house_rules', 'dependent_description'),
+        writable=('member_user_id', 'house_rules', 'dependent_description'),
+        sorts=MEMBER_SORTS,
+        options=(joinedload(Member.user),),
+        embed_user=True,
+    ),
+    'jobs': Resource(
+        Job, Job.job_id,
+        fields=('job_id', 'member_user_id', 'required_caregiving_type', 'other_requirements', 'date_posted'),
+        writable=('member_user_id', 'required_caregiving_type', 'other_requirements', 'date_posted'),
+        sorts=JOB_SORTS,
+    ),
+    'appointments': Resource(
+        Appointment, Appointment.appointment_id,
+        fields=('appointment_id', 'caregiver_user_id', 'member_user_id', 'appointment_date',
+                'appointment_time', 'work_hours', 'status'),
+        writable=('caregiver_user_id', 'member_user_id', 'appointment_date', 'appointment_time',
+                  'work_hours', 'status'),
+        sorts=APPOINTMENT_SORTS,
+        options=(undefer(Appointment.caregiver_hourly_rate),),
+        extra=('total_cost',),
+    ),
+}
+
+
+def _error(status, message, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def _parse_value(column, value):
+    """Convert a JSON value to the column's Python type; raises ValueError"""
+    if value is None:
+        if not column.nullable:
+            raise ValueError('may not be null')
+        return None
+    python_type = column.type.python_type
+    if python_type is int:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError('must be an integer')
+        return int(value)
+    if python_type is Decimal:
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError('must be a number')
+    if python_type is date:
+        return date.fromisoformat(str(value))
+    if python_type is time:
+        return time.fromisoformat(str(value))
+    value = str(value)
+    length = getattr(column.type, 'length', None)
+    if length and len(value) > length:
+        raise ValueError(f'must be at most {length} characters')
+    return value
+
+
+def _parse_body(request, resource, creating):
+    """Return (values, None) or (None, error response)"""
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return None, _error(400, 'Request body must be JSON')
+    if not isinstance(body, dict):
+        return None, _error(400, 'Request body must be a JSON object')
+
+    columns = resource.model.__table__.columns
+    values, errors = {}, {}
+    for name, value in body.items():
+        if name not in resource.writable:
+            errors[name] = 'is not a writable field'
+            continue
+        try:
+            values[name] = _parse_value(columns[name], value)
+        except (ValueError, TypeError) as e:
+            errors[name] = str(e) or 'is invalid'
+    hours = values.get('work_hours')
+    if hours is not None and not (0 < hours < 1000):
+        errors['work_hours'] = 'must be positive and below 1000'
+    if creating:
+        for name in resource.required:
+            if values.get(name) is None and name not in errors:
+                errors[name] = 'is required'
+    if errors:
+        return None, _error(400, 'Invalid fields', fields=errors)
+    return values, None
+
+
+def _session(request):
+    """An async session, on the primary for requests that may write (see middleware)"""
+    db = AsyncSessionLocal()
+    if replicas and wants_primary(request):
+        use_primary(db.sync_session)
+    return db
+
+
+async def _load(db, resource, pk):
+    statement = select(resource.model).options(*resource.options).where(resource.pk == pk)
+    result = await db.execute(statement.execution_options(populate_existing=True))
+    return result.scalars().first()
+
+
+async def _commit(db):
+    """Commit, turning constraint violations into a 409 and rejected values into a 400"""
+    try:
+        await db.commit()
+    except DataError as e:
+        await db.rollback()
+        return _error(400, getattr(getattr(e.orig, 'diag', None), 'message_primary', None) or str(e.orig))
+    except IntegrityError as e:
+        await db.rollback()
+        if is_overlap_violation(e):
+            return _error(409, 'The caregiver already has an appointment at that time')
+        return _error(409, getattr(getattr(e.orig, 'diag', None), 'message_primary', None) or str(e.orig))
+    return None
+
+
+async def collection(request, resource_name):
+    resource = RESOURCES.get(resource_name)
+    if resource is None:
+        return _error(404, f'Unknown resource {resource_name}')
+    if request.method == 'GET':
+        async with _session(request) as db:
+            statement = select(resource.model).options(*resource.options)
+            page = await apaginate(request, db, statement, resource.sorts, 'id')
+        return JsonResponse({
+            'results': [resource.serialize(obj) for obj in page],
+            'next': request.path + page.next_url if page.next_url else None,
+            'prev': request.path + page.prev_url if page.prev_url else None,
+        })
+
+    if request.method == 'POST':
+        values, error = _parse_body(request, resource, creating=True)
+        if error:
+            return error
+        async with _session(request) as db:
+            obj = resource.model(**values)
+            db.add(obj)
+            error = await _commit(db)
+            if error:
+                return error
+            obj = await _load(db, resource, getattr(obj, resource.pk.key))
+            return JsonResponse(resource.serialize(obj), status=201)
+
+    return _error(405, f'Method {request.method} not allowed')
+
+
+async def item(request, resource_name, pk):
+    resource = RESOURCES.get(resource_name)
+    if resource is None:
+        return _error(404, f'Unknown resource {resource_name}')
+    async with _session(request) as db:
+        obj = await _load(db, resource, pk)
+        if obj is None:
+            return _error(404, f'{resource.model.__name__} {pk} not found')
+
+        if request.method == 'GET':
+            return JsonResponse(resource.serialize(obj))
+
+        if request.method in ('PATCH', 'PUT'):
+            values, error = _parse_body(request, resource, creating=False)
+            if error:
+                return error
+            for name, value in values.items():
+                setattr(obj, name, value)
+            error = await _commit(db)
+            if error:
+                return error
+            obj = await _load(db, resource, pk)
+            return JsonResponse(resource.serialize(obj))
+
+        if request.method == 'DELETE':
+            entity = resource.model.__tablename__
+            if entity in CASCADE_DELETES:
+                await db.run_sync(delete_cascading, entity, [resource.pk == pk])
+            else:
+                await db.delete(obj)
+            error = await _commit(db)
+            if error:
+                return error
+            return HttpResponse(status=204)
+
+    return _error(405, f'Method {request.method} not allowed')
+
+
+async def csrf_token(request):
+    """CSRF token for API clients to send back in the X-CSRFToken header"""
+    return JsonResponse({'csrf_token': get_token(request)})
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CaregivingAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'caregiving_app'
+
+    def ready(self):
+        from database import SessionLocal
+        from . import cache, matching
+        cache.register(SessionLocal)
+        matching.register(SessionLocal)
@@ -0,0 +1,368 @@
+"""
+Set-based bulk operations on appointments
+
+A batch of appointments (JSON array or CSV) is validated as a whole: field
+types row by row in Python, then foreign keys and overlaps with existing
+bookings in one query each, whatever the batch size. A valid batch is
+written with multi-row INSERT ... RETURNING statements (SQLAlchemy batches
+the rows into VALUES lists) inside the request's transaction, so 5,000 rows
+take a handful of round trips instead of 5,000. An invalid batch inserts
+nothing and every bad row is reported.
+
+Status transitions for many appointments at once (complete a day, cancel a
+caregiver's future bookings) are one UPDATE ... RETURNING whose WHERE clause
+only admits the statuses the target may be reached from, so rows in any other
+state are left alone and the changed ids come back in the same round trip.
+
+Users, caregivers, members and jobs are deleted with one DELETE ... RETURNING
+and the database's ON DELETE CASCADE removes their children. The same
+statement reports, from the snapshot taken before the delete, which other
+caregivers, members and jobs listed the cascaded rows on their pages.
+
+Core statements bypass the ORM unit of work, so the detail cache and the
+matching index are told about the touched caregivers and members explicitly.
+"""
+import csv
+import io
+import json
+from datetime import date, time
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import delete, func, insert, select, text, union, update
+
+from models import (
+    User, Caregiver, Member, Address, Job, JobApplication, Appointment, APPOINTMENT_STATUSES,
+)
+from .cache import entity_tag, mark_stale
+from .matching import mark_changed
+from .scheduling import MAX_APPOINTMENT_DAYS, booked_range
+
+MAX_BULK_ROWS = 10000
+
+# Target status -> the statuses an appointment may move to it from.
+# Completed and Cancelled are final.
+ALLOWED_TRANSITIONS = {
+    'Confirmed': ('Scheduled',),
+    'Completed': ('Scheduled', 'Confirmed'),
+    'Cancelled': ('Scheduled', 'Confirmed'),
+}
+TRANSITION_SCOPE_FIELDS = ('date_from', 'date_to', 'caregiver_user_id', 'member_user_id')
+
+MEMBER_FILTER_FIELDS = ('given_name', 'surname', 'city', 'street', 'town')
+
+APPOINTMENT_FIELDS = (
+    'caregiver_user_id', 'member_user_id', 'appointment_date', 'appointment_time', 'work_hours', 'status',
+)
+
+# Batch rows that overlap a non-cancelled appointment already booked for the
+# same caregiver; each probe is a lookup on the appointment_no_overlap index of
+# the partitions around the row's date.
+EXISTING_OVERLAPS = text('''
+    SELECT b.row_no, min(a.appointment_id) AS appointment_id
+    FROM unnest(CAST(:row_nos AS int[]), CAST(:caregivers AS int[]),
+                CAST(:starts AS timestamp[]), CAST(:ends AS timestamp[]))
+         AS b(row_no, caregiver_user_id, starts_at, ends_at)
+    JOIN appointment a
+      ON a.caregiver_user_id = b.caregiver_user_id
+     AND a.status <> 'Cancelled'
+     AND a.time_range && tsrange(b.starts_at, b.ends_at)
+     AND a.appointment_date BETWEEN CAST(b.starts_at AS date) - :max_days AND CAST(b.ends_at AS date)
+    GROUP BY b.row_no
+''')
+
+
+class BatchError(ValueError):
+    """The request body could not be read as a batch at all"""
+
+
+def read_batch(request):
+    """Rows of a bulk request as dicts: a JSON array (or {"appointments": [...]}) or CSV"""
+    if request.content_type in ('text/csv', 'application/csv'):
+        try:
+            rows = list(csv.DictReader(io.StringIO(request.body.decode('utf-8-sig'))))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise BatchError(f'Invalid CSV: {e}')
+    else:
+        try:
+            rows = json.loads(request.body)
+        except ValueError:
+            raise BatchError('Request body must be a JSON array or CSV with a header row')
+        if isinstance(rows, dict):
+            rows = rows.get('appointments')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise BatchError('Expected a JSON array of appointment objects')
+    if not rows:
+        raise BatchError('The batch is empty')
+    if len(rows) > MAX_BULK_ROWS:
+        raise BatchError(f'At most {MAX_BULK_ROWS} rows per batch')
+    return rows
+
+
+def _parse_row(row):
+    """(values, errors) for one input row; errors is a list of (field, message)"""
+    values, errors = {}, []
+
+    def parse(field, convert, message):
+        raw = row.get(field)
+        if raw is None or str(raw).strip() == '':
+            errors.append((field, 'is required'))
+            return
+        try:
+            values[field] = convert(str(raw).strip())
+        except (ValueError, InvalidOperation):
+            errors.append((field, message))
+
+    unknown = sorted(set(row) - set(APPOINTMENT_FIELDS))
+    for field in unknown:
+        errors.append((field, 'is not an appointment field'))
+    parse('caregiver_user_id', int, 'must be an integer')
+    parse('member_user_id', int, 'must be an integer')
+    parse('appointment_date', date.fromisoformat, 'must be a date (YYYY-MM-DD)')
+    parse('appointment_time', time.fromisoformat, 'must be a time (HH:MM)')
+    parse('work_hours', Decimal, 'must be a number')
+
+    hours = values.get('work_hours')
+    if hours is not None and not (0 < hours < 1000):
+        errors.append(('work_hours', 'must be positive and below 1000'))
+    status = row.get('status') or 'Scheduled'
+    if status not in APPOINTMENT_STATUSES:
+        errors.append(('status', f'must be one of {", ".join(APPOINTMENT_STATUSES)}'))
+    values['status'] = status
+    return values, errors
+
+
+def _missing(db, column, ids):
+    """The ids that have no row in column's table"""
+    found = set(db.execute(select(column).where(column.in_(ids))).scalars())
+    return set(ids) - found
+
+
+def _batch_overlaps(bookings):
+    """
+    Rows of the batch that overlap another row for the same caregiver, as
+    {row_no: other row_no}. bookings are (row_no, caregiver, start, end);
+    a sweep over each caregiver's bookings sorted by start finds them all.
+    """
+    overlaps = {}
+    previous = {}
+    for row_no, caregiver, start, end in sorted(bookings, key=lambda b: (b[1], b[2])):
+        latest = previous.get(caregiver)
+        if latest is not None and start < latest[1]:
+            overlaps[row_no] = latest[0]
+            overlaps.setdefault(latest[0], row_no)
+        if latest is None or end > latest[1]:
+            previous[caregiver] = (row_no, end)
+    return overlaps
+
+
+def validate_appointments(db, rows):
+    """
+    Validate a batch; returns (values, errors). values are insertable dicts in
+    input order; errors are {'row', 'field', 'error'} dicts with 1-based rows.
+    """
+    values, errors = [], []
+    for row_no, row in enumerate(rows, 1):
+        parsed, row_errors = _parse_row(row)
+        values.append(parsed)
+        errors.extend({'row': row_no, 'field': f, 'error': m} for f, m in row_errors)
+
+    caregiver_ids = {v['caregiver_user_id'] for v in values if 'caregiver_user_id' in v}
+    member_ids = {v['member_user_id'] for v in values if 'member_user_id' in v}
+    missing_caregivers = _missing(db, Caregiver.caregiver_user_id, caregiver_ids) if caregiver_ids else set()
+    missing_members = _missing(db, Member.member_user_id, member_ids) if member_ids else set()
+
+    bookings = []
+    for row_no, v in enumerate(values, 1):
+        if v.get('caregiver_user_id') in missing_caregivers:
+            errors.append({'row': row_no, 'field': 'caregiver_user_id', 'error': 'no such caregiver'})
+        if v.get('member_user_id') in missing_members:
+            errors.append({'row': row_no, 'field': 'member_user_id', 'error': 'no such member'})
+        bookable = all(f in v for f in APPOINTMENT_FIELDS) and v['work_hours'] > 0
+        if bookable and v['status'] != 'Cancelled':
+            start, end = booked_range(v['appointment_date'], v['appointment_time'], v['work_hours'])
+            bookings.append((row_no, v['caregiver_user_id'], start, end))
+
+    if bookings:
+        row_nos, caregivers, starts, ends = (list(column) for column in zip(*bookings))
+        existing = db.execute(EXISTING_OVERLAPS, {
+            'row_nos': row_nos, 'caregivers': caregivers, 'starts': starts, 'ends': ends,
+            'max_days': MAX_APPOINTMENT_DAYS,
+        })
+        for row_no, appointment_id in existing:
+            errors.append({'row': row_no, 'field': 'appointment_date',
+                           'error': f'caregiver already has appointment #{appointment_id} at this time'})
+        for row_no, other in _batch_overlaps(bookings).items():
+            errors.append({'row': row_no, 'field': 'appointment_date',
+                           'error': f'overlaps row {other} for the same caregiver'})
+
+    errors.sort(key=lambda e: e['row'])
+    return values, errors
+
+
+def insert_appointments(db, values):
+    """Insert validated rows; returns the new appointment ids in input order"""
+    statement = insert(Appointment).returning(Appointment.appointment_id, sort_by_parameter_order=True)
+    ids = list(db.execute(statement, values).scalars())
+    caregivers = {v['caregiver_user_id'] for v in values}
+    members = {v['member_user_id'] for v in values}
+    mark_stale(db, {entity_tag('caregiver', c) for c in caregivers}
+               | {entity_tag('member', m) for m in members})
+    mark_changed(db, caregivers)
+    return ids
+
+
+def _mark_appointments_changed(db, rows):
+    """Queue invalidation for (appointment_id, caregiver_user_id, member_user_id) rows"""
+    mark_stale(db, {entity_tag('appointment', a) for a, _, _ in rows}
+               | {entity_tag('caregiver', c) for _, c, _ in rows}
+               | {entity_tag('member', m) for _, _, m in rows})
+    mark_changed(db, {c for _, c, _ in rows})
+
+
+def parse_transition(data):
+    """
+    Read a bulk transition from a QueryDict (form) or dict (JSON):
+    target, optional status (one or more current statuses) and the scope
+    filters date_from, date_to, caregiver_user_id and member_user_id.
+    Returns (transition, None) or (None, error message).
+    """
+    def get(name):
+        value = data.get(name)
+        return value.strip() if isinstance(value, str) else value
+
+    target = get('target')
+    if target not in ALLOWED_TRANSITIONS:
+        return None, f'target must be one of {", ".join(ALLOWED_TRANSITIONS)}'
+
+    statuses = data.getlist('status') if hasattr(data, 'getlist') else data.get('status') or []
+    if isinstance(statuses, str):
+        statuses = [statuses]
+    statuses = [s for s in statuses if s]
+    not_allowed = [s for s in statuses if s not in ALLOWED_TRANSITIONS[target]]
+    if not_allowed:
+        return None, f'{", ".join(map(str, not_allowed))} appointments cannot be marked {target}'
+
+    transition = {'target': target, 'from_statuses': statuses or list(ALLOWED_TRANSITIONS[target])}
+    try:
+        for name in ('date_from', 'date_to'):
+            transition[name] = date.fromisoformat(str(get(name))) if get(name) else None
+    except ValueError:
+        return None, 'date_from and date_to must be dates (YYYY-MM-DD)'
+    try:
+        for name in ('caregiver_user_id', 'member_user_id'):
+            transition[name] = int(get(name)) if get(name) not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, 'caregiver_user_id and member_user_id must be integers'
+
+    # Never touch every appointment in the table by accident
+    if all(transition[name] is None for name in TRANSITION_SCOPE_FIELDS):
+        return None, 'Give a date range, a caregiver or a member to select appointments'
+    return transition, None
+
+
+def transition_appointments(db, transition):
+    """Apply a parsed transition with one guarded UPDATE; returns the changed ids"""
+    conditions = [Appointment.status.in_(transition['from_statuses'])]
+    if transition['date_from']:
+        conditions.append(Appointment.appointment_date >= transition['date_from'])
+    if transition['date_to']:
+        conditions.append(Appointment.appointment_date <= transition['date_to'])
+    if transition['caregiver_user_id'] is not None:
+        conditions.append(Appointment.caregiver_user_id == transition['caregiver_user_id'])
+    if transition['member_user_id'] is not None:
+        conditions.append(Appointment.member_user_id == transition['member_user_id'])
+
+    statement = (
+        update(Appointment)
+        .where(*conditions)
+        .values(status=transition['target'])
+        .returning(Appointment.appointment_id, Appointment.caregiver_user_id, Appointment.member_user_id)
+    )
+    rows = db.execute(statement).all()
+    _mark_appointments_changed(db, rows)
+    return sorted(appointment_id for appointment_id, _, _ in rows)
+
+
+def _member_side(member_id):
+    """Caregivers whose pages show the appointments and job applications of a member"""
+    return {'caregiver': union(
+        select(Appointment.caregiver_user_id).where(Appointment.member_user_id == member_id),
+        select(JobApplication.caregiver_user_id)
+        .join(Job, Job.job_id == JobApplication.job_id)
+        .where(Job.member_user_id == member_id),
+    )}
+
+
+def _caregiver_side(caregiver_id):
+    """Members and jobs whose pages show the appointments and applications of a caregiver"""
+    return {
+        'member': select(Appointment.member_user_id).where(Appointment.caregiver_user_id == caregiver_id),
+        'job': select(JobApplication.job_id).where(JobApplication.caregiver_user_id == caregiver_id),
+    }
+
+
+# Entity -> (primary key, related rows to invalidate as a function of the
+# deleted key). A user id is also its caregiver and member id.
+CASCADE_DELETES = {
+    'user': (User.user_id, lambda pk: {**_member_side(pk), **_caregiver_side(pk)}),
+    'caregiver': (Caregiver.caregiver_user_id, _caregiver_side),
+    'member': (Member.member_user_id, _member_side),
+    'job': (Job.job_id, lambda pk: {
+        'caregiver': select(JobApplication.caregiver_user_id).where(JobApplication.job_id == pk),
+    }),
+}
+
+
+def delete_cascading(db, entity, conditions):
+    """
+    Delete the rows of entity matching conditions in one statement, leaving
+    their children to ON DELETE CASCADE; returns the deleted ids.
+    """
+    pk, related = CASCADE_DELETES[entity]
+    gone = delete(pk.table).where(*conditions).returning(pk.label('pk')).cte('gone')
+    subqueries = related(gone.c.pk)
+    statement = select(gone.c.pk, *[
+        func.array(query.scalar_subquery()).label(name) for name, query in subqueries.items()
+    ])
+    rows = db.execute(statement).all()
+
+    ids = sorted(row.pk for row in rows)
+    tags = {entity_tag(entity, pk) for pk in ids}
+    caregivers = set(ids) if entity in ('user', 'caregiver') else set()
+    for row in rows:
+        for name in subqueries:
+            values = getattr(row, name)
+            tags |= {entity_tag(name, value) for value in values}
+            if name == 'caregiver':
+                caregivers.update(values)
+    mark_stale(db, tags)
+    mark_changed(db, caregivers)
+    return ids
+
+
+def parse_member_filter(data):
+    """
+    Conditions selecting members for a bulk delete from a dict with any of
+    given_name, surname, city (the member's user) and street, town (one of
+    their addresses). Returns (conditions, None) or (None, error message).
+    """
+    values = {name: str(data.get(name) or '').strip() for name in MEMBER_FILTER_FIELDS}
+    if not any(values.values()):
+        return None, f'Give at least one of {", ".join(MEMBER_FILTER_FIELDS)}'
+
+    conditions = []
+    user_filters = [
+        column == values[name]
+        for name, column in (('given_name', User.given_name), ('surname', User.surname), ('city', User.city))
+        if values[name]
+    ]
+    if user_filters:
+        conditions.append(Member.member_user_id.in_(select(User.user_id).where(*user_filters)))
+    address_filters = [
+        column == values[name]
+        for name, column in (('street', Address.street), ('town', Address.town))
+        if values[name]
+    ]
+    if address_filters:
+        conditions.append(Member.member_user_id.in_(select(Address.member_user_id).where(*address_filters)))
+    return conditions, None
@@ -0,0 +1,152 @@
+"""
+Read-through cache for entity detail pages
+
+Every entity row has a version token stored in the Django cache under
+version:<entity>:<id>. A detail entry is stored under
+detail:<entity>:<id>:<version> together with the versions of the related rows
+it was built from (e.g. an appointment depends on its caregiver's user row for
+the name and on the caregiver row for the hourly rate). An entry is served
+only while all of those versions are unchanged.
+
+Versions are replaced with fresh random tokens after any SQLAlchemy commit
+that touched the row, so invalidation is precise and works with any Django
+cache backend (local memory, file or Redis). Rows removed by ON DELETE CASCADE
+need no tracking of their own: their detail entries depend on the parent row's
+version, which the deleting session bumps. Pages of other entities that list
+cascaded rows are invalidated by bulk.delete_cascading.
+"""
+import uuid
+from contextlib import nullcontext
+
+from django.core.cache import cache
+from sqlalchemy import event, inspect
+
+from database import on_primary
+from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+
+PENDING_TAGS_KEY = 'cache_tags'
+
+
+def entity_tag(entity, pk):
+    return f'{entity}:{pk}'
+
+
+def _version_key(tag):
+    return f'version:{tag}'
+
+
+def get_versions(tags):
+    """Current version token of each tag, creating tokens for unseen tags"""
+    keys = {tag: _version_key(tag) for tag in tags}
+    found = cache.get_many(list(keys.values()))
+    versions, created = {}, {}
+    for tag, key in keys.items():
+        if key in found:
+            versions[tag] = found[key]
+        else:
+            # A fresh random token also covers versions evicted from the
+            # cache: entries built against the lost token can never match.
+            versions[tag] = created[key] = uuid.uuid4().hex
+    if created:
+        cache.set_many(created, timeout=None)
+    return versions
+
+
+def bump(tags):
+    """Invalidate every detail entry that depends on any of the tags"""
+    if tags:
+        cache.set_many({_version_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None)
+
+
+def cached_detail(entity, pk, loader, db=None):
+    """
+    Return the cached detail object for <entity>:<pk>, or call loader() on a miss.
+    loader returns (obj, dependency_tags); a None obj is not cached. When the
+    loader reads through the session db, a miss is loaded from the primary:
+    an entry outlives replica lag, and one built from a replica that has not
+    applied the write that invalidated it would be stale until it expires.
+    """
+    own_tag = entity_tag(entity, pk)
+    key = f'detail:{own_tag}:{get_versions([own_tag])[own_tag]}'
+
+    known = {}
+    entry = cache.get(key)
+    if entry is not None:
+        current = get_versions(entry['deps'])
+        if current == entry['deps']:
+            return entry['value']
+        # Versions read before reloading; a write that lands while we load
+        # bumps them again, so the new entry is never validated by mistake.
+        known = current
+
+    with on_primary(db) if db is not None else nullcontext():
+        value, deps = loader()
+    if value is None:
+        return None
+    versions = {tag: known[tag] for tag in deps if tag in known}
+    versions.update(get_versions([tag for tag in deps if tag not in known]))
+    cache.set(key, {'deps': versions, 'value': value})
+    return value
+
+
+def _history_values(obj, attr):
+    """Current and pre-flush values of a foreign key attribute"""
+    history = inspect(obj).attrs[attr].history
+    values = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+    return {v for v in values if v is not None}
+
+
+def tags_for(obj):
+    """Detail tags affected by a write to an ORM object"""
+    if isinstance(obj, User):
+        return {entity_tag('user', obj.user_id)}
+    if isinstance(obj, Caregiver):
+        return {entity_tag('caregiver', obj.caregiver_user_id)}
+    if isinstance(obj, Member):
+        return {entity_tag('member', obj.member_user_id)}
+    if isinstance(obj, Address):
+        return {entity_tag('member', m) for m in _history_values(obj, 'member_user_id')}
+    if isinstance(obj, Job):
+        return {entity_tag('job', obj.job_id)} | {
+            entity_tag('member', m) for m in _history_values(obj, 'member_user_id')
+        }
+    if isinstance(obj, JobApplication):
+        return {entity_tag('job', j) for j in _history_values(obj, 'job_id')} | {
+            entity_tag('caregiver', c) for c in _history_values(obj, 'caregiver_user_id')
+        }
+    if isinstance(obj, Appointment):
+        return {entity_tag('appointment', obj.appointment_id)} | {
+            entity_tag('caregiver', c) for c in _history_values(obj, 'caregiver_user_id')
+        } | {
+            entity_tag('member', m) for m in _history_values(obj, 'member_user_id')
+        }
+    return set()
+
+
+def mark_stale(session, tags):
+    """Queue tags to be bumped when the session commits (for bulk statements)"""
+    session.info.setdefault(PENDING_TAGS_KEY, set()).update(tags)
+
+
+def _after_flush(session, flush_context):
+    # new/dirty/deleted and attribute history still describe the flushed
+    # changes here, and new rows already have their primary keys.
+    tags = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags |= tags_for(obj)
+    mark_stale(session, tags)
+
+
+def _after_commit(session):
+    bump(session.info.pop(PENDING_TAGS_KEY, set()))
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_TAGS_KEY, None)
+
+
+def register(session_factory):
+    """Hook invalidation into every session created by session_factory"""
+    event.listen(session_factory, 'after_flush', _after_flush)
+    event.listen(session_factory, 'after_commit', _after_commit)
+    event.listen(session_factory, 'after_rollback', _after_rollback)
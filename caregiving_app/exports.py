@@ -0,0 +1,165 @@
+"""
+Streaming CSV / JSON Lines exports
+
+Rows are read through a server-side cursor (stream_results + yield_per) and
+written to a StreamingHttpResponse one batch at a time, so memory use stays
+constant no matter how many rows are exported. The generator opens its own
+connection: the request's session is already closed by the time Django starts
+iterating over the response body.
+
+Under ASGI, Django reads a sync iterator into a list before sending any of
+it, so ASGI requests get an async generator on the async engine instead;
+WSGI requests keep the sync one.
+"""
+import csv
+import io
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from sqlalchemy import Column, Date, DECIMAL, Integer, MetaData, String, Table, Text, select
+from sqlalchemy.orm import aliased
+
+from database import read_async_engine, read_engine
+from models import User, Caregiver, Job, Appointment
+
+EXPORT_BATCH_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# job_applications_view is a materialized view with no ORM model; this
+# describes its columns (see queries/create_view.sql) so it can be queried
+# like a table. It is as fresh as its last refresh (refresh_views.py).
+job_applications_view = Table(
+    'job_applications_view', MetaData(),
+    Column('application_id', Integer),
+    Column('date_applied', Date),
+    Column('applicant_name', Text),
+    Column('applicant_email', String(255)),
+    Column('applicant_city', String(100)),
+    Column('applicant_phone', String(20)),
+    Column('caregiving_type', String(100)),
+    Column('hourly_rate', DECIMAL(10, 2)),
+    Column('job_id', Integer),
+    Column('required_caregiving_type', String(100)),
+    Column('other_requirements', Text),
+    Column('date_posted', Date),
+    Column('job_poster_name', Text),
+    Column('job_poster_email', String(255)),
+    Column('applicant_user_id', Integer),
+)
+
+
+def _date_range(query, column, start, end):
+    if start:
+        query = query.where(column >= start)
+    if end:
+        query = query.where(column <= end)
+    return query
+
+
+def appointments_query(start=None, end=None, status=None):
+    caregiver_user = aliased(User)
+    member_user = aliased(User)
+    query = (
+        select(
+            Appointment.appointment_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+            Appointment.work_hours,
+            Appointment.status,
+            Appointment.caregiver_user_id,
+            (caregiver_user.given_name + ' ' + caregiver_user.surname).label('caregiver_name'),
+            Caregiver.hourly_rate,
+            (Appointment.work_hours * Caregiver.hourly_rate).label('total_cost'),
+            Appointment.member_user_id,
+            (member_user.given_name + ' ' + member_user.surname).label('member_name'),
+        )
+        .join(Caregiver, Caregiver.caregiver_user_id == Appointment.caregiver_user_id)
+        .join(caregiver_user, caregiver_user.user_id == Appointment.caregiver_user_id)
+        .join(member_user, member_user.user_id == Appointment.member_user_id)
+    )
+    query = _date_range(query, Appointment.appointment_date, start, end)
+    if status:
+        query = query.where(Appointment.status == status)
+    return query.order_by(Appointment.appointment_date, Appointment.appointment_id)
+
+
+def jobs_query(start=None, end=None):
+    query = (
+        select(
+            Job.job_id,
+            Job.date_posted,
+            Job.required_caregiving_type,
+            Job.other_requirements,
+            Job.member_user_id,
+            (User.given_name + ' ' + User.surname).label('member_name'),
+            User.email.label('member_email'),
+        )
+        .join(User, User.user_id == Job.member_user_id)
+    )
+    query = _date_range(query, Job.date_posted, start, end)
+    return query.order_by(Job.date_posted, Job.job_id)
+
+
+def job_applications_query(start=None, end=None):
+    view = job_applications_view
+    query = _date_range(select(view), view.c.date_applied, start, end)
+    return query.order_by(view.c.date_applied, view.c.application_id)
+
+
+def stream_batches(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of rows from a server-side cursor, on a replica when one is healthy"""
+    with read_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        yield from result.partitions()
+
+
+async def astream_batches(query, batch_size=EXPORT_BATCH_SIZE):
+    """stream_batches() on the async engine, for ASGI requests"""
+    async with read_async_engine().connect() as conn:
+        result = await conn.stream(query, execution_options={'yield_per': batch_size})
+        async for rows in result.partitions():
+            yield rows
+
+
+def _csv_text(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _encoder(columns, export_format):
+    """(header, function that turns a batch of rows into text) for a format"""
+    if export_format == 'csv':
+        return _csv_text([columns]), _csv_text
+    encoder = DjangoJSONEncoder()
+    return '', lambda rows: ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def _chunks(header, encode, batches):
+    if header:
+        yield header
+    for rows in batches:
+        yield encode(rows)
+
+
+async def _achunks(header, encode, batches):
+    if header:
+        yield header
+    async for rows in batches:
+        yield encode(rows)
+
+
+def export_response(request, query, filename, export_format):
+    """StreamingHttpResponse that writes the query's rows as CSV or JSON Lines"""
+    header, encode = _encoder(list(query.selected_columns.keys()), export_format)
+    if isinstance(request, ASGIRequest):
+        chunks = _achunks(header, encode, astream_batches(query))
+    else:
+        chunks = _chunks(header, encode, stream_batches(query))
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
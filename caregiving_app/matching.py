@@ -0,0 +1,299 @@
+"""
+Caregiver matching for jobs from an in-memory candidate index
+
+Every caregiver is kept in a bucket keyed by (caregiving type, city), sorted
+by hourly rate, so the candidates for a job are found with two bisects on the
+rate bounds instead of a query per job view. Buckets are replaced, never
+mutated, so readers always see a consistent (rates, entries) pair without
+taking the lock.
+
+The index is built on first use and kept current in two ways:
+  - sessions in this process queue the caregivers touched by a commit
+    (caregiver, user and appointment rows); they are reloaded in one query
+    before the next lookup
+  - the whole index is rebuilt once it is older than settings.MATCH_INDEX_TTL,
+    which picks up writes made by other processes and bulk statements
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+
+from django.conf import settings
+from sqlalchemy import event, func, inspect, select
+
+from database import engine
+from models import User, Caregiver, Appointment, CaregiverEarnings
+
+DEFAULT_MATCH_LIMIT = 10
+MAX_MATCH_LIMIT = 100
+MATCH_SORTS = ('score', 'rate')
+LOAD_BATCH_SIZE = 10000
+
+# A caregiver's score is a weighted mix of experience (accepted appointments,
+# saturating at HISTORY_SATURATION) and how cheap they are within the window.
+HISTORY_WEIGHT = 0.6
+RATE_WEIGHT = 0.4
+HISTORY_SATURATION = 20
+
+PENDING_IDS_KEY = 'matching_ids'
+
+
+def _norm(value):
+    return (value or '').strip().casefold()
+
+
+class Candidate:
+    """One caregiver as stored in the index"""
+
+    def __init__(self, caregiver_user_id, name, city, caregiving_type, hourly_rate,
+                 accepted_appointments, total_hours):
+        self.caregiver_user_id = caregiver_user_id
+        self.name = name
+        self.city = city
+        self.caregiving_type = caregiving_type
+        self.hourly_rate = hourly_rate
+        self.accepted_appointments = accepted_appointments
+        self.total_hours = total_hours
+
+    @property
+    def bucket_key(self):
+        return _norm(self.caregiving_type), _norm(self.city)
+
+    @property
+    def sort_key(self):
+        return self.hourly_rate, self.caregiver_user_id
+
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+
+class Match:
+    """A candidate returned for a job, with its score"""
+
+    def __init__(self, candidate, score):
+        self.candidate = candidate
+        self.score = score
+
+    def __getattr__(self, name):
+        return getattr(self.candidate, name)
+
+    def as_dict(self):
+        c = self.candidate
+        return {
+            'caregiver_user_id': c.caregiver_user_id,
+            'name': c.name,
+            'city': c.city,
+            'caregiving_type': c.caregiving_type,
+            'hourly_rate': str(c.hourly_rate),
+            'accepted_appointments': c.accepted_appointments,
+            'total_hours': str(c.total_hours),
+            'score': round(self.score, 4),
+        }
+
+
+def _candidate_query():
+    return (
+        select(
+            Caregiver.caregiver_user_id,
+            User.given_name,
+            User.surname,
+            User.city,
+            Caregiver.caregiving_type,
+            Caregiver.hourly_rate,
+            func.coalesce(CaregiverEarnings.accepted_appointments, 0),
+            func.coalesce(CaregiverEarnings.total_hours, 0),
+        )
+        .join(User, User.user_id == Caregiver.caregiver_user_id)
+        .outerjoin(CaregiverEarnings, CaregiverEarnings.caregiver_user_id == Caregiver.caregiver_user_id)
+    )
+
+
+def _load(query):
+    """Run a candidate query on its own connection and build Candidates"""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=LOAD_BATCH_SIZE).execute(query)
+        return [
+            Candidate(cid, f'{given} {surname}', city, ctype, Decimal(rate), accepted, Decimal(hours))
+            for cid, given, surname, city, ctype, rate, accepted, hours in result
+        ]
+
+
+class CandidateIndex:
+    """Caregivers bucketed by (type, city), each bucket sorted by rate"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._buckets = {}
+        self._by_id = {}
+        self._pending = set()
+        self._built_at = None
+
+    # ---- maintenance ----
+
+    def rebuild(self):
+        candidates = _load(_candidate_query())
+        grouped = {}
+        for candidate in candidates:
+            grouped.setdefault(candidate.bucket_key, []).append(candidate)
+        buckets = {}
+        for key, entries in grouped.items():
+            entries.sort()
+            buckets[key] = ([c.hourly_rate for c in entries], entries)
+        with self._lock:
+            self._buckets = buckets
+            self._by_id = {c.caregiver_user_id: c for c in candidates}
+            self._built_at = time.monotonic()
+
+    def invalidate(self, caregiver_ids):
+        """Queue caregivers to be reloaded before the next lookup"""
+        with self._lock:
+            self._pending.update(caregiver_ids)
+
+    def _refresh_pending(self):
+        with self._lock:
+            ids, self._pending = self._pending, set()
+        if not ids:
+            return
+        fresh = {c.caregiver_user_id: c for c in _load(
+            _candidate_query().where(Caregiver.caregiver_user_id.in_(ids))
+        )}
+        with self._lock:
+            for cid in ids:
+                old = self._by_id.pop(cid, None)
+                if old is not None:
+                    self._remove(old)
+                if cid in fresh:
+                    self._by_id[cid] = fresh[cid]
+                    self._insert(fresh[cid])
+
+    def _insert(self, candidate):
+        rates, entries = self._buckets.get(candidate.bucket_key, ([], []))
+        entries = list(entries)
+        insort(entries, candidate)
+        self._buckets[candidate.bucket_key] = ([c.hourly_rate for c in entries], entries)
+
+    def _remove(self, candidate):
+        rates, entries = self._buckets.get(candidate.bucket_key, ([], []))
+        entries = [c for c in entries if c.caregiver_user_id != candidate.caregiver_user_id]
+        if entries:
+            self._buckets[candidate.bucket_key] = ([c.hourly_rate for c in entries], entries)
+        else:
+            self._buckets.pop(candidate.bucket_key, None)
+
+    def ensure_current(self):
+        """
+        Build the index on first use and rebuild it once it is stale. While one
+        thread rebuilds a stale index, the others keep serving the old one.
+        """
+        expired = (
+            self._built_at is None
+            or time.monotonic() - self._built_at > settings.MATCH_INDEX_TTL
+        )
+        if expired and self._rebuild_lock.acquire(blocking=self._built_at is None):
+            try:
+                if self._built_at is None or time.monotonic() - self._built_at > settings.MATCH_INDEX_TTL:
+                    self.rebuild()
+            finally:
+                self._rebuild_lock.release()
+        self._refresh_pending()
+
+    # ---- lookups ----
+
+    def _window(self, key, min_rate, max_rate):
+        rates, entries = self._buckets.get(key, ([], []))
+        lo = bisect_left(rates, min_rate) if min_rate is not None else 0
+        hi = bisect_right(rates, max_rate) if max_rate is not None else len(rates)
+        return entries[lo:hi]
+
+    def candidates(self, caregiving_type, city=None, min_rate=None, max_rate=None):
+        """Candidates of a type in a city (any city when None), sorted by rate"""
+        type_key = _norm(caregiving_type)
+        if city:
+            return self._window((type_key, _norm(city)), min_rate, max_rate)
+        windows = [
+            self._window(key, min_rate, max_rate)
+            for key in list(self._buckets) if key[0] == type_key
+        ]
+        return list(heapq.merge(*windows))
+
+    def match(self, caregiving_type, city=None, min_rate=None, max_rate=None,
+              limit=DEFAULT_MATCH_LIMIT, sort='score', exclude=()):
+        self.ensure_current()
+        window = self.candidates(caregiving_type, city, min_rate, max_rate)
+        if exclude:
+            window = [c for c in window if c.caregiver_user_id not in exclude]
+        if not window:
+            return []
+        low, high = window[0].hourly_rate, window[-1].hourly_rate
+        spread = float(high - low)
+
+        def score(c):
+            history = min(c.accepted_appointments, HISTORY_SATURATION) / HISTORY_SATURATION
+            cheapness = 1.0 - float(c.hourly_rate - low) / spread if spread else 1.0
+            return HISTORY_WEIGHT * history + RATE_WEIGHT * cheapness
+
+        if sort == 'rate':
+            return [Match(c, score(c)) for c in window[:limit]]
+        best = heapq.nlargest(limit, window, key=lambda c: (score(c), -c.caregiver_user_id))
+        return [Match(c, score(c)) for c in best]
+
+
+candidate_index = CandidateIndex()
+
+
+def matches_for_job(job, min_rate=None, max_rate=None, limit=DEFAULT_MATCH_LIMIT, sort='score'):
+    """Ranked caregivers for a job: same caregiving type, in the member's city"""
+    return candidate_index.match(
+        job.required_caregiving_type,
+        city=job.member.user.city,
+        min_rate=min_rate,
+        max_rate=max_rate,
+        limit=limit,
+        sort=sort,
+        exclude={a.caregiver_user_id for a in job.applications},
+    )
+
+
+# ---- session hooks ----
+
+def _touched_caregivers(obj):
+    if isinstance(obj, Caregiver):
+        return {obj.caregiver_user_id}
+    if isinstance(obj, User):
+        return {obj.user_id}
+    if isinstance(obj, Appointment):
+        history = inspect(obj).attrs['caregiver_user_id'].history
+        return {v for v in history.sum() if v is not None}
+    return set()
+
+
+def mark_changed(session, caregiver_ids):
+    """Queue caregivers to be reloaded when the session commits (for bulk statements)"""
+    session.info.setdefault(PENDING_IDS_KEY, set()).update(caregiver_ids)
+
+
+def _after_flush(session, flush_context):
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        ids |= _touched_caregivers(obj)
+    mark_changed(session, ids)
+
+
+def _after_commit(session):
+    ids = session.info.pop(PENDING_IDS_KEY, None)
+    if ids:
+        candidate_index.invalidate(ids)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_IDS_KEY, None)
+
+
+def register(session_factory):
+    """Keep the candidate index current with commits made through session_factory"""
+    event.listen(session_factory, 'after_flush', _after_flush)
+    event.listen(session_factory, 'after_commit', _after_commit)
+    event.listen(session_factory, 'after_rollback', _after_rollback)
@@ -0,0 +1,43 @@
+"""
+Connection pool metrics in the Prometheus text format
+
+Each worker process has its own pools and answers for itself, so samples
+carry the worker's pid; a scraper that hits several workers through the load
+balancer sees them as separate series. Sum in_use across pids to compare
+with the database's connection limit (database.DB_MAX_CONNECTIONS).
+"""
+import os
+
+from django.http import HttpResponse
+
+from database import pool_metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (metric name, type, help, pool_metrics() key)
+POOL_METRICS = [
+    ('db_pool_size', 'gauge', 'Connections the pool keeps open (0 with PgBouncer)', 'size'),
+    ('db_pool_connections_idle', 'gauge', 'Open connections waiting in the pool', 'idle'),
+    ('db_pool_connections_in_use', 'gauge', 'Connections checked out of the pool', 'in_use'),
+    ('db_pool_overflow', 'gauge', 'Connections open beyond the pool size', 'overflow'),
+    ('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool', 'checkouts'),
+    ('db_pool_checkout_timeouts_total', 'counter', 'Checkouts that gave up waiting for a connection', 'timeouts'),
+    ('db_pool_checkout_wait_seconds_total', 'counter', 'Time spent waiting for or opening connections', 'wait_total'),
+    ('db_pool_checkout_wait_seconds_max', 'gauge', 'Longest wait for a connection since the worker started', 'wait_max'),
+]
+
+
+def render_pool_metrics():
+    pid = os.getpid()
+    pools = pool_metrics()
+    lines = []
+    for name, kind, description, key in POOL_METRICS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for pool in pools:
+            lines.append(f'{name}{{pool="{pool["pool"]}",pid="{pid}"}} {pool[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_response():
+    return HttpResponse(render_pool_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,189 @@
+"""
+Request-scoped SQLAlchemy session and per-request SQL instrumentation
+
+SQLAlchemySessionMiddleware opens one session per request as request.db,
+commits it when the response is not a server error and rolls it back
+otherwise. Every statement executed while the request is active is timed; the
+totals are returned in a Server-Timing header (visible in browser dev tools)
+and written as one JSON log line on the caregiving_app.db logger.
+
+With read replicas configured (database.REPLICA_URLS), the session reads
+from a replica, except in requests that may write (anything but GET, HEAD and
+OPTIONS) and for REPLICA_PIN_SECONDS after a write by the same browser,
+tracked with a cookie, so a redirect after a form post does not read data the
+replica has not applied yet.
+
+The middleware works under both WSGI and ASGI. Under ASGI it stays async, so
+async views (caregiving_app/api.py) are not pushed onto a thread; the sync
+session is only committed from a worker thread when a view actually used it.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from sqlalchemy import event
+
+from database import SessionLocal, async_engine, engine, replicas, use_primary
+
+logger = logging.getLogger('caregiving_app.db')
+
+SLOW_STATEMENT_PREVIEW = 200
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_PIN_COOKIE = 'db_primary'
+
+_current_stats = ContextVar('db_query_stats', default=None)
+
+
+class QueryStats:
+    """SQL statement count and timings collected for one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    def server_timing(self):
+        db = f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries"'
+        slowest = f'db-slowest;dur={self.slowest_time * 1000:.2f}'
+        return f'{db}, {slowest}'
+
+
+def current_stats():
+    """Stats of the request being handled, or None outside a request"""
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def install_query_instrumentation(target_engine):
+    if not event.contains(target_engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(target_engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(target_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def wants_primary(request):
+    """True when the request's reads must come from the primary"""
+    return request.method not in SAFE_METHODS or PRIMARY_PIN_COOKIE in request.COOKIES
+
+
+def open_session(request):
+    """A session for the request, pinned to the primary when wants_primary()"""
+    db = SessionLocal()
+    if replicas and wants_primary(request):
+        use_primary(db)
+    return db
+
+
+def pin_after_write(request, response):
+    """After a write, keep this browser on the primary for REPLICA_PIN_SECONDS"""
+    if replicas and request.method not in SAFE_METHODS and response.status_code < 400:
+        response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                            httponly=True, samesite='Lax')
+
+
+def _finish_session(db, response):
+    """Commit or roll back the request's session, then close it"""
+    try:
+        # Django turns view exceptions into 500 responses before they
+        # reach us, so the status code decides the session's fate.
+        if response is None or response.status_code >= 500 or not db.is_active:
+            db.rollback()
+        else:
+            db.commit()
+    finally:
+        db.close()
+
+
+class SQLAlchemySessionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install_query_instrumentation(engine)
+        install_query_instrumentation(async_engine.sync_engine)
+        for replica in replicas.replicas:
+            install_query_instrumentation(replica.engine)
+            install_query_instrumentation(replica.async_engine.sync_engine)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        request.db = open_session(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            try:
+                _finish_session(request.db, response)
+            finally:
+                _current_stats.reset(token)
+
+        response['Server-Timing'] = stats.server_timing()
+        pin_after_write(request, response)
+        self.log(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        request.db = open_session(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            try:
+                if request.db.in_transaction():
+                    await sync_to_async(_finish_session)(request.db, response)
+                else:
+                    request.db.close()
+            finally:
+                _current_stats.reset(token)
+
+        response['Server-Timing'] = stats.server_timing()
+        pin_after_write(request, response)
+        self.log(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def log(self, request, response, stats, elapsed):
+        slowest = stats.slowest_statement
+        if slowest and len(slowest) > SLOW_STATEMENT_PREVIEW:
+            slowest = slowest[:SLOW_STATEMENT_PREVIEW] + '...'
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'db_queries': stats.count,
+            'db_time_ms': round(stats.total_time * 1000, 2),
+            'db_slowest_ms': round(stats.slowest_time * 1000, 2),
+            'db_slowest_sql': slowest,
+        }))
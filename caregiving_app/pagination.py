@@ -0,0 +1,202 @@
+"""
+Keyset (cursor) pagination for SQLAlchemy list queries
+
+Instead of OFFSET, each page remembers the sort key of its first and last row
+in an opaque cursor. The next page is fetched with a row comparison such as
+(date_posted, job_id) > (:last_date, :last_id), which Postgres answers with a
+single index range scan, so every page costs the same regardless of table size.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+
+class SortOption:
+    """A sortable column paired with the primary key used as tie-breaker"""
+
+    def __init__(self, label, column, pk, descending=False):
+        self.label = label
+        self.column = column
+        self.pk = pk
+        self.descending = descending
+
+    @property
+    def key_columns(self):
+        if self.column is self.pk:
+            return [self.pk]
+        return [self.column, self.pk]
+
+
+class Page:
+    """One page of results plus the links needed to move around"""
+
+    def __init__(self, items, page_size, sort, sort_links, next_url=None, prev_url=None):
+        self.items = items
+        self.page_size = page_size
+        self.sort = sort
+        self.sort_links = sort_links
+        self.next_url = next_url
+        self.prev_url = prev_url
+
+    @property
+    def has_other_pages(self):
+        return bool(self.next_url or self.prev_url)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _to_json(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _from_json(value, column):
+    """Convert a cursor value back to the Python type of its column"""
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type in (date, datetime, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'k': [_to_json(v) for v in values]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Return (direction, key values) or None if the token is malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        raw = payload['k']
+        if direction not in ('next', 'prev') or len(raw) != len(columns):
+            return None
+        return direction, [_from_json(v, c) for v, c in zip(raw, columns)]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def get_page_size(request, prefix=''):
+    try:
+        size = int(request.GET.get(f'{prefix}size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _url(request, **params):
+    query = request.GET.copy()
+    for name, value in params.items():
+        if value is None:
+            query.pop(name, None)
+        else:
+            query[name] = value
+    return f'?{query.urlencode()}' if query else '?'
+
+
+def _row_key(item, sort):
+    return [getattr(item, c.key) for c in sort.key_columns]
+
+
+class _Keyset:
+    """Sort, page size and cursor position read from the request"""
+
+    def __init__(self, request, sort_options, default_sort, prefix):
+        self.request = request
+        self.sort_options = sort_options
+        self.sort_param, self.cursor_param = f'{prefix}sort', f'{prefix}cursor'
+
+        sort_name = request.GET.get(self.sort_param, default_sort)
+        if sort_name not in sort_options:
+            sort_name = default_sort
+        self.sort_name = sort_name
+        self.sort = sort_options[sort_name]
+        self.page_size = get_page_size(request, prefix)
+
+        cursor = None
+        if request.GET.get(self.cursor_param):
+            cursor = decode_cursor(request.GET[self.cursor_param], self.sort.key_columns)
+        self.direction, self.key_values = cursor if cursor else ('next', None)
+
+    def apply(self, query):
+        """
+        Filter and order a Query or select() past the cursor and limit it to
+        one row more than a page, which tells whether another page exists.
+        Walking backwards means flipping both the comparison and the ordering,
+        then reversing the fetched rows back into display order.
+        """
+        key_columns = self.sort.key_columns
+        forward = (self.direction == 'next') != self.sort.descending
+        if self.key_values is not None:
+            key = tuple_(*key_columns)
+            values = tuple_(*self.key_values)
+            query = query.filter(key > values if forward else key < values)
+        query = query.order_by(*[c.asc() if forward else c.desc() for c in key_columns])
+        return query.limit(self.page_size + 1)
+
+    def page(self, rows):
+        request, sort, cursor_param = self.request, self.sort, self.cursor_param
+        has_more = len(rows) > self.page_size
+        items = rows[:self.page_size]
+        if self.direction == 'prev':
+            items.reverse()
+
+        next_url = prev_url = None
+        if items:
+            first_key, last_key = _row_key(items[0], sort), _row_key(items[-1], sort)
+            if self.direction == 'next':
+                if has_more:
+                    next_url = _url(request, **{cursor_param: encode_cursor('next', last_key)})
+                if self.key_values is not None:
+                    prev_url = _url(request, **{cursor_param: encode_cursor('prev', first_key)})
+            else:
+                next_url = _url(request, **{cursor_param: encode_cursor('next', last_key)})
+                if has_more:
+                    prev_url = _url(request, **{cursor_param: encode_cursor('prev', first_key)})
+
+        sort_links = [
+            {
+                'name': name,
+                'label': option.label,
+                'url': _url(request, **{self.sort_param: name, cursor_param: None}),
+                'active': name == self.sort_name,
+            }
+            for name, option in self.sort_options.items()
+        ]
+
+        return Page(items, self.page_size, self.sort_name, sort_links, next_url=next_url, prev_url=prev_url)
+
+
+def paginate(request, query, sort_options, default_sort, prefix=''):
+    """
+    Apply keyset pagination to a query using request parameters:
+      <prefix>sort   - one of the keys of sort_options
+      <prefix>size   - rows per page (capped at MAX_PAGE_SIZE)
+      <prefix>cursor - opaque token taken from a next/prev link
+    The prefix lets several independent lists live on the same page.
+    """
+    keyset = _Keyset(request, sort_options, default_sort, prefix)
+    return keyset.page(keyset.apply(query).all())
+
+
+async def apaginate(request, db, statement, sort_options, default_sort, prefix=''):
+    """paginate() for a select() of one entity run on an AsyncSession"""
+    keyset = _Keyset(request, sort_options, default_sort, prefix)
+    result = await db.execute(keyset.apply(statement))
+    return keyset.page(list(result.scalars().all()))
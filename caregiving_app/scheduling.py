@@ -0,0 +1,104 @@
+"""
+Appointment overlap checks and caregiver availability
+
+appointment.time_range is generated from date, time and work hours, and the
+appointment_no_overlap exclusion constraints (schema.sql, one per monthly
+partition, plus a trigger for appointments that run into the next month)
+reject two non-cancelled appointments of one caregiver whose ranges overlap.
+Their GiST indexes on (caregiver_user_id, time_range) serve both lookups here,
+so they only touch the appointments inside the requested window, however long
+the caregiver's history is. Both lookups also bound appointment_date, so only
+the partitions that can hold an overlapping appointment are read.
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, text
+
+from models import Appointment
+
+OVERLAP_CONSTRAINT = 'appointment_no_overlap'
+# work_hours is DECIMAL(5, 2), so an appointment ends less than this many days
+# after its date; one overlapping a window starts no earlier than this before it
+MAX_APPOINTMENT_DAYS = 42
+MAX_CONFLICTS_SHOWN = 5
+
+DEFAULT_DAY_START = time(8, 0)
+DEFAULT_DAY_END = time(20, 0)
+DEFAULT_MIN_SLOT_HOURS = 1
+MAX_AVAILABILITY_DAYS = 62
+
+# Working hours of every day in [start, end) as one multirange, minus the
+# caregiver's booked ranges in that window. Needs PostgreSQL 14+ (multiranges).
+# It only reads, so a replica can answer it (see RoutingSession).
+AVAILABILITY_QUERY = text('''
+    WITH working AS (
+        SELECT range_agg(tsrange(day::date + CAST(:day_start AS time), day::date + CAST(:day_end AS time))) AS hours
+        FROM generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp) - INTERVAL '1 day',
+                             INTERVAL '1 day') AS day
+    ),
+    booked AS (
+        SELECT COALESCE(range_agg(time_range), '{}'::tsmultirange) AS busy
+        FROM appointment
+        WHERE caregiver_user_id = :caregiver_id
+          AND status <> 'Cancelled'
+          AND time_range && tsrange(CAST(:start AS timestamp), CAST(:end AS timestamp))
+          AND appointment_date BETWEEN CAST(:start AS date) - :max_days AND CAST(:end AS date)
+    )
+    SELECT lower(slot) AS slot_start, upper(slot) AS slot_end
+    FROM working, booked, unnest(working.hours - booked.busy) AS slot
+    WHERE upper(slot) - lower(slot) >= :min_length
+    ORDER BY slot_start
+''').execution_options(readonly=True)
+
+
+def booked_range(appointment_date, appointment_time, work_hours):
+    """(start, end) datetimes of an appointment, as stored in time_range"""
+    start = datetime.combine(appointment_date, appointment_time)
+    return start, start + timedelta(hours=float(work_hours))
+
+
+def find_conflicts(db, caregiver_user_id, start, end, exclude_id=None):
+    """Non-cancelled appointments of the caregiver overlapping [start, end)"""
+    query = db.query(Appointment).filter(
+        Appointment.caregiver_user_id == caregiver_user_id,
+        Appointment.status != 'Cancelled',
+        Appointment.time_range.overlaps(func.tsrange(start, end)),
+        Appointment.appointment_date.between(start.date() - timedelta(days=MAX_APPOINTMENT_DAYS), end.date()),
+    )
+    if exclude_id is not None:
+        query = query.filter(Appointment.appointment_id != exclude_id)
+    return query.order_by(Appointment.time_range).limit(MAX_CONFLICTS_SHOWN).all()
+
+
+def conflict_message(conflicts):
+    booked = ', '.join(
+        f'#{a.appointment_id} on {a.appointment_date} at {a.appointment_time:%H:%M} '
+        f'for {a.work_hours} h'
+        for a in conflicts
+    )
+    return f'This caregiver is already booked at that time: {booked}.'
+
+
+def is_overlap_violation(exc):
+    """True for an IntegrityError raised by an appointment_no_overlap constraint"""
+    diag = getattr(getattr(exc, 'orig', None), 'diag', None)
+    return (getattr(diag, 'constraint_name', None) or '').startswith(OVERLAP_CONSTRAINT)
+
+
+def free_slots(db, caregiver_user_id, start, end, day_start=DEFAULT_DAY_START,
+               day_end=DEFAULT_DAY_END, min_hours=DEFAULT_MIN_SLOT_HOURS):
+    """
+    Free (start, end) datetime pairs of a caregiver between the dates start
+    (inclusive) and end (exclusive), within working hours of each day and at
+    least min_hours long.
+    """
+    rows = db.execute(AVAILABILITY_QUERY, {
+        'caregiver_id': caregiver_user_id,
+        'start': start,
+        'end': end,
+        'day_start': day_start,
+        'day_end': day_end,
+        'min_length': timedelta(hours=min_hours),
+        'max_days': MAX_APPOINTMENT_DAYS,
+    })
+    return [(row.slot_start, row.slot_end) for row in rows]
@@ -0,0 +1,124 @@
+"""
+Ranked full-text and fuzzy search over jobs, members and caregivers
+
+Each searchable table has a generated search_vector column with a GIN index
+(see schema.sql), so a websearch-style query such as `"no pets" -smoking`
+is answered from the index. Queries of MIN_SUBSTRING_LENGTH characters or more
+also match as a substring of the main text column through a pg_trgm index,
+which catches partial words full-text search misses ("soft-spo").
+
+Results are ordered by ts_rank_cd plus a weighted word_similarity, and paged
+with the keyset paginator using (rank, primary key) as the cursor. The rank is
+cast to double precision so the value stored in a cursor compares exactly
+with the value Postgres recomputes for the next page.
+"""
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from sqlalchemy import cast, func, literal, or_
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, REGCONFIG
+from sqlalchemy.orm import contains_eager, joinedload
+
+from models import User, Caregiver, Member, Job
+from .pagination import SortOption
+
+SEARCH_CONFIG = 'english'
+MAX_QUERY_LENGTH = 200
+MIN_SUBSTRING_LENGTH = 3
+SIMILARITY_WEIGHT = 0.5
+
+# ts_headline is only evaluated for the rows of the page (Postgres postpones
+# expensive select-list expressions past ORDER BY ... LIMIT). The control
+# characters mark matches without letting user text inject HTML.
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = (
+    f'MaxFragments=2, MaxWords=20, MinWords=8, '
+    f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}'
+)
+
+
+class SearchScope:
+    """A searchable entity: its vector, substring column and how to show a hit"""
+
+    def __init__(self, label, entity, pk, vector, text, document, url_name, prepare, describe):
+        self.label = label
+        self.entity = entity
+        self.pk = pk
+        self.vector = vector
+        self.text = text
+        self.document = document
+        self.url_name = url_name
+        self.prepare = prepare
+        self.describe = describe
+
+
+SEARCH_SCOPES = {
+    'jobs': SearchScope(
+        'Jobs', Job, Job.job_id, Job.search_vector, Job.other_requirements,
+        Job.other_requirements, 'job_detail',
+        prepare=lambda query: query.options(joinedload(Job.member).joinedload(Member.user)),
+        describe=lambda job: f'{job.required_caregiving_type} - posted by {job.member.user.full_name}',
+    ),
+    'members': SearchScope(
+        'Members', Member, Member.member_user_id, Member.search_vector, Member.house_rules,
+        func.concat_ws(' ', Member.house_rules, Member.dependent_description), 'member_detail',
+        prepare=lambda query: query.options(joinedload(Member.user)),
+        describe=lambda member: member.user.full_name,
+    ),
+    'caregivers': SearchScope(
+        'Caregivers', Caregiver, Caregiver.caregiver_user_id, User.search_vector,
+        User.profile_description, User.profile_description, 'caregiver_detail',
+        prepare=lambda query: query.join(Caregiver.user).options(contains_eager(Caregiver.user)),
+        describe=lambda caregiver: (
+            f'{caregiver.user.full_name} ({caregiver.caregiving_type}, ${caregiver.hourly_rate}/h)'
+        ),
+    ),
+}
+
+
+def search_query(db, scope, q):
+    """
+    Query returning (entity, pk, rank, headline) rows matching q, plus the
+    sort options to paginate it with. The sort options depend on q because the
+    rank expression does; the primary key is selected on its own so the
+    paginator can read the cursor values off each row.
+    """
+    tsquery = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), q)
+    conditions = [scope.vector.bool_op('@@')(tsquery)]
+    score = func.ts_rank_cd(scope.vector, tsquery, 32)
+    if len(q) >= MIN_SUBSTRING_LENGTH:
+        pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append(scope.text.ilike(pattern))
+        similarity = func.word_similarity(literal(q), func.coalesce(scope.text, ''))
+        score = score + similarity * SIMILARITY_WEIGHT
+    rank = cast(score, DOUBLE_PRECISION).label('rank')
+    headline = func.ts_headline(
+        cast(SEARCH_CONFIG, REGCONFIG), func.coalesce(scope.document, ''), tsquery, HEADLINE_OPTIONS
+    ).label('headline')
+
+    query = scope.prepare(db.query(scope.entity, scope.pk, rank, headline)).filter(or_(*conditions))
+    sort_options = {
+        'rank': SortOption('Relevance', rank, scope.pk, descending=True),
+        'id': SortOption('ID', scope.pk, scope.pk),
+    }
+    return query, sort_options
+
+
+def highlight(headline):
+    """Escape a ts_headline fragment and turn the match markers into <mark> tags"""
+    html = escape(headline).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    return mark_safe(html)
+
+
+def search_results(scope, page):
+    """Plain dicts for the rows of a search page, shared by the HTML and JSON views"""
+    results = []
+    for entity, pk, rank, headline in page:
+        results.append({
+            'id': pk,
+            'label': scope.describe(entity),
+            'snippet': highlight(headline),
+            'rank': round(rank, 4),
+            'url': reverse(scope.url_name, args=[pk]),
+        })
+    return results
@@ -0,0 +1,62 @@
+/* Typeahead inputs backed by the JSON lookup endpoints (see includes/typeahead.html) */
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.typeahead').forEach(function (widget) {
+        var input = widget.querySelector('.typeahead-input');
+        var hidden = widget.querySelector('.typeahead-value');
+        var list = widget.querySelector('.typeahead-results');
+        var url = widget.dataset.lookupUrl;
+        var timer = null;
+        var latest = 0;
+
+        function close() {
+            list.innerHTML = '';
+            list.style.display = 'none';
+        }
+
+        function choose(item) {
+            input.value = item.label;
+            hidden.value = item.id;
+            input.setCustomValidity('');
+            close();
+        }
+
+        function search() {
+            var request = ++latest;
+            fetch(url + '?q=' + encodeURIComponent(input.value.trim()))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    // Ignore responses that arrive after a newer keystroke
+                    if (request !== latest) {
+                        return;
+                    }
+                    list.innerHTML = '';
+                    data.results.forEach(function (item) {
+                        var li = document.createElement('li');
+                        li.textContent = item.label;
+                        li.addEventListener('mousedown', function (event) {
+                            event.preventDefault();
+                            choose(item);
+                        });
+                        list.appendChild(li);
+                    });
+                    list.style.display = data.results.length ? 'block' : 'none';
+                });
+        }
+
+        input.addEventListener('input', function () {
+            hidden.value = '';
+            clearTimeout(timer);
+            timer = setTimeout(search, 200);
+        });
+        input.addEventListener('focus', search);
+        input.addEventListener('blur', close);
+
+        widget.closest('form').addEventListener('submit', function (event) {
+            if (!hidden.value) {
+                event.preventDefault();
+                input.setCustomValidity('Please pick an entry from the list.');
+                input.reportValidity();
+            }
+        });
+    });
+});
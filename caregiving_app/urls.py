@@ -2,7 +2,7 @@
 URL Configuration for Caregiving App
 """
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Home
@@ -21,11 +21,13 @@ urlpatterns = [
     path('caregivers/create/', views.caregiver_create, name='caregiver_create'),
     path('caregivers/<int:caregiver_id>/update/', views.caregiver_update, name='caregiver_update'),
     path('caregivers/<int:caregiver_id>/delete/', views.caregiver_delete, name='caregiver_delete'),
+    path('caregivers/<int:caregiver_id>/availability/', views.caregiver_availability, name='caregiver_availability'),
     
     # Members
     path('members/', views.member_list, name='member_list'),
     path('members/<int:member_id>/', views.member_detail, name='member_detail'),
     path('members/create/', views.member_create, name='member_create'),
+    path('members/bulk-delete/', views.member_bulk_delete, name='member_bulk_delete'),
     path('members/<int:member_id>/update/', views.member_update, name='member_update'),
     path('members/<int:member_id>/delete/', views.member_delete, name='member_delete'),
     
@@ -35,11 +37,42 @@ urlpatterns = [
     path('jobs/create/', views.job_create, name='job_create'),
     path('jobs/<int:job_id>/update/', views.job_update, name='job_update'),
     path('jobs/<int:job_id>/delete/', views.job_delete, name='job_delete'),
+    path('jobs/<int:job_id>/matches/', views.job_matches, name='job_matches'),
     
     # Appointments
     path('appointments/', views.appointment_list, name='appointment_list'),
     path('appointments/<int:appointment_id>/', views.appointment_detail, name='appointment_detail'),
     path('appointments/create/', views.appointment_create, name='appointment_create'),
+    path('appointments/bulk/', views.appointment_bulk_create, name='appointment_bulk_create'),
+    path('appointments/bulk-status/', views.appointment_bulk_status, name='appointment_bulk_status'),
+    path('appointments/bulk-status/api/', views.appointment_bulk_status_api, name='appointment_bulk_status_api'),
     path('appointments/<int:appointment_id>/update/', views.appointment_update, name='appointment_update'),
     path('appointments/<int:appointment_id>/delete/', views.appointment_delete, name='appointment_delete'),
+    
+    # Typeahead lookups
+    path('lookup/users/available/', views.lookup_available_users, name='lookup_available_users'),
+    path('lookup/members/', views.lookup_members, name='lookup_members'),
+    path('lookup/caregivers/', views.lookup_caregivers, name='lookup_caregivers'),
+    
+    # Search
+    path('search/', views.search, name='search'),
+    path('search/api/', views.search_api, name='search_api'),
+    
+    # Reports
+    path('reports/earnings/', views.earnings_report, name='earnings_report'),
+    path('reports/job-applications/', views.job_applications_report, name='job_applications_report'),
+    path('reports/job-applications/api/', views.job_applications_api, name='job_applications_api'),
+    
+    # Exports
+    path('exports/appointments/', views.export_appointments, name='export_appointments'),
+    path('exports/jobs/', views.export_jobs, name='export_jobs'),
+    path('exports/job-applications/', views.export_job_applications, name='export_job_applications'),
+
+    # Metrics
+    path('metrics/', views.metrics, name='metrics'),
+
+    # Async JSON API
+    path('api/v1/csrf/', api.csrf_token, name='api_csrf_token'),
+    path('api/v1/<resource_name>/', api.collection, name='api_collection'),
+    path('api/v1/<resource_name>/<int:pk>/', api.item, name='api_item'),
 ]
@@ -1,62 +1,145 @@
 """
 Django Views using SQLAlchemy ORM for CRUD operations
 """
+import hmac
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.http import Http404
-from sqlalchemy.orm import joinedload
-from datetime import datetime, date
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_POST
+from sqlalchemy import exists, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, undefer
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from models import (
+    User, Caregiver, Member, Address, Job, JobApplication, Appointment,
+    CaregiverEarnings, EntityCounter, APPOINTMENT_STATUSES,
+)
+from .bulk import (
+    ALLOWED_TRANSITIONS, BatchError, delete_cascading, insert_appointments, parse_member_filter,
+    parse_transition, read_batch, transition_appointments, validate_appointments,
+)
+from .cache import cached_detail, entity_tag
+from .matching import DEFAULT_MATCH_LIMIT, MATCH_SORTS, MAX_MATCH_LIMIT, matches_for_job
+from .metrics import metrics_response
+from .exports import (
+    EXPORT_FORMATS, appointments_query, export_response, job_applications_query, job_applications_view,
+    jobs_query,
+)
+from .pagination import SortOption, paginate
+from .scheduling import (
+    DEFAULT_DAY_END, DEFAULT_DAY_START, DEFAULT_MIN_SLOT_HOURS, MAX_AVAILABILITY_DAYS,
+    booked_range, conflict_message, find_conflicts, free_slots, is_overlap_violation,
+)
+from .search import MAX_QUERY_LENGTH, SEARCH_SCOPES, search_query, search_results
+
+
+# Sortable columns for each list view. Every option is backed by an index
+# on (column, primary key) in schema.sql so keyset pages stay index scans.
+USER_SORTS = {
+    'id': SortOption('ID', User.user_id, User.user_id),
+    'surname': SortOption('Surname', User.surname, User.user_id),
+}
+CAREGIVER_SORTS = {
+    'id': SortOption('ID', Caregiver.caregiver_user_id, Caregiver.caregiver_user_id),
+    'rate': SortOption('Hourly Rate', Caregiver.hourly_rate, Caregiver.caregiver_user_id),
+}
+MEMBER_SORTS = {
+    'id': SortOption('ID', Member.member_user_id, Member.member_user_id),
+}
+JOB_SORTS = {
+    'id': SortOption('ID', Job.job_id, Job.job_id),
+    'newest': SortOption('Newest', Job.date_posted, Job.job_id, descending=True),
+}
+APPOINTMENT_SORTS = {
+    'id': SortOption('ID', Appointment.appointment_id, Appointment.appointment_id),
+    'date': SortOption('Date', Appointment.appointment_date, Appointment.appointment_id),
+}
+# Child lists on the caregiver and member detail pages. Each is its own keyset
+# query on a (parent, sort key) index, so a detail page costs the same however
+# many appointments or applications the parent has.
+CHILD_APPOINTMENT_SORTS = {
+    'date': SortOption('Date', Appointment.appointment_date, Appointment.appointment_id, descending=True),
+}
+CHILD_APPLICATION_SORTS = {
+    'date': SortOption('Date Applied', JobApplication.date_applied, JobApplication.application_id, descending=True),
+}
+CHILD_JOB_SORTS = {
+    'newest': SortOption('Newest', Job.date_posted, Job.job_id, descending=True),
+}
+CHILD_ADDRESS_SORTS = {
+    'id': SortOption('ID', Address.address_id, Address.address_id),
+}
+JOB_APPLICATION_SORTS = {
+    'newest': SortOption(
+        'Newest', job_applications_view.c.date_applied, job_applications_view.c.application_id, descending=True
+    ),
+    'id': SortOption('ID', job_applications_view.c.application_id, job_applications_view.c.application_id),
+}
+EARNINGS_SORTS = {
+    'earnings': SortOption(
+        'Total Earnings', CaregiverEarnings.total_earnings, CaregiverEarnings.caregiver_user_id, descending=True
+    ),
+    'id': SortOption('Caregiver ID', CaregiverEarnings.caregiver_user_id, CaregiverEarnings.caregiver_user_id),
+}
+
 
-from database import SessionLocal
-from models import User, Caregiver, Member, Address, Job, JobApplication, Appointment
+def _child_counts(db, **children):
+    """Exact sizes of a parent's child lists in one query; children are name=(model, condition)"""
+    counts = [
+        select(func.count()).select_from(model).where(condition).scalar_subquery().label(name)
+        for name, (model, condition) in children.items()
+    ]
+    return db.execute(select(*counts)).one()._asdict()
 
 
 # ============ Home and Dashboard Views ============
 
 def index(request):
     """Home page with overview statistics"""
-    db = SessionLocal()
-    try:
-        stats = {
-            'total_users': db.query(User).count(),
-            'total_caregivers': db.query(Caregiver).count(),
-            'total_members': db.query(Member).count(),
-            'total_jobs': db.query(Job).count(),
-            'total_appointments': db.query(Appointment).count(),
-        }
-        return render(request, 'index.html', {'stats': stats})
-    finally:
-        db.close()
+    db = request.db
+    counts = EntityCounter.get_counts(db)
+    stats = {
+        'total_users': counts.get('user', 0),
+        'total_caregivers': counts.get('caregiver', 0),
+        'total_members': counts.get('member', 0),
+        'total_jobs': counts.get('job', 0),
+        'total_appointments': counts.get('appointment', 0),
+    }
+    return render(request, 'index.html', {'stats': stats})
 
 
 # ============ User CRUD Operations ============
 
 def user_list(request):
-    """List all users"""
-    db = SessionLocal()
-    try:
-        users = db.query(User).all()
-        return render(request, 'users/user_list.html', {'users': users})
-    finally:
-        db.close()
+    """List users, one keyset page at a time"""
+    db = request.db
+    page = paginate(request, db.query(User), USER_SORTS, 'id')
+    return render(request, 'users/user_list.html', {'users': page, 'page': page})
+
+
+def load_user_detail(db, user_id):
+    user = db.query(User).filter(User.user_id == user_id).first()
+    return user, [entity_tag('user', user_id)]
 
 
 def user_detail(request, user_id):
     """View user details"""
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise Http404("User not found")
-        return render(request, 'users/user_detail.html', {'user': user})
-    finally:
-        db.close()
+    db = request.db
+    user = cached_detail('user', user_id, lambda: load_user_detail(db, user_id), db)
+    if not user:
+        raise Http404("User not found")
+    return render(request, 'users/user_detail.html', {'user': user})
 
 
 def user_create(request):
     """Create new user"""
     if request.method == 'POST':
-        db = SessionLocal()
+        db = request.db
         try:
             user = User(
                 email=request.POST.get('email'),
@@ -74,15 +157,13 @@ def user_create(request):
         except Exception as e:
             db.rollback()
             messages.error(request, f'Error creating user: {str(e)}')
-        finally:
-            db.close()
     
     return render(request, 'users/user_form.html', {'action': 'Create'})
 
 
 def user_update(request, user_id):
     """Update existing user"""
-    db = SessionLocal()
+    db = request.db
     try:
         user = db.query(User).filter(User.user_id == user_id).first()
         if not user:
@@ -107,18 +188,14 @@ def user_update(request, user_id):
         db.rollback()
         messages.error(request, f'Error updating user: {str(e)}')
         return redirect('user_list')
-    finally:
-        db.close()
 
 
 def user_delete(request, user_id):
     """Delete user"""
     if request.method == 'POST':
-        db = SessionLocal()
+        db = request.db
         try:
-            user = db.query(User).filter(User.user_id == user_id).first()
-            if user:
-                db.delete(user)
+            if delete_cascading(db, 'user', [User.user_id == user_id]):
                 db.commit()
                 messages.success(request, 'User deleted successfully!')
             else:
@@ -126,8 +203,6 @@ def user_delete(request, user_id):
         except Exception as e:
             db.rollback()
             messages.error(request, f'Error deleting user: {str(e)}')
-        finally:
-            db.close()
     
     return redirect('user_list')
 
@@ -135,43 +210,107 @@ def user_delete(request, user_id):
 # ============ Caregiver CRUD Operations ============
 
 def caregiver_list(request):
-    """List all caregivers"""
-    db = SessionLocal()
-    try:
-        caregivers = db.query(Caregiver).options(joinedload(Caregiver.user)).all()
-        return render(request, 'caregivers/caregiver_list.html', {'caregivers': caregivers})
-    finally:
-        db.close()
+    """List caregivers, one keyset page at a time"""
+    db = request.db
+    query = db.query(Caregiver).options(joinedload(Caregiver.user))
+    page = paginate(request, query, CAREGIVER_SORTS, 'id')
+    return render(request, 'caregivers/caregiver_list.html', {'caregivers': page, 'page': page})
+
+
+def load_caregiver_detail(db, caregiver_id):
+    caregiver = db.query(Caregiver).options(
+        joinedload(Caregiver.user)
+    ).filter(Caregiver.caregiver_user_id == caregiver_id).first()
+    return caregiver, [entity_tag('caregiver', caregiver_id), entity_tag('user', caregiver_id)]
 
 
 def caregiver_detail(request, caregiver_id):
     """View caregiver details"""
-    db = SessionLocal()
-    try:
-        caregiver = db.query(Caregiver).options(
-            joinedload(Caregiver.user),
-            joinedload(Caregiver.appointments),
-            joinedload(Caregiver.job_applications)
-        ).filter(Caregiver.caregiver_user_id == caregiver_id).first()
+    db = request.db
+    caregiver = cached_detail('caregiver', caregiver_id, lambda: load_caregiver_detail(db, caregiver_id), db)
         
-        if not caregiver:
-            raise Http404("Caregiver not found")
-        
-        return render(request, 'caregivers/caregiver_detail.html', {'caregiver': caregiver})
-    finally:
-        db.close()
+    if not caregiver:
+        raise Http404("Caregiver not found")
+
+    appointments = paginate(
+        request,
+        db.query(Appointment).options(joinedload(Appointment.member).joinedload(Member.user))
+        .filter(Appointment.caregiver_user_id == caregiver_id),
+        CHILD_APPOINTMENT_SORTS, 'date', prefix='appt_',
+    )
+    applications = paginate(
+        request,
+        db.query(JobApplication).options(joinedload(JobApplication.job))
+        .filter(JobApplication.caregiver_user_id == caregiver_id),
+        CHILD_APPLICATION_SORTS, 'date', prefix='app_',
+    )
+    counts = _child_counts(
+        db,
+        appointments=(Appointment, Appointment.caregiver_user_id == caregiver_id),
+        applications=(JobApplication, JobApplication.caregiver_user_id == caregiver_id),
+    )
+    return render(request, 'caregivers/caregiver_detail.html', {
+        'caregiver': caregiver,
+        'appointments': appointments,
+        'applications': applications,
+        'counts': counts,
+    })
+
+
+def _availability_params(request):
+    """
+    Read start/end dates (end exclusive, default: the next 7 days), working
+    hours and minimum slot length. Returns (params, None) or (None, error).
+    """
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else date.today()
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else start + timedelta(days=7)
+    except ValueError:
+        return None, 'start and end must be dates in YYYY-MM-DD format'
+    if not start < end <= start + timedelta(days=MAX_AVAILABILITY_DAYS):
+        return None, f'end must be after start and at most {MAX_AVAILABILITY_DAYS} days later'
+    try:
+        day_start = time.fromisoformat(request.GET.get('day_start') or DEFAULT_DAY_START.isoformat())
+        day_end = time.fromisoformat(request.GET.get('day_end') or DEFAULT_DAY_END.isoformat())
+    except ValueError:
+        return None, 'day_start and day_end must be times in HH:MM format'
+    if day_start >= day_end:
+        return None, 'day_start must be before day_end'
+    try:
+        min_hours = float(request.GET.get('min_hours', DEFAULT_MIN_SLOT_HOURS))
+    except ValueError:
+        return None, 'min_hours must be a number'
+    if min_hours <= 0:
+        return None, 'min_hours must be positive'
+    return {
+        'start': start, 'end': end, 'day_start': day_start, 'day_end': day_end, 'min_hours': min_hours,
+    }, None
+
+
+def caregiver_availability(request, caregiver_id):
+    """A caregiver's free slots within working hours over a date range, as JSON"""
+    params, error = _availability_params(request)
+    if error:
+        return HttpResponseBadRequest(error)
+    db = request.db
+    if not db.query(exists().where(Caregiver.caregiver_user_id == caregiver_id)).scalar():
+        raise Http404("Caregiver not found")
+    slots = free_slots(db, caregiver_id, **params)
+    return JsonResponse({
+        'caregiver_user_id': caregiver_id,
+        'start': params['start'],
+        'end': params['end'],
+        'slots': [
+            {'start': start, 'end': end, 'hours': (end - start).total_seconds() / 3600}
+            for start, end in slots
+        ],
+    })
 
 
 def caregiver_create(request):
     """Create new caregiver"""
-    db = SessionLocal()
+    db = request.db
     try:
-        # Get users who are not already caregivers or members
-        caregiver_ids = [c.caregiver_user_id for c in db.query(Caregiver).all()]
-        member_ids = [m.member_user_id for m in db.query(Member).all()]
-        used_ids = set(caregiver_ids + member_ids)
-        available_users = db.query(User).filter(~User.user_id.in_(used_ids)).all()
-        
         if request.method == 'POST':
             caregiver = Caregiver(
                 caregiver_user_id=request.POST.get('user_id'),
@@ -185,21 +324,16 @@ def caregiver_create(request):
             messages.success(request, 'Caregiver created successfully!')
             return redirect('caregiver_list')
         
-        return render(request, 'caregivers/caregiver_form.html', {
-            'action': 'Create',
-            'available_users': available_users
-        })
+        return render(request, 'caregivers/caregiver_form.html', {'action': 'Create'})
     except Exception as e:
         db.rollback()
         messages.error(request, f'Error creating caregiver: {str(e)}')
         return redirect('caregiver_list')
-    finally:
-        db.close()
 
 
 def caregiver_update(request, caregiver_id):
     """Update existing caregiver"""
-    db = SessionLocal()
+    db = request.db
     try:
         caregiver = db.query(Caregiver).options(joinedload(Caregiver.user)).filter(
             Caregiver.caregiver_user_id == caregiver_id
@@ -226,18 +360,14 @@ def caregiver_update(request, caregiver_id):
         db.rollback()
         messages.error(request, f'Error updating caregiver: {str(e)}')
         return redirect('caregiver_list')
-    finally:
-        db.close()
 
 
 def caregiver_delete(request, caregiver_id):
     """Delete caregiver"""
     if request.method == 'POST':
-        db = SessionLocal()
+        db = request.db
         try:
-            caregiver = db.query(Caregiver).filter(Caregiver.caregiver_user_id == caregiver_id).first()
-            if caregiver:
-                db.delete(caregiver)
+            if delete_cascading(db, 'caregiver', [Caregiver.caregiver_user_id == caregiver_id]):
                 db.commit()
                 messages.success(request, 'Caregiver deleted successfully!')
             else:
@@ -245,8 +375,6 @@ def caregiver_delete(request, caregiver_id):
         except Exception as e:
             db.rollback()
             messages.error(request, f'Error deleting caregiver: {str(e)}')
-        finally:
-            db.close()
     
     return redirect('caregiver_list')
 
@@ -254,44 +382,61 @@ def caregiver_delete(request, caregiver_id):
 # ============ Member CRUD Operations ============
 
 def member_list(request):
-    """List all members"""
-    db = SessionLocal()
-    try:
-        members = db.query(Member).options(joinedload(Member.user)).all()
-        return render(request, 'members/member_list.html', {'members': members})
-    finally:
-        db.close()
+    """List members, one keyset page at a time"""
+    db = request.db
+    query = db.query(Member).options(joinedload(Member.user))
+    page = paginate(request, query, MEMBER_SORTS, 'id')
+    return render(request, 'members/member_list.html', {'members': page, 'page': page})
+
+
+def load_member_detail(db, member_id):
+    member = db.query(Member).options(
+        joinedload(Member.user)
+    ).filter(Member.member_user_id == member_id).first()
+    return member, [entity_tag('member', member_id), entity_tag('user', member_id)]
 
 
 def member_detail(request, member_id):
     """View member details"""
-    db = SessionLocal()
-    try:
-        member = db.query(Member).options(
-            joinedload(Member.user),
-            joinedload(Member.addresses),
-            joinedload(Member.jobs),
-            joinedload(Member.appointments)
-        ).filter(Member.member_user_id == member_id).first()
+    db = request.db
+    member = cached_detail('member', member_id, lambda: load_member_detail(db, member_id), db)
         
-        if not member:
-            raise Http404("Member not found")
-        
-        return render(request, 'members/member_detail.html', {'member': member})
-    finally:
-        db.close()
+    if not member:
+        raise Http404("Member not found")
+
+    addresses = paginate(
+        request, db.query(Address).filter(Address.member_user_id == member_id),
+        CHILD_ADDRESS_SORTS, 'id', prefix='addr_',
+    )
+    jobs = paginate(
+        request, db.query(Job).filter(Job.member_user_id == member_id),
+        CHILD_JOB_SORTS, 'newest', prefix='job_',
+    )
+    appointments = paginate(
+        request,
+        db.query(Appointment).options(joinedload(Appointment.caregiver).joinedload(Caregiver.user))
+        .filter(Appointment.member_user_id == member_id),
+        CHILD_APPOINTMENT_SORTS, 'date', prefix='appt_',
+    )
+    counts = _child_counts(
+        db,
+        addresses=(Address, Address.member_user_id == member_id),
+        jobs=(Job, Job.member_user_id == member_id),
+        appointments=(Appointment, Appointment.member_user_id == member_id),
+    )
+    return render(request, 'members/member_detail.html', {
+        'member': member,
+        'addresses': addresses,
+        'jobs': jobs,
+        'appointments': appointments,
+        'counts': counts,
+    })
 
 
 def member_create(request):
     """Create new member"""
-    db = SessionLocal()
+    db = request.db
     try:
-        # Get users who are not already caregivers or members
-        caregiver_ids = [c.caregiver_user_id for c in db.query(Caregiver).all()]
-        member_ids = [m.member_user_id for m in db.query(Member).all()]
-        used_ids = set(caregiver_ids + member_ids)
-        available_users = db.query(User).filter(~User.user_id.in_(used_ids)).all()
-        
         if request.method == 'POST':
             member = Member(
                 member_user_id=request.POST.get('user_id'),
@@ -303,21 +448,16 @@ def member_create(request):
             messages.success(request, 'Member created successfully!')
             return redirect('member_list')
         
-        return render(request, 'members/member_form.html', {
-            'action': 'Create',
-            'available_users': available_users
-        })
+        return render(request, 'members/member_form.html', {'action': 'Create'})
     except Exception as e:
         db.rollback()
         messages.error(request, f'Error creating member: {str(e)}')
         return redirect('member_list')
-    finally:
-        db.close()
 
 
 def member_update(request, member_id):
     """Update existing member"""
-    db = SessionLocal()
+    db = request.db
     try:
         member = db.query(Member).options(joinedload(Member.user)).filter(
             Member.member_user_id == member_id
@@ -342,18 +482,14 @@ def member_update(request, member_id):
         db.rollback()
         messages.error(request, f'Error updating member: {str(e)}')
         return redirect('member_list')
-    finally:
-        db.close()
 
 
 def member_delete(request, member_id):
     """Delete member"""
     if request.method == 'POST':
-        db = SessionLocal()
+        db = request.db
         try:
-            member = db.query(Member).filter(Member.member_user_id == member_id).first()
-            if member:
-                db.delete(member)
+            if delete_cascading(db, 'member', [Member.member_user_id == member_id]):
                 db.commit()
                 messages.success(request, 'Member deleted successfully!')
             else:
@@ -361,47 +497,125 @@ def member_delete(request, member_id):
         except Exception as e:
             db.rollback()
             messages.error(request, f'Error deleting member: {str(e)}')
-        finally:
-            db.close()
     
     return redirect('member_list')
 
 
+@require_POST
+def member_bulk_delete(request):
+    """
+    Delete every member matching a JSON filter (given_name, surname, city,
+    street, town) in one statement; their addresses, jobs, applications and
+    appointments go with them through ON DELETE CASCADE. With ?dry_run=1 only
+    the ids that would be deleted are returned. Clients send a CSRF token in
+    the X-CSRFToken header (GET /api/v1/csrf/).
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+    conditions, error = parse_member_filter(data)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    db = request.db
+    if request.GET.get('dry_run') in ('1', 'true'):
+        ids = [m for (m,) in db.query(Member.member_user_id).filter(*conditions).order_by(Member.member_user_id)]
+        return JsonResponse({'would_delete': len(ids), 'member_ids': ids})
+    ids = delete_cascading(db, 'member', conditions)
+    db.commit()
+    return JsonResponse({'deleted': len(ids), 'member_ids': ids})
+
+
 # ============ Job CRUD Operations ============
 
 def job_list(request):
-    """List all jobs"""
-    db = SessionLocal()
+    """List jobs, one keyset page at a time"""
+    db = request.db
+    query = db.query(Job).options(joinedload(Job.member).joinedload(Member.user))
+    page = paginate(request, query, JOB_SORTS, 'id')
+    return render(request, 'jobs/job_list.html', {'jobs': page, 'page': page})
+
+
+def load_job_detail(db, job_id):
+    job = db.query(Job).options(
+        joinedload(Job.member).joinedload(Member.user),
+        joinedload(Job.applications).joinedload(JobApplication.caregiver).joinedload(Caregiver.user)
+    ).filter(Job.job_id == job_id).first()
+    if not job:
+        return None, []
+    deps = [entity_tag('job', job_id), entity_tag('member', job.member_user_id), entity_tag('user', job.member_user_id)]
+    deps += [entity_tag('user', a.caregiver_user_id) for a in job.applications]
+    deps += [entity_tag('caregiver', a.caregiver_user_id) for a in job.applications]
+    return job, deps
+
+
+def _match_params(request):
+    """
+    Read min_rate, max_rate, limit and sort for caregiver matching.
+    Returns (params, None) or (None, error message).
+    """
+    params = {}
+    for name in ('min_rate', 'max_rate'):
+        value = request.GET.get(name)
+        try:
+            params[name] = Decimal(value) if value else None
+        except InvalidOperation:
+            return None, f'{name} must be a number'
     try:
-        jobs = db.query(Job).options(joinedload(Job.member).joinedload(Member.user)).all()
-        return render(request, 'jobs/job_list.html', {'jobs': jobs})
-    finally:
-        db.close()
+        limit = int(request.GET.get('limit', DEFAULT_MATCH_LIMIT))
+    except ValueError:
+        return None, 'limit must be an integer'
+    params['limit'] = max(1, min(limit, MAX_MATCH_LIMIT))
+    params['sort'] = request.GET.get('sort', 'score')
+    if params['sort'] not in MATCH_SORTS:
+        return None, f"sort must be one of: {', '.join(MATCH_SORTS)}"
+    return params, None
 
 
 def job_detail(request, job_id):
-    """View job details"""
-    db = SessionLocal()
-    try:
-        job = db.query(Job).options(
-            joinedload(Job.member).joinedload(Member.user),
-            joinedload(Job.applications).joinedload(JobApplication.caregiver).joinedload(Caregiver.user)
-        ).filter(Job.job_id == job_id).first()
+    """View job details with the best matching caregivers"""
+    db = request.db
+    job = cached_detail('job', job_id, lambda: load_job_detail(db, job_id), db)
         
-        if not job:
-            raise Http404("Job not found")
-        
-        return render(request, 'jobs/job_detail.html', {'job': job})
-    finally:
-        db.close()
+    if not job:
+        raise Http404("Job not found")
+    
+    params, error = _match_params(request)
+    if error:
+        messages.error(request, error)
+        params = {'min_rate': None, 'max_rate': None, 'limit': DEFAULT_MATCH_LIMIT, 'sort': 'score'}
+    return render(request, 'jobs/job_detail.html', {
+        'job': job,
+        'matches': matches_for_job(job, **params),
+        'match_params': params,
+    })
+
+
+def job_matches(request, job_id):
+    """Ranked caregivers for a job as JSON (same type, member's city, optional rate bounds)"""
+    params, error = _match_params(request)
+    if error:
+        return HttpResponseBadRequest(error)
+    db = request.db
+    job = cached_detail('job', job_id, lambda: load_job_detail(db, job_id), db)
+    if not job:
+        raise Http404("Job not found")
+    matches = matches_for_job(job, **params)
+    return JsonResponse({
+        'job_id': job.job_id,
+        'caregiving_type': job.required_caregiving_type,
+        'city': job.member.user.city,
+        'results': [m.as_dict() for m in matches],
+    })
 
 
 def job_create(request):
     """Create new job"""
-    db = SessionLocal()
+    db = request.db
     try:
-        members = db.query(Member).options(joinedload(Member.user)).all()
-        
         if request.method == 'POST':
             job = Job(
                 member_user_id=request.POST.get('member_user_id'),
@@ -414,21 +628,16 @@ def job_create(request):
             messages.success(request, 'Job created successfully!')
             return redirect('job_list')
         
-        return render(request, 'jobs/job_form.html', {
-            'action': 'Create',
-            'members': members
-        })
+        return render(request, 'jobs/job_form.html', {'action': 'Create'})
     except Exception as e:
         db.rollback()
         messages.error(request, f'Error creating job: {str(e)}')
         return redirect('job_list')
-    finally:
-        db.close()
 
 
 def job_update(request, job_id):
     """Update existing job"""
-    db = SessionLocal()
+    db = request.db
     try:
         job = db.query(Job).options(joinedload(Job.member).joinedload(Member.user)).filter(
             Job.job_id == job_id
@@ -437,8 +646,6 @@ def job_update(request, job_id):
         if not job:
             raise Http404("Job not found")
         
-        members = db.query(Member).options(joinedload(Member.user)).all()
-        
         if request.method == 'POST':
             job.member_user_id = request.POST.get('member_user_id')
             job.required_caregiving_type = request.POST.get('required_caregiving_type')
@@ -451,25 +658,20 @@ def job_update(request, job_id):
         
         return render(request, 'jobs/job_form.html', {
             'job': job,
-            'members': members,
             'action': 'Update'
         })
     except Exception as e:
         db.rollback()
         messages.error(request, f'Error updating job: {str(e)}')
         return redirect('job_list')
-    finally:
-        db.close()
 
 
 def job_delete(request, job_id):
     """Delete job"""
     if request.method == 'POST':
-        db = SessionLocal()
+        db = request.db
         try:
-            job = db.query(Job).filter(Job.job_id == job_id).first()
-            if job:
-                db.delete(job)
+            if delete_cascading(db, 'job', [Job.job_id == job_id]):
                 db.commit()
                 messages.success(request, 'Job deleted successfully!')
             else:
@@ -477,8 +679,6 @@ def job_delete(request, job_id):
         except Exception as e:
             db.rollback()
             messages.error(request, f'Error deleting job: {str(e)}')
-        finally:
-            db.close()
     
     return redirect('job_list')
 
@@ -486,42 +686,59 @@ def job_delete(request, job_id):
 # ============ Appointment CRUD Operations ============
 
 def appointment_list(request):
-    """List all appointments"""
-    db = SessionLocal()
-    try:
-        appointments = db.query(Appointment).options(
-            joinedload(Appointment.caregiver).joinedload(Caregiver.user),
-            joinedload(Appointment.member).joinedload(Member.user)
-        ).all()
-        return render(request, 'appointments/appointment_list.html', {'appointments': appointments})
-    finally:
-        db.close()
+    """List appointments, one keyset page at a time"""
+    db = request.db
+    query = db.query(Appointment).options(
+        joinedload(Appointment.caregiver).joinedload(Caregiver.user),
+        joinedload(Appointment.member).joinedload(Member.user),
+        undefer(Appointment.caregiver_hourly_rate)
+    )
+    page = paginate(request, query, APPOINTMENT_SORTS, 'id')
+    return render(request, 'appointments/appointment_list.html', {'appointments': page, 'page': page})
+
+
+def load_appointment_detail(db, appointment_id):
+    appointment = db.query(Appointment).options(
+        joinedload(Appointment.caregiver).joinedload(Caregiver.user),
+        joinedload(Appointment.member).joinedload(Member.user),
+        undefer(Appointment.caregiver_hourly_rate)
+    ).filter(Appointment.appointment_id == appointment_id).first()
+    if not appointment:
+        return None, []
+    return appointment, [
+        entity_tag('appointment', appointment_id),
+        entity_tag('caregiver', appointment.caregiver_user_id),
+        entity_tag('member', appointment.member_user_id),
+        entity_tag('user', appointment.caregiver_user_id),
+        entity_tag('user', appointment.member_user_id),
+    ]
 
 
 def appointment_detail(request, appointment_id):
     """View appointment details"""
-    db = SessionLocal()
-    try:
-        appointment = db.query(Appointment).options(
-            joinedload(Appointment.caregiver).joinedload(Caregiver.user),
-            joinedload(Appointment.member).joinedload(Member.user)
-        ).filter(Appointment.appointment_id == appointment_id).first()
+    db = request.db
+    appointment = cached_detail(
+        'appointment', appointment_id, lambda: load_appointment_detail(db, appointment_id), db
+    )
         
-        if not appointment:
-            raise Http404("Appointment not found")
+    if not appointment:
+        raise Http404("Appointment not found")
         
-        return render(request, 'appointments/appointment_detail.html', {'appointment': appointment})
-    finally:
-        db.close()
+    return render(request, 'appointments/appointment_detail.html', {'appointment': appointment})
+
+
+def _appointment_conflicts(db, appointment):
+    """Appointments that would overlap this one for the same caregiver"""
+    if appointment.status == 'Cancelled':
+        return []
+    start, end = booked_range(appointment.appointment_date, appointment.appointment_time, appointment.work_hours)
+    return find_conflicts(db, appointment.caregiver_user_id, start, end, exclude_id=appointment.appointment_id)
 
 
 def appointment_create(request):
     """Create new appointment"""
-    db = SessionLocal()
+    db = request.db
     try:
-        caregivers = db.query(Caregiver).options(joinedload(Caregiver.user)).all()
-        members = db.query(Member).options(joinedload(Member.user)).all()
-        
         if request.method == 'POST':
             appointment = Appointment(
                 caregiver_user_id=request.POST.get('caregiver_user_id'),
@@ -531,27 +748,31 @@ def appointment_create(request):
                 work_hours=request.POST.get('work_hours'),
                 status=request.POST.get('status', 'Scheduled')
             )
+            conflicts = _appointment_conflicts(db, appointment)
+            if conflicts:
+                messages.error(request, conflict_message(conflicts))
+                return render(request, 'appointments/appointment_form.html', {
+                    'appointment': appointment,
+                    'action': 'Create'
+                })
             db.add(appointment)
             db.commit()
             messages.success(request, 'Appointment created successfully!')
             return redirect('appointment_list')
         
-        return render(request, 'appointments/appointment_form.html', {
-            'action': 'Create',
-            'caregivers': caregivers,
-            'members': members
-        })
+        return render(request, 'appointments/appointment_form.html', {'action': 'Create'})
     except Exception as e:
         db.rollback()
-        messages.error(request, f'Error creating appointment: {str(e)}')
+        if is_overlap_violation(e):
+            messages.error(request, 'This caregiver was just booked at that time by someone else.')
+        else:
+            messages.error(request, f'Error creating appointment: {str(e)}')
         return redirect('appointment_list')
-    finally:
-        db.close()
 
 
 def appointment_update(request, appointment_id):
     """Update existing appointment"""
-    db = SessionLocal()
+    db = request.db
     try:
         appointment = db.query(Appointment).options(
             joinedload(Appointment.caregiver).joinedload(Caregiver.user),
@@ -561,9 +782,6 @@ def appointment_update(request, appointment_id):
         if not appointment:
             raise Http404("Appointment not found")
         
-        caregivers = db.query(Caregiver).options(joinedload(Caregiver.user)).all()
-        members = db.query(Member).options(joinedload(Member.user)).all()
-        
         if request.method == 'POST':
             appointment.caregiver_user_id = request.POST.get('caregiver_user_id')
             appointment.member_user_id = request.POST.get('member_user_id')
@@ -572,28 +790,37 @@ def appointment_update(request, appointment_id):
             appointment.work_hours = request.POST.get('work_hours')
             appointment.status = request.POST.get('status')
             
+            conflicts = _appointment_conflicts(db, appointment)
+            if conflicts:
+                messages.error(request, conflict_message(conflicts))
+                response = render(request, 'appointments/appointment_form.html', {
+                    'appointment': appointment,
+                    'action': 'Update'
+                })
+                # Discard the edits so the request's session does not commit them
+                db.rollback()
+                return response
             db.commit()
             messages.success(request, 'Appointment updated successfully!')
             return redirect('appointment_detail', appointment_id=appointment_id)
         
         return render(request, 'appointments/appointment_form.html', {
             'appointment': appointment,
-            'caregivers': caregivers,
-            'members': members,
             'action': 'Update'
         })
     except Exception as e:
         db.rollback()
-        messages.error(request, f'Error updating appointment: {str(e)}')
+        if is_overlap_violation(e):
+            messages.error(request, 'This caregiver was just booked at that time by someone else.')
+        else:
+            messages.error(request, f'Error updating appointment: {str(e)}')
         return redirect('appointment_list')
-    finally:
-        db.close()
 
 
 def appointment_delete(request, appointment_id):
     """Delete appointment"""
     if request.method == 'POST':
-        db = SessionLocal()
+        db = request.db
         try:
             appointment = db.query(Appointment).filter(Appointment.appointment_id == appointment_id).first()
             if appointment:
@@ -605,7 +832,314 @@ def appointment_delete(request, appointment_id):
         except Exception as e:
             db.rollback()
             messages.error(request, f'Error deleting appointment: {str(e)}')
-        finally:
-            db.close()
     
     return redirect('appointment_list')
+
+
+@require_POST
+def appointment_bulk_create(request):
+    """
+    Create a batch of appointments from a JSON array or CSV body in one
+    transaction. Nothing is inserted unless every row is valid; with
+    ?dry_run=1 the batch is only validated. Clients send a CSRF token in the
+    X-CSRFToken header (GET /api/v1/csrf/).
+    """
+    db = request.db
+    try:
+        rows = read_batch(request)
+    except BatchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    values, errors = validate_appointments(db, rows)
+    if errors:
+        return JsonResponse({'rows': len(rows), 'errors': errors}, status=400)
+    if request.GET.get('dry_run') in ('1', 'true'):
+        return JsonResponse({'rows': len(rows), 'errors': []})
+
+    try:
+        ids = insert_appointments(db, values)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_overlap_violation(e):
+            return JsonResponse({'error': 'A caregiver in the batch was just booked at an overlapping '
+                                          'time by someone else; nothing was created.'}, status=409)
+        return JsonResponse({'error': f'Nothing was created: {e.orig}'}, status=409)
+    return JsonResponse({'created': len(ids), 'appointment_ids': ids}, status=201)
+
+
+def appointment_bulk_status(request):
+    """Form to move every appointment matching a filter to a new status"""
+    context = {'transitions': ALLOWED_TRANSITIONS, 'form': request.POST}
+    if request.method == 'POST':
+        transition, error = parse_transition(request.POST)
+        if error:
+            messages.error(request, error)
+        else:
+            db = request.db
+            ids = transition_appointments(db, transition)
+            db.commit()
+            messages.success(request, f"{len(ids)} appointment(s) marked {transition['target']}.")
+            context['updated_ids'] = ids
+    return render(request, 'appointments/appointment_bulk_status.html', context)
+
+
+@require_POST
+def appointment_bulk_status_api(request):
+    """
+    JSON version of appointment_bulk_status; returns the ids that changed.
+    Clients send a CSRF token in the X-CSRFToken header (GET /api/v1/csrf/).
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+    transition, error = parse_transition(data)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    db = request.db
+    ids = transition_appointments(db, transition)
+    db.commit()
+    return JsonResponse({'target': transition['target'], 'updated': len(ids), 'appointment_ids': ids})
+
+
+# ============ Lookup (Typeahead) Endpoints ============
+
+LOOKUP_DEFAULT_LIMIT = 10
+LOOKUP_MAX_LIMIT = 50
+
+
+def _lookup_params(request):
+    """Read the search prefix and result limit shared by all lookup endpoints"""
+    q = request.GET.get('q', '').strip().lower()
+    try:
+        limit = int(request.GET.get('limit', LOOKUP_DEFAULT_LIMIT))
+    except ValueError:
+        limit = LOOKUP_DEFAULT_LIMIT
+    return q, max(1, min(limit, LOOKUP_MAX_LIMIT))
+
+
+def _user_prefix_filter(q):
+    """
+    Case-insensitive prefix match on full name, surname or email.
+    Each branch is served by a lower(...) text_pattern_ops index in schema.sql.
+    """
+    pattern = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return or_(
+        func.lower(User.given_name + ' ' + User.surname).like(pattern),
+        func.lower(User.surname).like(pattern),
+        func.lower(User.email).like(pattern),
+    )
+
+
+def lookup_available_users(request):
+    """Users without a caregiver or member profile, as JSON"""
+    q, limit = _lookup_params(request)
+    db = request.db
+    query = db.query(User.user_id, User.given_name, User.surname, User.email).filter(
+        ~exists().where(Caregiver.caregiver_user_id == User.user_id),
+        ~exists().where(Member.member_user_id == User.user_id),
+    )
+    if q:
+        query = query.filter(_user_prefix_filter(q))
+    rows = query.order_by(User.user_id).limit(limit).all()
+    results = [
+        {'id': r.user_id, 'label': f'{r.given_name} {r.surname} ({r.email})'}
+        for r in rows
+    ]
+    return JsonResponse({'results': results})
+
+
+def lookup_members(request):
+    """Members matching a name or email prefix, as JSON"""
+    q, limit = _lookup_params(request)
+    db = request.db
+    query = db.query(Member.member_user_id, User.given_name, User.surname, User.email).join(
+        User, User.user_id == Member.member_user_id
+    )
+    if q:
+        query = query.filter(_user_prefix_filter(q))
+    rows = query.order_by(Member.member_user_id).limit(limit).all()
+    results = [
+        {'id': r.member_user_id, 'label': f'{r.given_name} {r.surname} ({r.email})'}
+        for r in rows
+    ]
+    return JsonResponse({'results': results})
+
+
+def lookup_caregivers(request):
+    """Caregivers matching a name or email prefix, as JSON"""
+    q, limit = _lookup_params(request)
+    db = request.db
+    query = db.query(
+        Caregiver.caregiver_user_id, Caregiver.caregiving_type, User.given_name, User.surname
+    ).join(User, User.user_id == Caregiver.caregiver_user_id)
+    if q:
+        query = query.filter(_user_prefix_filter(q))
+    rows = query.order_by(Caregiver.caregiver_user_id).limit(limit).all()
+    results = [
+        {'id': r.caregiver_user_id, 'label': f'{r.given_name} {r.surname} ({r.caregiving_type})'}
+        for r in rows
+    ]
+    return JsonResponse({'results': results})
+
+
+# ============ Search ============
+
+def _search_page(request):
+    """
+    Run the search described by ?q=...&scope=... and return
+    (scope name, query text, page, results); page is None when q is empty.
+    """
+    q = request.GET.get('q', '').strip()[:MAX_QUERY_LENGTH]
+    scope_name = request.GET.get('scope', 'jobs')
+    if scope_name not in SEARCH_SCOPES:
+        scope_name = 'jobs'
+    if not q:
+        return scope_name, q, None, []
+    scope = SEARCH_SCOPES[scope_name]
+    query, sort_options = search_query(request.db, scope, q)
+    page = paginate(request, query, sort_options, 'rank')
+    return scope_name, q, page, search_results(scope, page)
+
+
+def search(request):
+    """Search page for jobs, members' house rules and caregiver profiles"""
+    scope_name, q, page, results = _search_page(request)
+    return render(request, 'search/search.html', {
+        'q': q,
+        'scope': scope_name,
+        'scopes': [(name, scope.label) for name, scope in SEARCH_SCOPES.items()],
+        'page': page,
+        'results': results,
+    })
+
+
+def search_api(request):
+    """Ranked search results as JSON, with next/prev links for keyset paging"""
+    scope_name, q, page, results = _search_page(request)
+    return JsonResponse({
+        'scope': scope_name,
+        'q': q,
+        'results': results,
+        'next': page.next_url if page else None,
+        'prev': page.prev_url if page else None,
+    })
+
+
+# ============ Reports ============
+
+def earnings_report(request):
+    """Caregiver payroll totals read from the caregiver_earnings rollup"""
+    db = request.db
+    query = db.query(CaregiverEarnings).options(
+        joinedload(CaregiverEarnings.caregiver).joinedload(Caregiver.user)
+    ).filter(CaregiverEarnings.accepted_appointments > 0)
+    page = paginate(request, query, EARNINGS_SORTS, 'earnings')
+    return render(request, 'reports/earnings_report.html', {'earnings': page, 'page': page})
+
+
+def _job_applications_page(request):
+    """
+    A page of job_applications_view, optionally filtered by ?job_id= and
+    ?applicant= (caregiver user id). Returns (filters, page, None) or
+    (None, None, error message).
+    """
+    view = job_applications_view
+    query = request.db.query(view)
+    filters = {}
+    for param, column in (('job_id', view.c.job_id), ('applicant', view.c.applicant_user_id)):
+        value = request.GET.get(param, '').strip()
+        if not value:
+            continue
+        try:
+            filters[param] = int(value)
+        except ValueError:
+            return None, None, f'{param} must be an integer'
+        query = query.filter(column == filters[param])
+    return filters, paginate(request, query, JOB_APPLICATION_SORTS, 'newest'), None
+
+
+def job_applications_report(request):
+    """Job applications with applicant and job details, from the materialized view"""
+    filters, page, error = _job_applications_page(request)
+    if error:
+        return HttpResponseBadRequest(error)
+    return render(request, 'reports/job_applications.html', {
+        'applications': page, 'page': page, 'filters': filters,
+    })
+
+
+def job_applications_api(request):
+    """JSON version of job_applications_report, with next/prev links for keyset paging"""
+    filters, page, error = _job_applications_page(request)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    return JsonResponse({
+        'results': [row._asdict() for row in page],
+        'next': page.next_url,
+        'prev': page.prev_url,
+    })
+
+
+# ============ Exports ============
+
+def _export_params(request):
+    """
+    Read format, start and end (YYYY-MM-DD) from the query string.
+    Returns (params, None) or (None, error message).
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return None, f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+    params = {'format': export_format}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            params[name] = date.fromisoformat(value) if value else None
+        except ValueError:
+            return None, f'{name} must be a date in YYYY-MM-DD format'
+    return params, None
+
+
+def export_appointments(request):
+    """Stream appointments as CSV or JSON Lines, filtered by date range and status"""
+    params, error = _export_params(request)
+    status = request.GET.get('status') or None
+    if error is None and status is not None and status not in APPOINTMENT_STATUSES:
+        error = f"status must be one of: {', '.join(APPOINTMENT_STATUSES)}"
+    if error:
+        return HttpResponseBadRequest(error)
+    query = appointments_query(params['start'], params['end'], status)
+    return export_response(request, query, 'appointments', params['format'])
+
+
+def export_jobs(request):
+    """Stream jobs as CSV or JSON Lines, filtered by posting date"""
+    params, error = _export_params(request)
+    if error:
+        return HttpResponseBadRequest(error)
+    query = jobs_query(params['start'], params['end'])
+    return export_response(request, query, 'jobs', params['format'])
+
+
+def export_job_applications(request):
+    """Stream job_applications_view as CSV or JSON Lines, filtered by application date"""
+    params, error = _export_params(request)
+    if error:
+        return HttpResponseBadRequest(error)
+    query = job_applications_query(params['start'], params['end'])
+    return export_response(request, query, 'job_applications', params['format'])
+
+
+# ============ Metrics ============
+
+def metrics(request):
+    """Connection pool metrics of this worker process, for Prometheus (needs METRICS_TOKEN)"""
+    if not settings.METRICS_TOKEN:
+        raise Http404("Metrics are not enabled")
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden('Invalid metrics token')
+    return metrics_response()
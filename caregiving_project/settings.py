@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -62,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'caregiving_app.middleware.SQLAlchemySessionMiddleware',  # request.db + SQL timings
 ]
 
 ROOT_URLCONF = 'caregiving_project.urls'
@@ -92,15 +94,86 @@ WSGI_APPLICATION = 'caregiving_project.wsgi.application'
 
 import dj_database_url
 
+# Behind PgBouncer in transaction mode (DB_PGBOUNCER, see database.py)
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
+# Seconds Django keeps its own connection (sessions, messages, admin) open.
+# It comes on top of the SQLAlchemy pools in every worker, and under ASGI a
+# kept connection can outlive the thread that opened it, so the default is
+# to close it after each request.
+DJANGO_CONN_MAX_AGE = int(os.getenv('DJANGO_CONN_MAX_AGE', '0'))
+
+if DB_PGBOUNCER and DJANGO_CONN_MAX_AGE:
+    raise ImproperlyConfigured(
+        'DJANGO_CONN_MAX_AGE must be 0 with DB_PGBOUNCER: PgBouncer pools the connections'
+    )
+
 # Default to local database, but use DATABASE_URL in production
 DATABASES = {
     'default': dj_database_url.config(
         default=f"postgresql://{os.getenv('DB_USER', 'postgres')}:{os.getenv('DB_PASSWORD', 'postgres')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'caregiving_db')}",
-        conn_max_age=600,
+        conn_max_age=DJANGO_CONN_MAX_AGE,
         conn_health_checks=True,
     )
 }
 
+# Django declares server-side cursors WITH HOLD outside a transaction, which
+# PgBouncer's transaction pooling does not keep on one server connection
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = DB_PGBOUNCER
+
+
+# Cache for entity detail pages (see caregiving_app/cache.py)
+# CACHE_BACKEND is 'locmem' (per process), 'file' (shared by workers on one
+# host) or 'redis' (shared by all hosts; needs the redis package installed).
+# Every worker has to see the version tokens a write bumps, so 'locmem' is
+# only the default with a single worker (WEB_CONCURRENCY, set by
+# gunicorn.conf.py) and is refused with more.
+
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem' if WEB_CONCURRENCY == 1 else 'file')
+
+if CACHE_BACKEND == 'locmem' and WEB_CONCURRENCY > 1:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND=locmem with {WEB_CONCURRENCY} workers: a write in one worker would not "
+        "invalidate the others' cached pages. Use CACHE_BACKEND=file or redis."
+    )
+
+if CACHE_BACKEND == 'redis':
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    }
+elif CACHE_BACKEND == 'file':
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    }
+else:
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'caregiving-detail',
+    }
+
+DEFAULT_CACHE['TIMEOUT'] = int(os.getenv('CACHE_TIMEOUT', '300'))
+
+CACHES = {
+    'default': DEFAULT_CACHE,
+}
+
+# Seconds before the in-memory caregiver matching index is rebuilt from the
+# database (commits made in this process are applied immediately)
+MATCH_INDEX_TTL = int(os.getenv('MATCH_INDEX_TTL', '300'))
+
+# Seconds a browser keeps reading from the primary after a write, when read
+# replicas are configured (DATABASE_REPLICA_URLS, see database.py); cover the
+# replicas' usual lag so a redirect after a form post shows the change
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Bearer token a scraper sends (Authorization: Bearer <token>) to read
+# /metrics/; the endpoint answers 404 while it is unset
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -121,6 +194,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Logging
+# caregiving_app.db emits one JSON line per request with its SQL count and timings
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'caregiving_app.db': {
+            'handlers': ['console'],
+            'level': os.getenv('DB_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -2,11 +2,24 @@
 SQLAlchemy Database Connection Module
 Manages database engine, session, and base declarative class
 """
+import itertools
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.selectable import CTE
+
+logger = logging.getLogger('caregiving_app.db')
 
 # Load environment variables
 load_dotenv()
@@ -24,21 +37,389 @@ else:
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pools. Every gunicorn worker has its own pools, so the limits
+# are per process: DB_MAX_CONNECTIONS, the connections the app may hold on one
+# database server, is shared by the WEB_CONCURRENCY workers, and each worker's
+# share by its Django connection and its two engines (sync and async).
+# DB_POOL_SIZE and DB_MAX_OVERFLOW set the per-engine limits directly.
+WEB_CONCURRENCY = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '60'))
+ENGINE_CONNECTIONS = max(2, (DB_MAX_CONNECTIONS // WEB_CONCURRENCY - 1) // 2)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE') or ENGINE_CONNECTIONS // 2)
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW') or ENGINE_CONNECTIONS - POOL_SIZE)
+# Seconds a checkout waits for a free connection before raising
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Behind PgBouncer in transaction mode, PgBouncer does the pooling: engines
+# open a connection per checkout (NullPool) and psycopg 3 prepares no
+# statements, since the next transaction may run on another server connection
+PGBOUNCER = os.getenv('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
+
+class PoolStats:
+    """Checkout counts and wait times of one connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def checked_out(self, wait):
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def timed_out(self, wait):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+
+
+class MeasuredPool:
+    """
+    Pool mixin that records checkouts in PoolStats.
+
+    The wait covers queueing for a free connection and opening a new one.
+    recreate() (engine.dispose()) hands the stats on to the new pool, where
+    connections still checked out of the old one are returned.
+    """
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timed_out(time.perf_counter() - started)
+            raise
+        self.stats.checked_out(time.perf_counter() - started)
+        return record
+
+    def _do_return_conn(self, record):
+        self.stats.checked_in()
+        super()._do_return_conn(record)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class MeasuredQueuePool(MeasuredPool, QueuePool):
+    pass
+
+
+class MeasuredAsyncQueuePool(MeasuredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class MeasuredNullPool(MeasuredPool, NullPool):
+    pass
+
+
+def engine_options(is_async=False, **connect_args):
+    """Pool and connection arguments for create_engine() / create_async_engine()"""
+    if PGBOUNCER:
+        if is_async:
+            connect_args['prepare_threshold'] = None
+        return {'poolclass': MeasuredNullPool, 'connect_args': connect_args}
+    return {
+        'poolclass': MeasuredAsyncQueuePool if is_async else MeasuredQueuePool,
+        'pool_pre_ping': True,  # Verify connections before using them
+        'pool_size': POOL_SIZE,
+        'max_overflow': MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'connect_args': connect_args,
+    }
+
+
+# Every engine by name, for pool_metrics() and the fork hook
+_engines = {}
+
+
+def register_engine(name, target):
+    """Start collecting pool stats for an engine (sync or async); returns it"""
+    sync_engine = getattr(target, 'sync_engine', target)
+    sync_engine.pool.stats = PoolStats()
+    _engines[name] = sync_engine
+    return target
+
+
 # Create SQLAlchemy engine
-engine = create_engine(
+engine = register_engine('primary', create_engine(
     DATABASE_URL,
     echo=True,  # Set to False in production
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_size=10,
-    max_overflow=20
-)
+    **engine_options(),
+))
+
+# Read replicas, as a comma-separated DATABASE_REPLICA_URLS. Sessions send
+# plain SELECTs to a healthy replica and everything else to the primary (see
+# RoutingSession). Without replicas every query goes to the primary as before.
+REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# A replica further behind the primary than this many seconds is not used
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '10'))
+# Seconds between health checks, and how long a connection attempt may take
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', '5'))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv('REPLICA_CONNECT_TIMEOUT', '2'))
+
+# Seconds of changes the replica has received but not yet applied; 0 when it
+# is caught up, or is not a standby at all
+REPLICA_LAG_QUERY = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+USE_PRIMARY_KEY = 'use_primary'
+PRIMARY_BLOCKS_KEY = 'primary_blocks'
+REPLICA_KEY = 'replica'
+
+
+class Replica:
+    """One read replica: its sync and async engines and its last health check"""
+
+    def __init__(self, url, name):
+        self.url = make_url(url)
+        self.name = name
+        self.engine = register_engine(name, create_engine(
+            self.url,
+            **engine_options(connect_timeout=REPLICA_CONNECT_TIMEOUT),
+        ))
+        self.async_engine = register_engine(f'{name}-async', create_async_engine(
+            self.url.set(drivername='postgresql+psycopg'),
+            **engine_options(is_async=True, connect_timeout=REPLICA_CONNECT_TIMEOUT),
+        ))
+        # Unused until the first check passes
+        self.healthy = False
+        self.lag = None
+        self.checked_at = None
+        for target in (self.engine, self.async_engine.sync_engine):
+            event.listen(target, 'handle_error', self._on_error)
+
+    def __repr__(self):
+        return self.url.render_as_string(hide_password=True)
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                lag = float(conn.execute(text(REPLICA_LAG_QUERY)).scalar())
+        except SQLAlchemyError as e:
+            if self.healthy or self.checked_at is None:
+                logger.warning('Replica %r is unavailable, reading from the primary: %s', self, e)
+            self.healthy, self.lag = False, None
+        else:
+            if lag > REPLICA_MAX_LAG and self.healthy:
+                logger.warning('Replica %r is %.1fs behind, reading from the primary', self, lag)
+            self.healthy, self.lag = lag <= REPLICA_MAX_LAG, lag
+        self.checked_at = time.monotonic()
+
+    def _on_error(self, context):
+        # A lost or refused connection takes the replica out of rotation
+        # right away instead of at the next check
+        if context.is_disconnect or context.connection is None:
+            self.healthy = False
+
+
+class ReplicaSet:
+    """The configured replicas, checked in the background and used in turn"""
+
+    def __init__(self, urls):
+        self.replicas = [Replica(url, f'replica{index}') for index, url in enumerate(urls)]
+        self._lock = threading.Lock()
+        self._checking = False
+        self._turn = itertools.count()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def check(self):
+        """Check every replica now"""
+        for replica in self.replicas:
+            replica.check()
+
+    def _check_due(self):
+        now = time.monotonic()
+        return any(r.checked_at is None or now - r.checked_at >= REPLICA_CHECK_INTERVAL for r in self.replicas)
+
+    def _check_in_background(self):
+        with self._lock:
+            if self._checking or not self._check_due():
+                return
+            self._checking = True
+
+        def run():
+            try:
+                self.check()
+            finally:
+                self._checking = False
+
+        threading.Thread(target=run, name='replica-health-check', daemon=True).start()
+
+    def after_fork(self):
+        # The parent's check thread does not exist in the child
+        self._lock = threading.Lock()
+        self._checking = False
+
+    def choose(self):
+        """A healthy replica (round-robin), or None when there is none"""
+        self._check_in_background()
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+
+replicas = ReplicaSet(REPLICA_URLS)
+
+
+def _writes(statement):
+    """
+    False only for a SELECT that modifies and locks nothing, or a statement
+    marked execution_options(readonly=True) (a text() query that only reads)
+    """
+    if statement is None:
+        return True
+    if (getattr(statement, '_execution_options', None) or {}).get('readonly'):
+        return False
+    if not getattr(statement, 'is_select', False):
+        return True
+    if getattr(statement, '_for_update_arg', None) is not None:
+        return True
+    return any(
+        isinstance(element, CTE) and getattr(element.element, 'is_dml', False)
+        for element in visitors.iterate(statement)
+    )
+
+
+def use_primary(session):
+    """Send the rest of this session's statements to the primary"""
+    session.info[USE_PRIMARY_KEY] = True
+
+
+@contextmanager
+def on_primary(session):
+    """Send the statements of a with block to the primary (a write pins for good)"""
+    session.info[PRIMARY_BLOCKS_KEY] = session.info.get(PRIMARY_BLOCKS_KEY, 0) + 1
+    try:
+        yield session
+    finally:
+        session.info[PRIMARY_BLOCKS_KEY] -= 1
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica and writes to the primary.
+
+    The session picks one replica the first time it reads and keeps it, so a
+    request sees one consistent snapshot of replicated data. Anything that is
+    not a plain SELECT (ORM flushes, DML, locking reads, text() statements)
+    goes to the primary, and from then on the whole session stays there, so
+    reads after a write see it. A text() query that only reads can say so
+    with .execution_options(readonly=True) and stay on the replica. use_primary() pins a session up front, and
+    on_primary() sends just a block of reads to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        if not replicas:
+            return primary
+        if self._flushing or _writes(clause):
+            use_primary(self)
+            return primary
+        if self.info.get(USE_PRIMARY_KEY) or self.info.get(PRIMARY_BLOCKS_KEY):
+            return primary
+        if REPLICA_KEY not in self.info:
+            self.info[REPLICA_KEY] = replicas.choose()
+        replica = self.info[REPLICA_KEY]
+        if replica is None:
+            return primary
+        if primary is async_engine.sync_engine:
+            return replica.async_engine.sync_engine
+        return replica.engine
+
+
+def read_engine():
+    """A healthy replica's engine for read-only work outside a session, else the primary"""
+    replica = replicas.choose() if replicas else None
+    return replica.engine if replica is not None else engine
+
+
+def read_async_engine():
+    """read_engine() for the async engines"""
+    replica = replicas.choose() if replicas else None
+    return replica.async_engine if replica is not None else async_engine
+
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 # Create scoped session for thread-safety
 db_session = scoped_session(SessionLocal)
 
+# Async engine for the JSON API (caregiving_app/api.py), on psycopg 3.
+# Its sessions use SessionLocal's class underneath, so the event hooks
+# registered on SessionLocal (cache invalidation, matching index) apply too.
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername='postgresql+psycopg')
+
+async_engine = register_engine('primary-async', create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(is_async=True),
+))
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    expire_on_commit=False,
+    sync_session_class=SessionLocal.class_,
+)
+
+
+def pool_metrics():
+    """Size, use and checkout stats of every connection pool in this process"""
+    metrics = []
+    for name, target in _engines.items():
+        pool = target.pool
+        queued = isinstance(pool, QueuePool)
+        metrics.append({
+            'pool': name,
+            'size': pool.size() if queued else 0,
+            'idle': pool.checkedin() if queued else 0,
+            'in_use': pool.stats.in_use,
+            'overflow': max(0, pool.overflow()) if queued else 0,
+            'checkouts': pool.stats.checkouts,
+            'timeouts': pool.stats.timeouts,
+            'wait_total': pool.stats.wait_total,
+            'wait_max': pool.stats.wait_max,
+        })
+    return metrics
+
+
+def _after_fork_in_child():
+    """
+    Forget connections inherited from the parent process.
+
+    With gunicorn --preload the app, and so the engines, are created before
+    the workers fork; two processes must never share a connection. The
+    parent keeps its connections open (close=False) and each worker opens
+    its own.
+    """
+    for target in _engines.values():
+        target.dispose(close=False)
+        target.pool.stats = PoolStats()
+    replicas.after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
 # Create base class for declarative models
 Base = declarative_base()
 
@@ -68,10 +449,23 @@ def test_connection():
     try:
         with engine.connect() as connection:
             print("✓ Database connection successful!")
-            return True
     except Exception as e:
         print(f"✗ Database connection failed: {e}")
         return False
+    if PGBOUNCER:
+        print("  Pooling: PgBouncer (a connection per checkout, no prepared statements)")
+    else:
+        print(f"  Pooling: {POOL_SIZE} + {MAX_OVERFLOW} overflow connections per engine, "
+              f"{WEB_CONCURRENCY} worker(s), budget {DB_MAX_CONNECTIONS}")
+    replicas.check()
+    for replica in replicas.replicas:
+        if replica.healthy:
+            print(f"✓ Replica {replica!r} is usable ({replica.lag:.1f}s behind)")
+        elif replica.lag is not None:
+            print(f"✗ Replica {replica!r} is {replica.lag:.1f}s behind (limit {REPLICA_MAX_LAG:g}s)")
+        else:
+            print(f"✗ Replica {replica!r} is unavailable")
+    return True
 
 if __name__ == "__main__":
     test_connection()
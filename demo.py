@@ -5,8 +5,8 @@ Demonstrates SQLAlchemy CRUD operations
 """
 
 from database import SessionLocal, test_connection
-from models import User, Caregiver, Member, Job, Appointment
-from sqlalchemy.orm import joinedload
+from models import User, Caregiver, Member, Job, Appointment, EntityCounter
+from sqlalchemy.orm import joinedload, undefer
 from datetime import date, time
 from decimal import Decimal
 
@@ -91,7 +91,8 @@ def demo_read_operations():
         print("\n4. Getting appointments with all related data...")
         appointments = db.query(Appointment).options(
             joinedload(Appointment.caregiver).joinedload(Caregiver.user),
-            joinedload(Appointment.member).joinedload(Member.user)
+            joinedload(Appointment.member).joinedload(Member.user),
+            undefer(Appointment.caregiver_hourly_rate)
         ).filter(Appointment.status == "Confirmed").all()
         print(f"   ✓ Found {len(appointments)} confirmed appointments:")
         for apt in appointments[:3]:  # Show first 3
@@ -178,12 +179,13 @@ def demo_statistics():
     
     db = SessionLocal()
     try:
+        counts = EntityCounter.get_counts(db)
         stats = {
-            'Users': db.query(User).count(),
-            'Caregivers': db.query(Caregiver).count(),
-            'Members': db.query(Member).count(),
-            'Jobs': db.query(Job).count(),
-            'Appointments': db.query(Appointment).count(),
+            'Users': counts.get('user', 0),
+            'Caregivers': counts.get('caregiver', 0),
+            'Members': counts.get('member', 0),
+            'Jobs': counts.get('job', 0),
+            'Appointments': counts.get('appointment', 0),
         }
         
         print("\n   Current Database Contents:")
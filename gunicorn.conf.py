@@ -0,0 +1,17 @@
+"""
+Gunicorn settings, read from the working directory on start
+
+database.py sizes each worker's connection pools from WEB_CONCURRENCY, so
+the worker count is exported there before any worker loads the app, whether
+it came from WEB_CONCURRENCY or from -w / --workers. With --preload the app
+is loaded before this runs: set WEB_CONCURRENCY instead of -w. Connections
+inherited across the fork are dropped by database.py's fork hook.
+"""
+import os
+
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+
+def on_starting(server):
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
@@ -2,11 +2,19 @@
 SQLAlchemy ORM Models for Caregiving Database
 Maps to existing PostgreSQL tables created via schema.sql
 """
-from sqlalchemy import Column, Integer, String, Text, DECIMAL, Date, Time, TIMESTAMP, ForeignKey, CheckConstraint
-from sqlalchemy.orm import relationship
+from decimal import Decimal
+
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DECIMAL, Date, Time, TIMESTAMP, ForeignKey, CheckConstraint, Computed, select
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.dialects.postgresql import TSRANGE, TSVECTOR
+from sqlalchemy.orm import column_property, deferred, relationship
 from sqlalchemy.sql import func
 from database import Base
 
+# Allowed values of the CHECK constraints in schema.sql
+GENDERS = ('Male', 'Female', 'Other', 'Prefer not to say')
+APPOINTMENT_STATUSES = ('Scheduled', 'Confirmed', 'Completed', 'Cancelled')
+
 class User(Base):
     __tablename__ = 'user'
     
@@ -20,10 +28,16 @@ class User(Base):
     password = Column(String(255), nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+    # Generated by Postgres (see schema.sql); deferred so list pages never load it
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', given_name || ' ' || surname), 'A') || "
+        "setweight(to_tsvector('english', coalesce(profile_description, '')), 'B')"
+    )))
     
-    # Relationships
-    caregiver = relationship("Caregiver", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    member = relationship("Member", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    # Relationships. Children are removed by ON DELETE CASCADE in schema.sql;
+    # passive_deletes stops the ORM from loading them to delete row by row.
+    caregiver = relationship("Caregiver", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    member = relationship("Member", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<User(id={self.user_id}, name='{self.given_name} {self.surname}', email='{self.email}')>"
@@ -44,8 +58,9 @@ class Caregiver(Base):
     
     # Relationships
     user = relationship("User", back_populates="caregiver")
-    job_applications = relationship("JobApplication", back_populates="caregiver", cascade="all, delete-orphan")
-    appointments = relationship("Appointment", back_populates="caregiver", cascade="all, delete-orphan")
+    job_applications = relationship("JobApplication", back_populates="caregiver", cascade="all, delete-orphan", passive_deletes=True)
+    appointments = relationship("Appointment", back_populates="caregiver", cascade="all, delete-orphan", passive_deletes=True)
+    earnings = relationship("CaregiverEarnings", back_populates="caregiver", uselist=False, viewonly=True)
     
     def __repr__(self):
         return f"<Caregiver(id={self.caregiver_user_id}, type='{self.caregiving_type}', rate={self.hourly_rate})>"
@@ -57,12 +72,16 @@ class Member(Base):
     member_user_id = Column(Integer, ForeignKey('user.user_id', ondelete='CASCADE'), primary_key=True)
     house_rules = Column(Text)
     dependent_description = Column(Text)
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(house_rules, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(dependent_description, '')), 'B')"
+    )))
     
     # Relationships
     user = relationship("User", back_populates="member")
-    addresses = relationship("Address", back_populates="member", cascade="all, delete-orphan")
-    jobs = relationship("Job", back_populates="member", cascade="all, delete-orphan")
-    appointments = relationship("Appointment", back_populates="member", cascade="all, delete-orphan")
+    addresses = relationship("Address", back_populates="member", cascade="all, delete-orphan", passive_deletes=True)
+    jobs = relationship("Job", back_populates="member", cascade="all, delete-orphan", passive_deletes=True)
+    appointments = relationship("Appointment", back_populates="member", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<Member(id={self.member_user_id})>"
@@ -96,10 +115,14 @@ class Job(Base):
     required_caregiving_type = Column(String(100), nullable=False)
     other_requirements = Column(Text)
     date_posted = Column(Date, nullable=False)
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', required_caregiving_type), 'A') || "
+        "setweight(to_tsvector('english', coalesce(other_requirements, '')), 'B')"
+    )))
     
     # Relationships
     member = relationship("Member", back_populates="jobs")
-    applications = relationship("JobApplication", back_populates="job", cascade="all, delete-orphan")
+    applications = relationship("JobApplication", back_populates="job", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<Job(id={self.job_id}, type='{self.required_caregiving_type}', posted={self.date_posted})>"
@@ -122,6 +145,12 @@ class JobApplication(Base):
 
 
 class Appointment(Base):
+    # Range-partitioned by month of appointment_date in schema.sql, where the
+    # primary key is (appointment_id, appointment_date) and the no-overlap
+    # constraint is declared per partition (appointment_no_overlap_<month>),
+    # not on this parent table, so it is not part of the metadata here.
+    # appointment_id comes from a single sequence and is kept unique on its
+    # own (the appointment_ids table), so it stays the identity here.
     __tablename__ = 'appointment'
     
     appointment_id = Column(Integer, primary_key=True)
@@ -129,9 +158,14 @@ class Appointment(Base):
     member_user_id = Column(Integer, ForeignKey('member.member_user_id', ondelete='CASCADE'), nullable=False)
     appointment_date = Column(Date, nullable=False)
     appointment_time = Column(Time, nullable=False)
-    work_hours = Column(DECIMAL(5, 2), nullable=False)
+    work_hours = Column(DECIMAL(5, 2), CheckConstraint('work_hours > 0'), nullable=False)
     status = Column(String(20), CheckConstraint("status IN ('Scheduled', 'Confirmed', 'Completed', 'Cancelled')"), 
                    server_default='Scheduled')
+    # [start, end) of the visit, generated by Postgres (see schema.sql)
+    time_range = Column(TSRANGE, Computed(
+        "tsrange(appointment_date + appointment_time, "
+        "appointment_date + appointment_time + work_hours * INTERVAL '1 hour')"
+    ))
     
     # Relationships
     caregiver = relationship("Caregiver", back_populates="appointments")
@@ -140,9 +174,71 @@ class Appointment(Base):
     def __repr__(self):
         return f"<Appointment(id={self.appointment_id}, date={self.appointment_date}, status='{self.status}')>"
     
-    @property
+    # The caregiver's rate, for total_cost without lazy-loading the caregiver.
+    # Deferred, so only queries that show total_cost pay for the subquery:
+    # they add .options(undefer(Appointment.caregiver_hourly_rate)) to select
+    # it with the appointment. A loaded rate is expired by any flush that
+    # updates the row, so a new caregiver_user_id reloads its caregiver's rate.
+    caregiver_hourly_rate = column_property(
+        select(Caregiver.hourly_rate)
+        .where(Caregiver.caregiver_user_id == caregiver_user_id)
+        .correlate_except(Caregiver)
+        .scalar_subquery(),
+        deferred=True,
+        expire_on_flush=True,
+    )
+    
+    @hybrid_property
     def total_cost(self):
-        """Calculate total cost based on work hours and caregiver hourly rate"""
-        if self.caregiver and self.caregiver.hourly_rate:
-            return float(self.work_hours) * float(self.caregiver.hourly_rate)
-        return 0.0
+        """Work hours times the caregiver's hourly rate, as an exact Decimal"""
+        if self.caregiver_hourly_rate is None:
+            return Decimal('0')
+        return Decimal(self.work_hours) * self.caregiver_hourly_rate
+    
+    @total_cost.inplace.expression
+    @classmethod
+    def _total_cost_expression(cls):
+        """
+        The same value in SQL (numeric, no rounding), usable in filters and
+        aggregates without loading caregivers. Aggregates need appointment in
+        the FROM list: select_from(Appointment). No index covers it, so it is
+        not offered as a keyset sort.
+        """
+        return cls.work_hours * cls.caregiver_hourly_rate
+
+
+class CaregiverEarnings(Base):
+    """Rollup of accepted appointments per caregiver, maintained by triggers in schema.sql"""
+    __tablename__ = 'caregiver_earnings'
+    
+    caregiver_user_id = Column(Integer, ForeignKey('caregiver.caregiver_user_id', ondelete='CASCADE'), primary_key=True)
+    accepted_appointments = Column(Integer, nullable=False, server_default='0')
+    total_hours = Column(DECIMAL(12, 2), nullable=False, server_default='0')
+    total_earnings = Column(DECIMAL(18, 4), nullable=False, server_default='0')
+    
+    # Relationships
+    caregiver = relationship("Caregiver", back_populates="earnings", viewonly=True)
+    
+    def __repr__(self):
+        return f"<CaregiverEarnings(caregiver={self.caregiver_user_id}, earnings={self.total_earnings})>"
+    
+    @property
+    def average_pay(self):
+        if self.accepted_appointments:
+            return self.total_earnings / self.accepted_appointments
+        return 0
+
+
+class EntityCounter(Base):
+    __tablename__ = 'entity_counter'
+    
+    entity = Column(String(50), primary_key=True)
+    row_count = Column(BigInteger, nullable=False, server_default='0')
+    
+    def __repr__(self):
+        return f"<EntityCounter(entity='{self.entity}', rows={self.row_count})>"
+    
+    @classmethod
+    def get_counts(cls, db):
+        """Row counts for all tracked tables in one query (maintained by triggers in schema.sql)"""
+        return {entity: row_count for entity, row_count in db.query(cls.entity, cls.row_count)}
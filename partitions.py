@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Maintain the monthly partitions of the appointment table
+
+The table is range-partitioned by appointment_date (schema.sql). Rows dated
+outside every partition land in appointment_default, which every query has
+to scan, so partitions are created ahead of time; and months that are over
+and only hold Completed or Cancelled appointments are moved to the
+appointment_archive schema, where live queries, indexes and vacuum no longer
+see them.
+
+Usage:
+    python partitions.py list                        # partitions, row counts, open appointments
+    python partitions.py create                      # this month and the next 3 (run daily from cron)
+    python partitions.py create --months-ahead 6
+    python partitions.py archive --keep-months 12    # archive closed months older than a year
+    python partitions.py archive --before 2025-01-01 --dry-run
+"""
+import argparse
+import sys
+from datetime import date
+
+import psycopg2
+from dotenv import load_dotenv
+
+from refresh_views import get_dsn
+
+load_dotenv()
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_KEEP_MONTHS = 12
+
+PARTITIONS_QUERY = '''
+    SELECT n.nspname, c.relname, pg_get_expr(c.relpartbound, c.oid),
+           s.n_live_tup, pg_total_relation_size(c.oid)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE i.inhparent IN ('appointment'::regclass, 'appointment_archive.appointment'::regclass)
+    ORDER BY n.nspname DESC, c.relname
+'''
+
+
+def months_before(day, months):
+    """First day of the month `months` months before the month of `day`"""
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def list_partitions(cursor):
+    cursor.execute(PARTITIONS_QUERY)
+    print(f"{'Partition':<45} {'Bounds':<50} {'Rows (est.)':>12} {'Size':>10}")
+    for schema, name, bounds, rows, size in cursor.fetchall():
+        print(f"{schema + '.' + name:<45} {bounds:<50} {rows or 0:>12,} {size / 1024:>8.0f}kB")
+
+
+def create(cursor, months_ahead):
+    cursor.execute('SELECT create_appointment_partitions(%s)', (months_ahead,))
+    created = [row[0] for row in cursor.fetchall()]
+    for name in created:
+        print(f'  ✓ Created {name}')
+    if not created:
+        print(f'  Partitions through {months_before(date.today(), -months_ahead):%Y-%m} already exist')
+
+
+def archive(cursor, cutoff):
+    cursor.execute('SELECT * FROM archive_appointment_partitions(%s)', (cutoff,))
+    archived = cursor.fetchall()
+    for name, appointments in archived:
+        print(f'  ✓ Archived {name} ({appointments:,} appointments)')
+    if not archived:
+        print(f'  No closed partitions end on or before {cutoff}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create and archive monthly appointment partitions')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='show partitions and archived partitions')
+    create_parser = commands.add_parser('create', help='create partitions ahead of time')
+    create_parser.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD,
+                               help=f'months after the current one to cover (default {DEFAULT_MONTHS_AHEAD})')
+    archive_parser = commands.add_parser('archive', help='move old closed partitions to appointment_archive')
+    cutoff = archive_parser.add_mutually_exclusive_group()
+    cutoff.add_argument('--before', type=date.fromisoformat,
+                        help='archive months that end on or before this date (YYYY-MM-DD)')
+    cutoff.add_argument('--keep-months', type=int, default=DEFAULT_KEEP_MONTHS,
+                        help=f'keep this many months before the current one (default {DEFAULT_KEEP_MONTHS})')
+    for command in (create_parser, archive_parser):
+        command.add_argument('--dry-run', action='store_true', help='report what would change, then roll back')
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        conn = psycopg2.connect(get_dsn())
+        cursor = conn.cursor()
+        if args.command == 'list':
+            list_partitions(cursor)
+        elif args.command == 'create':
+            create(cursor, args.months_ahead)
+        else:
+            archive(cursor, args.before or months_before(date.today(), args.keep_months))
+        if getattr(args, 'dry_run', False):
+            conn.rollback()
+            print('  Dry run: rolled back')
+        else:
+            conn.commit()
+    except psycopg2.Error as e:
+        print(f'✗ Partition maintenance failed: {e}')
+        sys.exit(1)
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,26 +15,24 @@ SELECT
     c.caregiver_user_id,
     u.given_name || ' ' || u.surname AS caregiver_name,
     c.caregiving_type,
-    SUM(a.work_hours) AS total_hours_worked
-FROM caregiver c
+    e.total_hours AS total_hours_worked
+FROM caregiver_earnings e
+JOIN caregiver c ON e.caregiver_user_id = c.caregiver_user_id
 JOIN "user" u ON c.caregiver_user_id = u.user_id
-JOIN appointment a ON c.caregiver_user_id = a.caregiver_user_id
-WHERE a.status IN ('Confirmed', 'Completed')
-GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.caregiving_type
+WHERE e.accepted_appointments > 0
 ORDER BY total_hours_worked DESC;
 
 SELECT 
     c.caregiver_user_id,
     u.given_name || ' ' || u.surname AS caregiver_name,
     c.hourly_rate,
-    COUNT(a.appointment_id) AS accepted_appointments,
-    AVG(a.work_hours * c.hourly_rate) AS average_pay_per_appointment,
-    SUM(a.work_hours * c.hourly_rate) AS total_earnings
-FROM caregiver c
+    e.accepted_appointments,
+    e.total_earnings / e.accepted_appointments AS average_pay_per_appointment,
+    e.total_earnings
+FROM caregiver_earnings e
+JOIN caregiver c ON e.caregiver_user_id = c.caregiver_user_id
 JOIN "user" u ON c.caregiver_user_id = u.user_id
-JOIN appointment a ON c.caregiver_user_id = a.caregiver_user_id
-WHERE a.status IN ('Confirmed', 'Completed')
-GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.hourly_rate
+WHERE e.accepted_appointments > 0
 ORDER BY total_earnings DESC;
 
 SELECT 
@@ -42,20 +40,14 @@ SELECT
     u.given_name || ' ' || u.surname AS caregiver_name,
     c.caregiving_type,
     c.hourly_rate,
-    SUM(a.work_hours * c.hourly_rate) AS total_earnings
-FROM caregiver c
+    e.total_earnings
+FROM caregiver_earnings e
+JOIN caregiver c ON e.caregiver_user_id = c.caregiver_user_id
 JOIN "user" u ON c.caregiver_user_id = u.user_id
-JOIN appointment a ON c.caregiver_user_id = a.caregiver_user_id
-WHERE a.status IN ('Confirmed', 'Completed')
-GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.caregiving_type, c.hourly_rate
-HAVING SUM(a.work_hours * c.hourly_rate) > (
-    SELECT AVG(earnings)
-    FROM (
-        SELECT SUM(a2.work_hours * c2.hourly_rate) AS earnings
-        FROM caregiver c2
-        JOIN appointment a2 ON c2.caregiver_user_id = a2.caregiver_user_id
-        WHERE a2.status IN ('Confirmed', 'Completed')
-        GROUP BY c2.caregiver_user_id
-    ) AS avg_earnings
-)
+WHERE e.accepted_appointments > 0
+    AND e.total_earnings > (
+        SELECT AVG(total_earnings)
+        FROM caregiver_earnings
+        WHERE accepted_appointments > 0
+    )
 ORDER BY total_earnings DESC;
@@ -1,5 +1,21 @@
-CREATE VIEW job_applications_view AS
-SELECT 
+-- Materialized, so reading the view no longer repeats the five-way join.
+-- The unique index on application_id is what allows
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY, which keeps the view readable
+-- while it is rebuilt. refresh_views.py runs the refreshes.
+
+-- job_applications_view used to be a plain view; drop whichever kind exists
+DO $$
+BEGIN
+	IF EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'job_applications_view') THEN
+		DROP MATERIALIZED VIEW job_applications_view;
+	ELSE
+		DROP VIEW IF EXISTS job_applications_view;
+	END IF;
+END;
+$$;
+
+CREATE MATERIALIZED VIEW job_applications_view AS
+SELECT
     ja.application_id,
     ja.date_applied,
     cu.given_name || ' ' || cu.surname AS applicant_name,
@@ -13,11 +29,43 @@ SELECT
     j.other_requirements,
     j.date_posted,
     mu.given_name || ' ' || mu.surname AS job_poster_name,
-    mu.email AS job_poster_email
+    mu.email AS job_poster_email,
+    ja.caregiver_user_id AS applicant_user_id
 FROM job_application ja
 JOIN caregiver c ON ja.caregiver_user_id = c.caregiver_user_id
 JOIN "user" cu ON c.caregiver_user_id = cu.user_id
 JOIN job j ON ja.job_id = j.job_id
 JOIN member m ON j.member_user_id = m.member_user_id
-JOIN "user" mu ON m.member_user_id = mu.user_id
-ORDER BY ja.date_applied DESC;
+JOIN "user" mu ON m.member_user_id = mu.user_id;
+
+CREATE UNIQUE INDEX idx_job_applications_view_id ON job_applications_view (application_id);
+
+CREATE INDEX idx_job_applications_view_job ON job_applications_view (job_id, application_id);
+
+CREATE INDEX idx_job_applications_view_applicant ON job_applications_view (applicant_user_id, application_id);
+
+CREATE INDEX idx_job_applications_view_date ON job_applications_view (date_applied, application_id);
+
+-- Any write to a table the view reads sends one notification per
+-- transaction (identical payloads are folded), which the refresher uses to
+-- refresh soon after a change instead of only on its timer.
+CREATE OR REPLACE FUNCTION job_applications_view_changed () RETURNS TRIGGER AS $$
+BEGIN
+	PERFORM pg_notify('job_applications_view_stale', TG_TABLE_NAME);
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+	t TEXT;
+BEGIN
+	FOREACH t IN ARRAY ARRAY['job_application', 'job', 'caregiver', 'member', 'user'] LOOP
+		EXECUTE format('DROP TRIGGER IF EXISTS job_applications_view_stale ON %I', t);
+		EXECUTE format(
+			'CREATE TRIGGER job_applications_view_stale AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+			 FOR EACH STATEMENT EXECUTE FUNCTION job_applications_view_changed()', t
+		);
+	END LOOP;
+END;
+$$;
@@ -3,12 +3,11 @@ SELECT
     u.given_name || ' ' || u.surname AS caregiver_name,
     c.caregiving_type,
     c.hourly_rate,
-    COUNT(a.appointment_id) AS number_of_accepted_appointments,
-    SUM(a.work_hours) AS total_hours_worked,
-    SUM(a.work_hours * c.hourly_rate) AS total_cost_to_pay
-FROM caregiver c
+    e.accepted_appointments AS number_of_accepted_appointments,
+    e.total_hours AS total_hours_worked,
+    e.total_earnings AS total_cost_to_pay
+FROM caregiver_earnings e
+JOIN caregiver c ON e.caregiver_user_id = c.caregiver_user_id
 JOIN "user" u ON c.caregiver_user_id = u.user_id
-JOIN appointment a ON c.caregiver_user_id = a.caregiver_user_id
-WHERE a.status IN ('Confirmed', 'Completed')
-GROUP BY c.caregiver_user_id, u.given_name, u.surname, c.caregiving_type, c.hourly_rate
+WHERE e.accepted_appointments > 0
 ORDER BY total_cost_to_pay DESC;
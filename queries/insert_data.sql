@@ -271,3 +271,7 @@ VALUES
 		8.00,
 		'Scheduled'
 	);
+
+-- The sample appointments predate the partitions schema.sql creates; move
+-- them out of appointment_default into their own month
+SELECT create_appointment_partitions ();
@@ -1 +1 @@
-SELECT * FROM job_applications_view;
+SELECT * FROM job_applications_view ORDER BY date_applied DESC, application_id DESC;
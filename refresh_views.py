@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Keep materialized views current with REFRESH MATERIALIZED VIEW CONCURRENTLY
+
+A view is refreshed:
+  - on change: triggers on the tables it reads (queries/create_view.sql) send
+    a NOTIFY on the view's channel. A burst of writes is folded into one
+    refresh, run once the channel has been quiet for --debounce seconds but
+    never later than --max-delay seconds after the first notification.
+  - on a timer: every --interval seconds, which also covers changes made
+    while the refresher was not running.
+
+A concurrent refresh compares the new contents with the old and only writes
+the differences, and readers keep using the view meanwhile. It needs a unique
+index on the view (idx_job_applications_view_id).
+
+Usage:
+    python refresh_views.py                 # listen and refresh until interrupted
+    python refresh_views.py --once          # refresh every view once and exit (cron)
+    python refresh_views.py --interval 600 --debounce 5
+"""
+import argparse
+import os
+import select
+import sys
+import time
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import make_dsn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Materialized view -> NOTIFY channel its triggers signal changes on
+MATERIALIZED_VIEWS = {
+    'job_applications_view': 'job_applications_view_stale',
+}
+
+
+def get_dsn():
+    """Connection string from DATABASE_URL or the DB_* variables used elsewhere"""
+    if 'DATABASE_URL' in os.environ:
+        return os.environ['DATABASE_URL']
+    return make_dsn(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        dbname=os.getenv('DB_NAME', 'caregiving_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres'),
+    )
+
+
+def refresh(cursor, view, reason):
+    started = time.perf_counter()
+    cursor.execute(sql.SQL('REFRESH MATERIALIZED VIEW CONCURRENTLY {}').format(sql.Identifier(view)))
+    print(f'  {time.strftime("%H:%M:%S")}  {view:<25} refreshed in '
+          f'{time.perf_counter() - started:.2f}s ({reason})', flush=True)
+
+
+class Schedule:
+    """When each view is next due: its timer, or a pending change notification"""
+
+    def __init__(self, interval, debounce, max_delay):
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        now = time.monotonic()
+        self.refreshed_at = {view: now for view in MATERIALIZED_VIEWS}
+        self.changes = {}  # view -> (first, last) notification time
+
+    def notified(self, channel):
+        now = time.monotonic()
+        for view, view_channel in MATERIALIZED_VIEWS.items():
+            if view_channel == channel:
+                first, _ = self.changes.get(view, (now, now))
+                self.changes[view] = (first, now)
+
+    def due_at(self, view):
+        due = self.refreshed_at[view] + self.interval
+        if view in self.changes:
+            first, last = self.changes[view]
+            due = min(due, last + self.debounce, first + self.max_delay)
+        return due
+
+    def next_due(self):
+        return min(self.due_at(view) for view in MATERIALIZED_VIEWS)
+
+    def due(self):
+        """(view, reason) pairs that are due now"""
+        now = time.monotonic()
+        return [
+            (view, 'changed' if view in self.changes else 'timer')
+            for view in MATERIALIZED_VIEWS if self.due_at(view) <= now
+        ]
+
+    def refreshed(self, view):
+        self.refreshed_at[view] = time.monotonic()
+        self.changes.pop(view, None)
+
+
+def run(conn, interval, debounce, max_delay):
+    cursor = conn.cursor()
+    for channel in set(MATERIALIZED_VIEWS.values()):
+        cursor.execute(sql.SQL('LISTEN {}').format(sql.Identifier(channel)))
+    # Catch up on anything that changed while nobody was listening
+    for view in MATERIALIZED_VIEWS:
+        refresh(cursor, view, 'startup')
+
+    schedule = Schedule(interval, debounce, max_delay)
+    while True:
+        timeout = max(0.0, schedule.next_due() - time.monotonic())
+        if select.select([conn], [], [], timeout)[0]:
+            conn.poll()
+            while conn.notifies:
+                schedule.notified(conn.notifies.pop(0).channel)
+        for view, reason in schedule.due():
+            # Mark first: changes committed while the refresh runs notify
+            # again and schedule another one
+            schedule.refreshed(view)
+            refresh(cursor, view, reason)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh materialized views on change and on a timer')
+    parser.add_argument('--once', action='store_true', help='refresh every view once and exit')
+    parser.add_argument('--interval', type=float, default=900,
+                        help='seconds between refreshes without changes (default 900)')
+    parser.add_argument('--debounce', type=float, default=2,
+                        help='quiet seconds after a change before refreshing (default 2)')
+    parser.add_argument('--max-delay', type=float, default=30,
+                        help='longest a change waits while writes keep arriving (default 30)')
+    args = parser.parse_args()
+
+    try:
+        conn = psycopg2.connect(get_dsn())
+        # Notifications are only delivered between transactions
+        conn.autocommit = True
+        if args.once:
+            cursor = conn.cursor()
+            for view in MATERIALIZED_VIEWS:
+                refresh(cursor, view, 'once')
+        else:
+            print(f'Listening on {", ".join(sorted(set(MATERIALIZED_VIEWS.values())))} '
+                  f'(interval {args.interval:g}s, debounce {args.debounce:g}s, max delay {args.max_delay:g}s)')
+            run(conn, args.interval, args.debounce, args.max_delay)
+    except KeyboardInterrupt:
+        pass
+    except psycopg2.Error as e:
+        print(f'✗ Refresh failed: {e}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,20 @@
+import argparse
+import itertools
 import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import StringIO
 import psycopg2
 from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
+from database import replicas
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -17,18 +29,69 @@ DB_CONFIG = {
 
 # SQL files to execute
 SQL_FILES = {
-    '1': {'name': 'Schema Migration', 'file': 'schema.sql'},
-    '2': {'name': 'Insert Data', 'file': 'queries/insert_data.sql'},
-	'3': {'name': 'Update Queries', 'file': 'queries/update_queries.sql'},
-    '4': {'name': 'Delete Queries', 'file': 'queries/delete_queries.sql'},
-    '5': {'name': 'Simple Queries', 'file': 'queries/simple_queries.sql'},
-    '6': {'name': 'Complex Queries', 'file': 'queries/complex_queries.sql'},
-    '7': {'name': 'Derived Attribute Query', 'file': 'queries/derived_attribute_query.sql'},
-    '8': {'name': 'Create View', 'file': 'queries/create_view.sql'},
-    '9': {'name': 'View Operation', 'file': 'queries/view_operation.sql'},
+    '1': {'name': 'Schema Migration', 'file': 'schema.sql', 'phase': 'schema'},
+    '2': {'name': 'Insert Data', 'file': 'queries/insert_data.sql', 'phase': 'insert'},
+    '3': {'name': 'Update Queries', 'file': 'queries/update_queries.sql', 'phase': 'dml'},
+    '4': {'name': 'Delete Queries', 'file': 'queries/delete_queries.sql', 'phase': 'dml'},
+    '5': {'name': 'Simple Queries', 'file': 'queries/simple_queries.sql', 'phase': 'read'},
+    '6': {'name': 'Complex Queries', 'file': 'queries/complex_queries.sql', 'phase': 'read'},
+    '7': {'name': 'Derived Attribute Query', 'file': 'queries/derived_attribute_query.sql', 'phase': 'read'},
+    '8': {'name': 'Create View', 'file': 'queries/create_view.sql', 'phase': 'views'},
+    '9': {'name': 'View Operation', 'file': 'queries/view_operation.sql', 'phase': 'read'},
 
 }
 
+# Dependency order used by --all. Files in a phase only run after every
+# earlier phase has finished; read-only files don't depend on each other and
+# run concurrently on pooled connections.
+PHASES = ['schema', 'insert', 'dml', 'views', 'read']
+PARALLEL_PHASES = {'read'}
+DEFAULT_JOBS = 4
+
+# Streaming mode: rows fetched per round trip from the server-side cursor, and
+# the widest a column gets when printed
+STREAM_BATCH_SIZE = 1000
+MAX_COL_WIDTH = 50
+
+DOLLAR_QUOTE = re.compile(r"\$[A-Za-z_]*\$")
+
+def split_statements(sql_content):
+    """
+    Split a SQL script into statements on semicolons, ignoring semicolons
+    inside quotes, comments and $$-quoted function bodies. Comment-only
+    chunks are dropped.
+    """
+    statements, start, i, n = [], 0, 0, len(sql_content)
+    while i < n:
+        ch = sql_content[i]
+        if ch == "'" or ch == '"':
+            i = sql_content.find(ch, i + 1)
+            i = n if i == -1 else i + 1
+        elif sql_content.startswith('--', i):
+            i = sql_content.find('\n', i)
+            i = n if i == -1 else i + 1
+        elif sql_content.startswith('/*', i):
+            i = sql_content.find('*/', i + 2)
+            i = n if i == -1 else i + 2
+        elif ch == '$' and DOLLAR_QUOTE.match(sql_content, i):
+            tag = DOLLAR_QUOTE.match(sql_content, i).group()
+            i = sql_content.find(tag, i + len(tag))
+            i = n if i == -1 else i + len(tag)
+        elif ch == ';':
+            statements.append(sql_content[start:i])
+            start = i = i + 1
+        else:
+            i += 1
+    statements.append(sql_content[start:])
+    return [stmt.strip() for stmt in statements if strip_comments(stmt)]
+
+def strip_comments(statement):
+    """Statement text without leading comment lines"""
+    lines = statement.strip().splitlines()
+    while lines and (lines[0].strip().startswith('--') or not lines[0].strip()):
+        lines.pop(0)
+    return "\n".join(lines).strip()
+
 def connect_db():
     """Establish database connection"""
     try:
@@ -45,20 +108,15 @@ def execute_sql_file(cursor, filepath):
             sql_content = f.read()
             
         # Split into individual statements (handling semicolons)
-        statements = [stmt.strip() for stmt in sql_content.split(';') if stmt.strip()]
+        statements = split_statements(sql_content)
         
         results = []
         for statement in statements:
-            # Skip comments
-            if statement.startswith('--') or not statement:
-                continue
-                
             try:
                 cursor.execute(statement)
                 
                 # Try to fetch results if it's a SELECT query
-                if statement.strip().upper().startswith('SELECT') or \
-                   statement.strip().upper().startswith('WITH'):
+                if is_select(statement):
                     rows = cursor.fetchall()
                     colnames = [desc[0] for desc in cursor.description] if cursor.description else []
                     results.append({
@@ -91,7 +149,7 @@ def display_menu():
     print("  a. Run all queries in order")
     print("="*50)
 
-def run_query(choice, conn):
+def run_query(choice, conn, options=None):
     """Run selected query"""
     if choice == '0':
         return False
@@ -99,53 +157,140 @@ def run_query(choice, conn):
     if choice == 'a':
         print("\nRunning all queries in order...")
         for key in sorted(SQL_FILES.keys()):
-            run_single_query(key, conn)
+            run_single_query(key, conn, options)
         return True
     
     if choice in SQL_FILES:
-        run_single_query(choice, conn)
+        run_single_query(choice, conn, options)
         return True
     else:
         print("Invalid choice. Please try again.")
         return True
 
-def format_table(columns, rows):
-    """Format query results as a table"""
-    if not rows:
-        return "No results found."
-    
-    # Calculate column widths
+def column_widths(columns, rows):
+    """Width of each column from its header and the given rows, capped at MAX_COL_WIDTH"""
     col_widths = []
     for i, col in enumerate(columns):
         max_width = len(str(col))
         for row in rows:
             if i < len(row):
                 max_width = max(max_width, len(str(row[i])))
-        col_widths.append(min(max_width, 50))  # Cap at 50 chars
-    
-    # Create header
+        col_widths.append(min(max_width, MAX_COL_WIDTH))
+    return col_widths
+
+def format_header(columns, col_widths):
     header = " | ".join(str(col).ljust(col_widths[i]) for i, col in enumerate(columns))
     separator = "-+-".join("-" * width for width in col_widths)
+    return f"{header}\n{separator}"
+
+def format_row(row, col_widths, max_width=None):
+    """Pad each value to its column width and cut it at max_width (default: the column width)"""
+    return " | ".join(
+        str(row[i] if i < len(row) else "").ljust(col_widths[i])[:max_width or col_widths[i]]
+        for i in range(len(col_widths))
+    )
+
+def format_table(columns, rows):
+    """Format query results as a table"""
+    if not rows:
+        return "No results found."
     
-    # Create rows
-    table_rows = []
-    for row in rows:
-        formatted_row = " | ".join(
-            str(row[i] if i < len(row) else "").ljust(col_widths[i])[:col_widths[i]] 
-            for i in range(len(columns))
-        )
-        table_rows.append(formatted_row)
-    
-    return f"\n{header}\n{separator}\n" + "\n".join(table_rows)
+    col_widths = column_widths(columns, rows)
+    table_rows = [format_row(row, col_widths) for row in rows]
+    return f"\n{format_header(columns, col_widths)}\n" + "\n".join(table_rows)
+
+def is_select(statement):
+    upper = strip_comments(statement).upper()
+    return upper.startswith('SELECT') or upper.startswith('WITH')
+
+_cursor_ids = itertools.count(1)
+
+def stream_select(conn, statement, out, limit=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Run a SELECT through a named (server-side) cursor and print rows as they
+    arrive. Column widths come from the first batch; later values longer than
+    that are shown up to MAX_COL_WIDTH. Returns the number of rows printed.
+    """
+    cursor = conn.cursor(name=f"run_queries_{next(_cursor_ids)}")
+    try:
+        cursor.itersize = batch_size
+        cursor.execute(statement)
+        fetch = batch_size if limit is None else min(batch_size, limit)
+        rows = cursor.fetchmany(fetch)
+        columns = [desc[0] for desc in cursor.description]
+        if not rows:
+            print("No results found.", file=out)
+            return 0
+
+        col_widths = column_widths(columns, rows)
+        print(format_header(columns, col_widths), file=out)
+        count = 0
+        while rows:
+            for row in rows:
+                print(format_row(row, col_widths, MAX_COL_WIDTH).rstrip(), file=out)
+            count += len(rows)
+            out.flush()
+            if limit is not None and count >= limit:
+                break
+            fetch = batch_size if limit is None else min(batch_size, limit - count)
+            rows = cursor.fetchmany(fetch)
+        return count
+    finally:
+        cursor.close()
+
+def stream_sql_file(conn, filepath, out=sys.stdout, limit=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Execute SQL commands from a file, streaming SELECT results instead of
+    holding them in memory. Returns one timing entry per statement, or None
+    if the file could not be read.
+    """
+    try:
+        with open(filepath, 'r') as f:
+            sql_content = f.read()
+    except OSError as e:
+        print(f"Error reading file: {e}", file=out)
+        return None
+
+    timings = []
+    query_no = 0
+    for statement in split_statements(sql_content):
+        preview = ' '.join(strip_comments(statement).split())
+        preview = preview[:100] + '...' if len(preview) > 100 else preview
+        timing = {'statement': preview, 'rows': 0, 'seconds': 0.0, 'error': None}
+        started = time.perf_counter()
+        try:
+            if is_select(statement):
+                query_no += 1
+                print(f"\n--- Query {query_no}: {preview} ---", file=out)
+                count = stream_select(conn, statement, out, limit=limit, batch_size=batch_size)
+                timing['seconds'] = time.perf_counter() - started
+                suffix = f", limited to {limit}" if limit is not None and count >= limit else ""
+                print(f"({count} rows{suffix}, {timing['seconds']:.3f}s)", file=out)
+            else:
+                with conn.cursor() as cursor:
+                    cursor.execute(statement)
+                    count = max(cursor.rowcount, 0)
+                timing['seconds'] = time.perf_counter() - started
+            timing['rows'] = count
+        except psycopg2.Error as e:
+            timing['seconds'] = time.perf_counter() - started
+            timing['error'] = str(e).strip()
+            print(f"Error in statement: {e}", file=out)
+        timings.append(timing)
+    return timings
 
-def run_single_query(choice, conn):
+def run_single_query(choice, conn, options=None):
     """Execute a single query file"""
-    query_info = SQL_FILES[choice]
+    query_info = SQL_FILES[choice] if choice in SQL_FILES else {'name': choice, 'file': choice}
     print(f"\n{'='*50}")
     print(f"Executing: {query_info['name']}")
     print(f"File: {query_info['file']}")
     print('='*50)
     
+    if options is not None and options.stream:
+        run_streamed_query(query_info, conn, options)
+        return
+    
     cursor = conn.cursor()
     try:
         results = execute_sql_file(cursor, query_info['file'])
@@ -174,13 +319,215 @@ def run_single_query(choice, conn):
     finally:
         cursor.close()
 
+def run_streamed_query(query_info, conn, options):
+    """Execute a query file in streaming mode, optionally through a pager"""
+    out, pager = sys.stdout, None
+    if options.pager:
+        pager = subprocess.Popen(
+            shlex.split(os.getenv('PAGER', 'less -S')), stdin=subprocess.PIPE, text=True
+        )
+        out = pager.stdin
+    try:
+        timings = stream_sql_file(conn, query_info['file'], out=out, limit=options.limit,
+                                  batch_size=options.batch_size)
+        if timings is not None:
+            conn.commit()
+            print(f"✓ Successfully executed {query_info['name']}")
+        else:
+            conn.rollback()
+            print(f"✗ Failed to execute {query_info['name']}")
+    except BrokenPipeError:
+        # The pager (or `| head`) stopped reading; that is not an error
+        conn.rollback()
+    except Exception as e:
+        conn.rollback()
+        print(f"✗ Error: {e}")
+    finally:
+        if pager is not None:
+            try:
+                pager.stdin.close()
+            except BrokenPipeError:
+                pass
+            pager.wait()
+
+def print_banner(query_info, out=sys.stdout):
+    print(f"\n{'='*50}", file=out)
+    print(f"Executing: {query_info['name']}", file=out)
+    print(f"File: {query_info['file']}", file=out)
+    print('='*50, file=out)
+
+def open_output(query_info, options):
+    """Where a file's results go: a file in --output-dir, or a buffer printed when it finishes"""
+    if options.output_dir:
+        name = os.path.splitext(os.path.basename(query_info['file']))[0]
+        return open(os.path.join(options.output_dir, f"{name}.txt"), 'w')
+    return StringIO()
+
+def run_serial_file(query_info, conn, options):
+    """Run one file of a setup phase on the shared connection and commit it"""
+    print_banner(query_info)
+    timings = stream_sql_file(conn, query_info['file'], limit=options.limit,
+                              batch_size=options.batch_size)
+    if timings is None:
+        conn.rollback()
+    else:
+        conn.commit()
+    return timings
+
+def read_only_config(options):
+    """Connection parameters for the read-only phase: a healthy replica unless --primary"""
+    if replicas and not options.primary:
+        replicas.check()
+        replica = replicas.choose()
+        if replica is not None:
+            print(f"Read-only files run on replica {replica!r} ({replica.lag:.1f}s behind)")
+            return {'dsn': replica.url.set(drivername='postgresql').render_as_string(hide_password=False)}
+        print("No healthy replica; read-only files run on the primary")
+    return DB_CONFIG
+
+def run_pooled_file(query_info, pool, options):
+    """Run one read-only file on a pooled connection; returns (output, timings)"""
+    conn = pool.getconn()
+    out = open_output(query_info, options)
+    try:
+        conn.set_session(readonly=True)
+        print_banner(query_info, out)
+        timings = stream_sql_file(conn, query_info['file'], out=out, limit=options.limit,
+                                  batch_size=options.batch_size)
+        conn.rollback()
+        if isinstance(out, StringIO):
+            return out.getvalue(), timings
+        return f"Results of {query_info['name']} written to {out.name}", timings
+    finally:
+        out.close()
+        pool.putconn(conn)
+
+def summary_row(query_info, phase, timings, elapsed):
+    if timings is None:
+        return [query_info['file'], phase, '-', 'file error', '-', f"{elapsed:.3f}", '']
+    errors = sum(1 for t in timings if t['error'])
+    slowest = max(timings, key=lambda t: t['seconds'], default=None)
+    return [
+        query_info['file'], phase, len(timings), errors,
+        sum(t['rows'] for t in timings), f"{elapsed:.3f}",
+        f"{slowest['seconds']:.3f}s {slowest['statement'][:40]}" if slowest else '',
+    ]
+
+def run_phases(options):
+    """
+    Run every file in dependency order (PHASES). Setup phases run serially on
+    one connection; the read-only phase runs its files concurrently from a
+    connection pool, on a healthy read replica when DATABASE_REPLICA_URLS is
+    set. Ends with a per-file summary table.
+    """
+    phases = ['read'] if options.read_only else PHASES
+    if options.output_dir:
+        os.makedirs(options.output_dir, exist_ok=True)
+    summary = []
+    started = time.perf_counter()
+
+    for phase in phases:
+        files = [info for info in SQL_FILES.values() if info['phase'] == phase]
+        if not files:
+            continue
+        print(f"\n##### Phase: {phase} ({len(files)} file{'s' if len(files) != 1 else ''}) #####")
+
+        if phase not in PARALLEL_PHASES:
+            conn = connect_db()
+            if conn is None:
+                return False
+            try:
+                for query_info in files:
+                    file_started = time.perf_counter()
+                    timings = run_serial_file(query_info, conn, options)
+                    summary.append(summary_row(query_info, phase, timings, time.perf_counter() - file_started))
+            finally:
+                conn.close()
+            continue
+
+        jobs = max(1, min(options.jobs, len(files)))
+        pool = ThreadedConnectionPool(1, jobs, **read_only_config(options))
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = {
+                    executor.submit(run_pooled_file, query_info, pool, options): query_info
+                    for query_info in files
+                }
+                for future in as_completed(futures):
+                    query_info = futures[future]
+                    try:
+                        output, timings = future.result()
+                    except (OSError, psycopg2.Error) as e:
+                        output, timings = f"✗ {query_info['name']}: {e}", None
+                    print(output)
+                    elapsed = sum(t['seconds'] for t in timings) if timings else 0.0
+                    summary.append(summary_row(query_info, phase, timings, elapsed))
+        finally:
+            pool.closeall()
+
+    wall = time.perf_counter() - started
+    print(f"\n{'='*50}\nSUMMARY\n{'='*50}")
+    print(format_table(
+        ['File', 'Phase', 'Statements', 'Errors', 'Rows', 'Time (s)', 'Slowest statement'], summary
+    ))
+    file_time = sum(float(row[5]) for row in summary)
+    print(f"\nWall-clock {wall:.3f}s for {file_time:.3f}s of file time ({len(summary)} files)")
+    return all(row[3] == 0 for row in summary)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the project's SQL files. Without FILE arguments an interactive menu is shown."
+    )
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help='menu number (e.g. 6) or path of a SQL file to run')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream SELECT results from server-side cursors instead of loading them')
+    parser.add_argument('--limit', type=int, help='print at most N rows per query (implies --stream)')
+    parser.add_argument('--batch-size', type=int, default=STREAM_BATCH_SIZE,
+                        help=f'rows fetched per round trip when streaming (default {STREAM_BATCH_SIZE})')
+    parser.add_argument('--pager', action='store_true',
+                        help='send streamed results through $PAGER (default: less -S)')
+    parser.add_argument('--all', action='store_true',
+                        help='run every file in dependency order, read-only files concurrently')
+    parser.add_argument('--read-only', action='store_true',
+                        help='with --all, only run the read-only files')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'concurrent read-only files with --all (default {DEFAULT_JOBS})')
+    parser.add_argument('--output-dir', help="with --all, write each read-only file's results to DIR/<file>.txt")
+    parser.add_argument('--primary', action='store_true',
+                        help='with --all, run read-only files on the primary even when replicas are configured')
+    args = parser.parse_args(argv)
+    if args.read_only:
+        args.all = True
+    if args.limit is not None or args.pager:
+        args.stream = True
+    return args
+
 def main():
     """Main function"""
-    print("Connecting to database...")
+    options = parse_args()
+    
+    if options.all:
+        sys.exit(0 if run_phases(options) else 1)
+    
+    print("Connecting to database...", file=sys.stderr if options.files else sys.stdout)
     conn = connect_db()
     
     if not conn:
         print("Failed to connect to database. Check your .env configuration.")
+        sys.exit(1)
+    
+    if options.files:
+        # Non-interactive: run the given files and exit, so output can be
+        # piped into a pager or another tool
+        try:
+            for choice in options.files:
+                run_single_query(choice, conn, options)
+        except BrokenPipeError:
+            # Reader (e.g. `| head`) went away; silence the flush at exit
+            sys.stdout = open(os.devnull, 'w')
+        finally:
+            conn.close()
         return
     
     print(f"✓ Connected to {DB_CONFIG['database']} at {DB_CONFIG['host']}:{DB_CONFIG['port']}")
@@ -190,7 +537,7 @@ def main():
             display_menu()
             choice = input("\nEnter your choice: ").strip().lower()
             
-            if not run_query(choice, conn):
+            if not run_query(choice, conn, options):
                 break
     
     except KeyboardInterrupt:
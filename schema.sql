@@ -1,5 +1,22 @@
+-- job_applications_view used to be a plain view; drop whichever kind exists
+DO $$
+BEGIN
+	IF EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'job_applications_view') THEN
+		DROP MATERIALIZED VIEW job_applications_view;
+	ELSE
+		DROP VIEW IF EXISTS job_applications_view;
+	END IF;
+END;
+$$;
+
+DROP TABLE IF EXISTS caregiver_earnings;
+
+DROP SCHEMA IF EXISTS appointment_archive CASCADE;
+
 DROP TABLE IF EXISTS appointment;
 
+DROP TABLE IF EXISTS appointment_ids;
+
 DROP TABLE IF EXISTS job_application;
 
 DROP TABLE IF EXISTS job;
@@ -12,6 +29,14 @@ DROP TABLE IF EXISTS caregiver;
 
 DROP TABLE IF EXISTS "user";
 
+DROP TABLE IF EXISTS entity_counter;
+
+-- Trigram operator classes for substring (ILIKE '%...%') search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Lets the appointment exclusion constraint combine = on an integer with && on a range
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 CREATE TABLE
 	"user" (
 		user_id SERIAL PRIMARY KEY,
@@ -23,7 +48,11 @@ CREATE TABLE
 		profile_description TEXT,
 		password VARCHAR(255) NOT NULL,
 		created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-		updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+		updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+		search_vector TSVECTOR GENERATED ALWAYS AS (
+			setweight(to_tsvector('simple', given_name || ' ' || surname), 'A') ||
+			setweight(to_tsvector('english', coalesce(profile_description, '')), 'B')
+		) STORED
 	);
 
 CREATE TABLE
@@ -43,6 +72,10 @@ CREATE TABLE
 		member_user_id INT PRIMARY KEY,
 		house_rules TEXT,
 		dependent_description TEXT,
+		search_vector TSVECTOR GENERATED ALWAYS AS (
+			setweight(to_tsvector('english', coalesce(house_rules, '')), 'A') ||
+			setweight(to_tsvector('english', coalesce(dependent_description, '')), 'B')
+		) STORED,
 		FOREIGN KEY (member_user_id) REFERENCES "user" (user_id) ON DELETE CASCADE
 	);
 
@@ -63,6 +96,10 @@ CREATE TABLE
 		required_caregiving_type VARCHAR(100) NOT NULL,
 		other_requirements TEXT,
 		date_posted DATE NOT NULL,
+		search_vector TSVECTOR GENERATED ALWAYS AS (
+			setweight(to_tsvector('english', required_caregiving_type), 'A') ||
+			setweight(to_tsvector('english', coalesce(other_requirements, '')), 'B')
+		) STORED,
 		FOREIGN KEY (member_user_id) REFERENCES member (member_user_id) ON DELETE CASCADE
 	);
 
@@ -77,14 +114,19 @@ CREATE TABLE
 		CONSTRAINT unique_application UNIQUE (caregiver_user_id, job_id)
 	);
 
+-- Range-partitioned by month of appointment_date (see the partition functions
+-- below), so lookups by date only read the months they ask for and closed
+-- months can be archived whole. A partitioned table's primary key must
+-- contain the partition key; appointment_id still comes from one sequence
+-- and is kept unique on its own by appointment_ids below.
 CREATE TABLE
 	appointment (
-		appointment_id SERIAL PRIMARY KEY,
+		appointment_id SERIAL,
 		caregiver_user_id INT NOT NULL,
 		member_user_id INT NOT NULL,
 		appointment_date DATE NOT NULL,
 		appointment_time TIME NOT NULL,
-		work_hours DECIMAL(5, 2) NOT NULL,
+		work_hours DECIMAL(5, 2) NOT NULL CHECK (work_hours > 0),
 		status VARCHAR(20) CHECK (
 			status IN (
 				'Scheduled',
@@ -93,22 +135,529 @@ CREATE TABLE
 				'Cancelled'
 			)
 		) DEFAULT 'Scheduled',
+		time_range TSRANGE GENERATED ALWAYS AS (
+			tsrange(
+				appointment_date + appointment_time,
+				appointment_date + appointment_time + work_hours * INTERVAL '1 hour'
+			)
+		) STORED,
+		PRIMARY KEY (appointment_id, appointment_date),
 		FOREIGN KEY (caregiver_user_id) REFERENCES caregiver (caregiver_user_id) ON DELETE CASCADE,
 		FOREIGN KEY (member_user_id) REFERENCES member (member_user_id) ON DELETE CASCADE
-	);
+	)
+PARTITION BY
+	RANGE (appointment_date);
+
+-- Every appointment_id in use, live or archived. The primary key of
+-- appointment only makes (appointment_id, appointment_date) unique, so an
+-- explicit id could repeat in another month; inserting the ids here as well
+-- rejects that, concurrent inserts included, as a violation of
+-- appointment_ids_pkey. Statement-level triggers keep it in step; rows moved
+-- between partitions (an UPDATE of appointment_date, create_appointment_partition)
+-- keep their id and are not touched.
+CREATE TABLE appointment_ids (appointment_id INT PRIMARY KEY);
+
+CREATE OR REPLACE FUNCTION appointment_ids_insert () RETURNS TRIGGER AS $$
+BEGIN
+	INSERT INTO appointment_ids (appointment_id) SELECT appointment_id FROM new_rows;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION appointment_ids_delete () RETURNS TRIGGER AS $$
+BEGIN
+	DELETE FROM appointment_ids r USING old_rows o WHERE r.appointment_id = o.appointment_id;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only ids that changed are touched, so status and date updates cost two
+-- passes over the transition tables and no index writes
+CREATE OR REPLACE FUNCTION appointment_ids_update () RETURNS TRIGGER AS $$
+BEGIN
+	DELETE FROM appointment_ids r
+	USING (SELECT appointment_id FROM old_rows EXCEPT ALL SELECT appointment_id FROM new_rows) o
+	WHERE r.appointment_id = o.appointment_id;
+	INSERT INTO appointment_ids (appointment_id)
+	SELECT appointment_id FROM new_rows EXCEPT ALL SELECT appointment_id FROM old_rows;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Archived ids stay reserved
+CREATE OR REPLACE FUNCTION appointment_ids_truncate () RETURNS TRIGGER AS $$
+BEGIN
+	TRUNCATE appointment_ids;
+	INSERT INTO appointment_ids (appointment_id) SELECT appointment_id FROM appointment_archive.appointment;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER appointment_ids_insert
+AFTER INSERT ON appointment REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION appointment_ids_insert ();
+
+CREATE TRIGGER appointment_ids_delete
+AFTER DELETE ON appointment REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION appointment_ids_delete ();
+
+CREATE TRIGGER appointment_ids_update
+AFTER UPDATE ON appointment REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION appointment_ids_update ();
+
+CREATE TRIGGER appointment_ids_truncate
+AFTER TRUNCATE ON appointment
+FOR EACH STATEMENT EXECUTE FUNCTION appointment_ids_truncate ();
+
+-- Appointments dated outside every monthly partition land here until
+-- create_appointment_partitions() moves them into their month.
+CREATE TABLE appointment_default PARTITION OF appointment DEFAULT;
 
-CREATE INDEX idx_user_email ON "user" (email);
+-- Archived months: detached from appointment and attached here, still
+-- queryable but no longer scanned, vacuumed or counted with live rows.
+CREATE SCHEMA appointment_archive;
+
+CREATE TABLE
+	appointment_archive.appointment (LIKE appointment INCLUDING GENERATED INCLUDING CONSTRAINTS)
+PARTITION BY
+	RANGE (appointment_date);
+
+-- A caregiver cannot be booked twice at the same time. Postgres 16 only
+-- allows an exclusion constraint on a partitioned table when it compares the
+-- partition key with =, so each partition carries its own
+-- appointment_no_overlap_<month> constraint. Its GiST index on
+-- (caregiver_user_id, time_range) also answers conflict and availability
+-- lookups without reading the rest of a caregiver's history.
+CREATE OR REPLACE FUNCTION add_appointment_no_overlap (partition_name TEXT, suffix TEXT) RETURNS VOID AS $$
+BEGIN
+	EXECUTE format(
+		'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING GIST (caregiver_user_id WITH =, time_range WITH &&)
+		 WHERE (status <> ''Cancelled'')',
+		partition_name, 'appointment_no_overlap_' || suffix);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT add_appointment_no_overlap ('appointment_default', 'default');
+
+-- An appointment can run past the end of its month (work_hours goes up to
+-- 999.99, just under 42 days), which the per-partition constraints cannot
+-- see. This trigger checks the other partitions, pruned to the dates an
+-- overlapping appointment can start on, and reports a clash as a violation
+-- of appointment_no_overlap. The advisory lock serializes bookings of one
+-- caregiver, so two transactions cannot each miss the other's row.
+CREATE OR REPLACE FUNCTION appointment_no_overlap_across_partitions () RETURNS TRIGGER AS $$
+DECLARE
+	clash INT;
+BEGIN
+	PERFORM pg_advisory_xact_lock('appointment'::regclass::oid::int, NEW.caregiver_user_id);
+	SELECT a.appointment_id INTO clash
+	FROM appointment a
+	WHERE a.caregiver_user_id = NEW.caregiver_user_id
+		AND a.status <> 'Cancelled'
+		AND a.time_range && NEW.time_range
+		AND a.appointment_date BETWEEN NEW.appointment_date - 42 AND upper(NEW.time_range)::date
+		AND a.tableoid <> TG_RELID
+	LIMIT 1;
+	IF FOUND THEN
+		RAISE EXCEPTION 'appointment % overlaps appointment % of caregiver %',
+			NEW.appointment_id, clash, NEW.caregiver_user_id
+			USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'appointment_no_overlap',
+				TABLE = 'appointment';
+	END IF;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER appointment_no_overlap_insert
+AFTER INSERT ON appointment
+FOR EACH ROW WHEN (NEW.status <> 'Cancelled')
+EXECUTE FUNCTION appointment_no_overlap_across_partitions ();
+
+CREATE TRIGGER appointment_no_overlap_update
+AFTER UPDATE ON appointment
+FOR EACH ROW WHEN (
+	NEW.status <> 'Cancelled'
+	AND (OLD.status = 'Cancelled' OR NEW.caregiver_user_id <> OLD.caregiver_user_id
+		OR NEW.time_range <> OLD.time_range)
+)
+EXECUTE FUNCTION appointment_no_overlap_across_partitions ();
+
+-- Create the monthly partition holding the given date, named
+-- appointment_YYYY_MM; returns its name, or NULL when it already exists. A
+-- partition cannot be created while the default partition holds rows for
+-- its range, so those rows are moved across in the same transaction.
+CREATE OR REPLACE FUNCTION create_appointment_partition (day DATE) RETURNS TEXT AS $$
+DECLARE
+	first_day DATE := date_trunc('month', day)::date;
+	next_month DATE := (date_trunc('month', day) + INTERVAL '1 month')::date;
+	suffix TEXT := to_char(day, 'YYYY_MM');
+	partition_name TEXT := 'appointment_' || to_char(day, 'YYYY_MM');
+	column_list TEXT := 'appointment_id, caregiver_user_id, member_user_id, appointment_date, appointment_time, work_hours, status';
+	stranded BOOLEAN;
+BEGIN
+	IF to_regclass(partition_name) IS NOT NULL THEN
+		RETURN NULL;
+	END IF;
+	SELECT EXISTS (
+		SELECT 1 FROM appointment_default WHERE appointment_date >= first_day AND appointment_date < next_month
+	) INTO stranded;
+	IF stranded THEN
+		ALTER TABLE appointment DETACH PARTITION appointment_default;
+	END IF;
+	EXECUTE format('CREATE TABLE %I PARTITION OF appointment FOR VALUES FROM (%L) TO (%L)',
+		partition_name, first_day, next_month);
+	PERFORM add_appointment_no_overlap (partition_name, suffix);
+	IF stranded THEN
+		-- Row for row, so the counters and the earnings rollup are unaffected
+		EXECUTE format(
+			'INSERT INTO %I (%s) SELECT %s FROM appointment_default WHERE appointment_date >= %L AND appointment_date < %L',
+			partition_name, column_list, column_list, first_day, next_month);
+		DELETE FROM appointment_default WHERE appointment_date >= first_day AND appointment_date < next_month;
+		ALTER TABLE appointment ATTACH PARTITION appointment_default DEFAULT;
+	END IF;
+	RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions from the current month to months_ahead months ahead, plus one
+-- for every month with rows in the default partition. Run it regularly
+-- (partitions.py create) so new appointments never land in the default.
+CREATE OR REPLACE FUNCTION create_appointment_partitions (months_ahead INT DEFAULT 3) RETURNS SETOF TEXT AS $$
+DECLARE
+	first_day DATE;
+	created TEXT;
+BEGIN
+	FOR first_day IN
+		SELECT date_trunc('month', appointment_date)::date FROM appointment_default
+		UNION
+		SELECT generate_series(date_trunc('month', CURRENT_DATE),
+			date_trunc('month', CURRENT_DATE) + months_ahead * INTERVAL '1 month', INTERVAL '1 month')::date
+		ORDER BY 1
+	LOOP
+		created := create_appointment_partition (first_day);
+		IF created IS NOT NULL THEN
+			RETURN NEXT created;
+		END IF;
+	END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move monthly partitions that end on or before the cutoff and hold only
+-- Completed and Cancelled appointments into appointment_archive. Detaching
+-- fires no delete triggers: the appointment counter is lowered here, and the
+-- earnings rollup keeps counting archived work (rebuild_caregiver_earnings
+-- reads the archive too).
+CREATE OR REPLACE FUNCTION archive_appointment_partitions (cutoff DATE)
+RETURNS TABLE (partition_name TEXT, appointments BIGINT) AS $$
+DECLARE
+	first_day DATE;
+	open_rows BOOLEAN;
+	column_list TEXT := 'appointment_id, caregiver_user_id, member_user_id, appointment_date, appointment_time, work_hours, status';
+BEGIN
+	FOR partition_name, first_day IN
+		SELECT c.relname::text, to_date(substring(c.relname FROM '(\d{4}_\d{2})$'), 'YYYY_MM')
+		FROM pg_inherits i
+		JOIN pg_class c ON c.oid = i.inhrelid
+		WHERE i.inhparent = 'appointment'::regclass AND c.relname ~ '^appointment_\d{4}_\d{2}$'
+		ORDER BY 2
+	LOOP
+		CONTINUE WHEN (first_day + INTERVAL '1 month')::date > cutoff;
+		EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE status IN (''Scheduled'', ''Confirmed''))', partition_name)
+		INTO open_rows;
+		CONTINUE WHEN open_rows;
+		EXECUTE format('SELECT count(*) FROM %I', partition_name) INTO appointments;
+		EXECUTE format('ALTER TABLE appointment DETACH PARTITION %I', partition_name);
+		IF to_regclass('appointment_archive.' || partition_name) IS NULL THEN
+			-- Archived rows get no new ids, and the sequence must not depend on the archive
+			EXECUTE format('ALTER TABLE %I ALTER COLUMN appointment_id DROP DEFAULT', partition_name);
+			EXECUTE format('ALTER TABLE %I SET SCHEMA appointment_archive', partition_name);
+			EXECUTE format('ALTER TABLE appointment_archive.appointment ATTACH PARTITION appointment_archive.%I
+				FOR VALUES FROM (%L) TO (%L)', partition_name, first_day, (first_day + INTERVAL '1 month')::date);
+		ELSE
+			-- Late rows for a month archived before: add them to its archive
+			EXECUTE format('INSERT INTO appointment_archive.%I (%s) SELECT %s FROM %I',
+				partition_name, column_list, column_list, partition_name);
+			EXECUTE format('DROP TABLE %I', partition_name);
+		END IF;
+		UPDATE entity_counter SET row_count = row_count - appointments WHERE entity = 'appointment';
+		RETURN NEXT;
+	END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_appointment_partitions ();
 
 CREATE INDEX idx_user_city ON "user" (city);
 
+CREATE INDEX idx_user_surname ON "user" (surname, user_id);
+
+CREATE INDEX idx_user_name_prefix ON "user" (lower(given_name || ' ' || surname) text_pattern_ops);
+
+CREATE INDEX idx_user_surname_prefix ON "user" (lower(surname) text_pattern_ops);
+
+CREATE INDEX idx_user_email_prefix ON "user" (lower(email) text_pattern_ops);
+
 CREATE INDEX idx_caregiver_type ON caregiver (caregiving_type);
 
-CREATE INDEX idx_job_posted_date ON job (date_posted);
+CREATE INDEX idx_caregiver_rate ON caregiver (hourly_rate, caregiver_user_id);
+
+CREATE INDEX idx_job_posted_date ON job (date_posted, job_id);
 
 CREATE INDEX idx_job_caregiving_type ON job (required_caregiving_type);
 
-CREATE INDEX idx_appointment_date ON appointment (appointment_date);
+-- Foreign key indexes. Those on a detail page's child lists carry the
+-- list's sort key, so each sub-page is one index range scan per parent.
+CREATE INDEX idx_job_member ON job (member_user_id, date_posted, job_id);
+
+CREATE INDEX idx_job_application_job ON job_application (job_id);
+
+CREATE INDEX idx_job_application_caregiver ON job_application (caregiver_user_id, date_applied, application_id);
+
+CREATE INDEX idx_appointment_date ON appointment (appointment_date, appointment_id);
 
 CREATE INDEX idx_appointment_status ON appointment (status);
 
-CREATE INDEX idx_address_member ON address (member_user_id);
+CREATE INDEX idx_appointment_caregiver ON appointment (caregiver_user_id, appointment_date, appointment_id);
+
+CREATE INDEX idx_appointment_member ON appointment (member_user_id, appointment_date, appointment_id);
+
+CREATE INDEX idx_address_member ON address (member_user_id, address_id);
+
+-- Full-text search: the search_vector columns are generated from the text
+-- columns on every write, so the GIN indexes are always current. The trigram
+-- indexes serve substring matches (ILIKE '%...%') that full-text search misses.
+CREATE INDEX idx_user_search ON "user" USING GIN (search_vector);
+
+CREATE INDEX idx_member_search ON member USING GIN (search_vector);
+
+CREATE INDEX idx_job_search ON job USING GIN (search_vector);
+
+CREATE INDEX idx_user_profile_trgm ON "user" USING GIN (profile_description gin_trgm_ops);
+
+CREATE INDEX idx_member_house_rules_trgm ON member USING GIN (house_rules gin_trgm_ops);
+
+CREATE INDEX idx_job_requirements_trgm ON job USING GIN (other_requirements gin_trgm_ops);
+
+-- Row counts per table for the dashboard, kept exact by statement-level
+-- triggers so reading them is a primary key lookup instead of COUNT(*).
+CREATE TABLE
+	entity_counter (
+		entity VARCHAR(50) PRIMARY KEY,
+		row_count BIGINT NOT NULL DEFAULT 0
+	);
+
+INSERT INTO
+	entity_counter (entity, row_count)
+SELECT 'user', COUNT(*) FROM "user"
+UNION ALL
+SELECT 'caregiver', COUNT(*) FROM caregiver
+UNION ALL
+SELECT 'member', COUNT(*) FROM member
+UNION ALL
+SELECT 'job', COUNT(*) FROM job
+UNION ALL
+SELECT 'appointment', COUNT(*) FROM appointment;
+
+CREATE OR REPLACE FUNCTION entity_counter_insert () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE entity_counter
+	SET row_count = row_count + (SELECT COUNT(*) FROM new_rows)
+	WHERE entity = TG_TABLE_NAME;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION entity_counter_delete () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE entity_counter
+	SET row_count = row_count - (SELECT COUNT(*) FROM old_rows)
+	WHERE entity = TG_TABLE_NAME;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION entity_counter_truncate () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE entity_counter SET row_count = 0 WHERE entity = TG_TABLE_NAME;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+	tbl TEXT;
+BEGIN
+	FOREACH tbl IN ARRAY ARRAY['user', 'caregiver', 'member', 'job', 'appointment'] LOOP
+		EXECUTE format(
+			'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows
+			 FOR EACH STATEMENT EXECUTE FUNCTION entity_counter_insert()',
+			tbl || '_count_insert', tbl);
+		EXECUTE format(
+			'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows
+			 FOR EACH STATEMENT EXECUTE FUNCTION entity_counter_delete()',
+			tbl || '_count_delete', tbl);
+		EXECUTE format(
+			'CREATE TRIGGER %I AFTER TRUNCATE ON %I
+			 FOR EACH STATEMENT EXECUTE FUNCTION entity_counter_truncate()',
+			tbl || '_count_truncate', tbl);
+	END LOOP;
+END;
+$$;
+
+-- Per-caregiver totals over accepted (Confirmed/Completed) appointments.
+-- Statement-level triggers apply the net change of each statement, so payroll
+-- reports read one row per caregiver instead of re-aggregating appointments.
+CREATE TABLE
+	caregiver_earnings (
+		caregiver_user_id INT PRIMARY KEY,
+		accepted_appointments INT NOT NULL DEFAULT 0,
+		total_hours DECIMAL(12, 2) NOT NULL DEFAULT 0,
+		total_earnings DECIMAL(18, 4) NOT NULL DEFAULT 0,
+		FOREIGN KEY (caregiver_user_id) REFERENCES caregiver (caregiver_user_id) ON DELETE CASCADE
+	);
+
+CREATE INDEX idx_caregiver_earnings_total ON caregiver_earnings (total_earnings, caregiver_user_id);
+
+-- Recompute every rollup row from scratch (initial load and reconciliation),
+-- archived appointments included
+CREATE OR REPLACE FUNCTION rebuild_caregiver_earnings () RETURNS VOID AS $$
+BEGIN
+	INSERT INTO caregiver_earnings (caregiver_user_id, accepted_appointments, total_hours, total_earnings)
+	SELECT
+		c.caregiver_user_id,
+		COUNT(a.appointment_id),
+		COALESCE(SUM(a.work_hours), 0),
+		COALESCE(SUM(a.work_hours * c.hourly_rate), 0)
+	FROM caregiver c
+	LEFT JOIN (
+		SELECT * FROM appointment
+		UNION ALL
+		SELECT * FROM appointment_archive.appointment
+	) a ON a.caregiver_user_id = c.caregiver_user_id
+		AND a.status IN ('Confirmed', 'Completed')
+	GROUP BY c.caregiver_user_id
+	ON CONFLICT (caregiver_user_id) DO UPDATE
+	SET accepted_appointments = EXCLUDED.accepted_appointments,
+		total_hours = EXCLUDED.total_hours,
+		total_earnings = EXCLUDED.total_earnings;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_caregiver_earnings ();
+
+CREATE OR REPLACE FUNCTION caregiver_earnings_add_caregivers () RETURNS TRIGGER AS $$
+BEGIN
+	INSERT INTO caregiver_earnings (caregiver_user_id)
+	SELECT caregiver_user_id FROM new_rows
+	ON CONFLICT (caregiver_user_id) DO NOTHING;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION caregiver_earnings_rate_changed () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE caregiver_earnings e
+	SET total_earnings = e.total_hours * n.hourly_rate
+	FROM new_rows n
+	JOIN old_rows o ON o.caregiver_user_id = n.caregiver_user_id
+	WHERE e.caregiver_user_id = n.caregiver_user_id
+		AND n.hourly_rate IS DISTINCT FROM o.hourly_rate;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER caregiver_earnings_insert
+AFTER INSERT ON caregiver REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_add_caregivers ();
+
+CREATE TRIGGER caregiver_earnings_rate
+AFTER UPDATE ON caregiver REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_rate_changed ();
+
+CREATE OR REPLACE FUNCTION caregiver_earnings_appointments_inserted () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE caregiver_earnings e
+	SET accepted_appointments = e.accepted_appointments + d.appointments,
+		total_hours = e.total_hours + d.hours,
+		total_earnings = e.total_earnings + d.hours * c.hourly_rate
+	FROM (
+		SELECT caregiver_user_id, COUNT(*) AS appointments, SUM(work_hours) AS hours
+		FROM new_rows
+		WHERE status IN ('Confirmed', 'Completed')
+		GROUP BY caregiver_user_id
+	) d
+	JOIN caregiver c ON c.caregiver_user_id = d.caregiver_user_id
+	WHERE e.caregiver_user_id = d.caregiver_user_id;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION caregiver_earnings_appointments_deleted () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE caregiver_earnings e
+	SET accepted_appointments = e.accepted_appointments - d.appointments,
+		total_hours = e.total_hours - d.hours,
+		total_earnings = e.total_earnings - d.hours * c.hourly_rate
+	FROM (
+		SELECT caregiver_user_id, COUNT(*) AS appointments, SUM(work_hours) AS hours
+		FROM old_rows
+		WHERE status IN ('Confirmed', 'Completed')
+		GROUP BY caregiver_user_id
+	) d
+	JOIN caregiver c ON c.caregiver_user_id = d.caregiver_user_id
+	WHERE e.caregiver_user_id = d.caregiver_user_id;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updates may change status, hours or even the caregiver, so the old rows are
+-- subtracted and the new rows added in one pass.
+CREATE OR REPLACE FUNCTION caregiver_earnings_appointments_updated () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE caregiver_earnings e
+	SET accepted_appointments = e.accepted_appointments + d.appointments,
+		total_hours = e.total_hours + d.hours,
+		total_earnings = e.total_earnings + d.hours * c.hourly_rate
+	FROM (
+		SELECT caregiver_user_id, SUM(sign) AS appointments, SUM(sign * work_hours) AS hours
+		FROM (
+			SELECT caregiver_user_id, work_hours, 1 AS sign
+			FROM new_rows
+			WHERE status IN ('Confirmed', 'Completed')
+			UNION ALL
+			SELECT caregiver_user_id, work_hours, -1 AS sign
+			FROM old_rows
+			WHERE status IN ('Confirmed', 'Completed')
+		) changes
+		GROUP BY caregiver_user_id
+	) d
+	JOIN caregiver c ON c.caregiver_user_id = d.caregiver_user_id
+	WHERE e.caregiver_user_id = d.caregiver_user_id
+		AND (d.appointments <> 0 OR d.hours <> 0);
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION caregiver_earnings_appointments_truncated () RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE caregiver_earnings
+	SET accepted_appointments = 0, total_hours = 0, total_earnings = 0;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER caregiver_earnings_appointment_insert
+AFTER INSERT ON appointment REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_appointments_inserted ();
+
+CREATE TRIGGER caregiver_earnings_appointment_update
+AFTER UPDATE ON appointment REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_appointments_updated ();
+
+CREATE TRIGGER caregiver_earnings_appointment_delete
+AFTER DELETE ON appointment REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_appointments_deleted ();
+
+CREATE TRIGGER caregiver_earnings_appointment_truncate
+AFTER TRUNCATE ON appointment
+FOR EACH STATEMENT EXECUTE FUNCTION caregiver_earnings_appointments_truncated ();